@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import profiler
+from setup_database import create_archive_tables
+from quantile_sketch import KLLSketch
+from time_of_day import bucket_of
+from trade_stats import TradeStats, get_pnl
+
+ARCHIVE_DIR = "archive"
+
+
+def archive_path(year, archive_dir=ARCHIVE_DIR):
+    """
+    Returns the path of the archive database holding the trades of a year.
+    """
+    return os.path.join(archive_dir, f"trades_{year}.db")
+
+
+def _write_archive_file(path, rows):
+    """
+    Copies trade rows (with their ids) into an archive database file.
+    Rows already present are skipped, so an interrupted run can be repeated.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY,
+                coin_name TEXT NOT NULL,
+                position TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                date TEXT NOT NULL,
+                leverage REAL NOT NULL,
+                entry_price REAL NOT NULL,
+                exit_price REAL,
+                size REAL NOT NULL DEFAULT 1,
+                entry_time INTEGER,
+                exit_time INTEGER
+            )
+        """)
+        # Archive files written before trades had times
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(trades)")}
+        if "entry_time" not in columns:
+            conn.execute("ALTER TABLE trades ADD COLUMN entry_time INTEGER")
+            conn.execute("ALTER TABLE trades ADD COLUMN exit_time INTEGER")
+        conn.executemany("""
+            INSERT OR IGNORE INTO trades (id, coin_name, position, mode, date, leverage, entry_price, exit_price, size,
+                                          entry_time, exit_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def archive_trades(conn, cutoff_date, archive_dir=ARCHIVE_DIR, vacuum=False):
+    """
+    Moves closed trades dated before the cutoff into per-year archive databases and
+    leaves per-month summaries of them in the main database.
+
+    The summaries hold, per month and (coin, position, mode, leverage), the counts and
+    PnL sums the report is built from, plus the best and worst trades of every coin
+    (which include the month's overall best and worst) and the PnL
+    quantile sketches and weekday/hour buckets (for the time-of-day heatmaps) of each
+    month, so generate_full_report_with_recommendations gives the same all-time figures after
+    archiving. Open positions are never archived.
+
+    Parameters:
+    conn (sqlite3.Connection): Connection to the main database.
+    cutoff_date (str): 'YYYY-MM-DD'; trades dated strictly before it are archived.
+    archive_dir (str): Directory for the archive database files.
+    vacuum (bool): Reclaim the freed space of the main database afterwards.
+
+    Returns:
+    int: Number of trades archived.
+    """
+    # The daily report section needs today's trades in the main database
+    if cutoff_date > datetime.now().strftime("%Y-%m-%d"):
+        raise ValueError("The cutoff date cannot be in the future.")
+
+    os.makedirs(archive_dir, exist_ok=True)
+    create_archive_tables(conn)
+    cursor = conn.cursor()
+
+    with profiler.span("archive.read"):
+        cursor.execute("""
+            SELECT id, coin_name, position, mode, date, leverage, entry_price, exit_price, size,
+                   entry_time, exit_time
+            FROM trade_details
+            WHERE date < ? AND exit_price IS NOT NULL
+            ORDER BY id
+        """, (cutoff_date,))
+        rows = cursor.fetchall()
+        profiler.count("rows_scanned", len(rows))
+    if not rows:
+        return 0
+
+    # 1) Copy the rows into the archive files first; they are only deleted from the
+    #    main database once they are safely stored there
+    with profiler.span("archive.write_files"):
+        by_year = {}
+        for row in rows:
+            by_year.setdefault(row[4][:4], []).append(row)
+        for year, year_rows in by_year.items():
+            _write_archive_file(archive_path(year, archive_dir), year_rows)
+
+    # 2) Summarize per month
+    with profiler.span("archive.summarize"):
+        monthly = {}
+        coin_extremes = {}  # period -> coin -> TradeStats holding only that coin's extreme trades
+        first_ids = {}
+        time_buckets = {}  # (period, weekday, hour) -> [trade_count, wins, pnl_sum]
+        for (trade_id, coin, position, mode, date, leverage, entry, exit_, size, entry_time, _) in rows:
+            period = date[:7]
+            monthly.setdefault(period, TradeStats()).add_trade(
+                trade_id, coin, position, leverage, entry, exit_, mode
+            )
+            first_ids.setdefault((period, coin, position, mode, leverage), trade_id)
+            pnl = get_pnl(position, leverage, entry, exit_)
+            if pnl is not None:
+                coin_extremes.setdefault(period, {}).setdefault(coin, TradeStats()).add_extreme(
+                    trade_id, coin, position, pnl, entry, exit_
+                )
+            if entry_time is not None and pnl is not None:
+                bucket = time_buckets.setdefault((period, *bucket_of(entry_time)), [0, 0, 0.0])
+                bucket[0] += 1
+                bucket[1] += pnl > 0
+                bucket[2] += pnl
+
+    # 3) Store the summaries and remove the archived rows in one transaction
+    with profiler.span("archive.update_main"):
+        try:
+            for period, stats in monthly.items():
+                for (coin, position, mode, leverage), values in stats.groups.items():
+                    cursor.execute("""
+                        INSERT INTO trade_summaries (
+                            period, coin_name, position, mode, leverage, first_id,
+                            trade_count, pnl_count, wins, losses, pnl_sum, spot_pnl_sum, pnl_max, pnl_min
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (period, coin_name, position, mode, leverage) DO UPDATE SET
+                            first_id = MIN(first_id, excluded.first_id),
+                            trade_count = trade_count + excluded.trade_count,
+                            pnl_count = pnl_count + excluded.pnl_count,
+                            wins = wins + excluded.wins,
+                            losses = losses + excluded.losses,
+                            pnl_sum = pnl_sum + excluded.pnl_sum,
+                            spot_pnl_sum = spot_pnl_sum + excluded.spot_pnl_sum,
+                            pnl_max = MAX(pnl_max, excluded.pnl_max),
+                            pnl_min = MIN(pnl_min, excluded.pnl_min)
+                    """, (period, coin, position, mode, leverage,
+                          first_ids[(period, coin, position, mode, leverage)], *values))
+                # PnL sketches; a month archived in several runs gets its sketches merged
+                for sketch_key, sketch in stats.sketches.items():
+                    cursor.execute("SELECT sketch FROM archived_sketches WHERE period = ? AND sketch_key = ?",
+                                   (period, sketch_key))
+                    existing = cursor.fetchone()
+                    if existing is not None:
+                        sketch.merge(KLLSketch.from_dict(json.loads(existing[0])))
+                    cursor.execute("INSERT OR REPLACE INTO archived_sketches (period, sketch_key, sketch) VALUES (?, ?, ?)",
+                                   (period, sketch_key, json.dumps(sketch.to_dict())))
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO archived_extremes (trade_id, period, side, coin_name, pnl, entry_price, exit_price)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (tid, period, side, coin, pnl, entry, exit_)
+                    for coin_stats in coin_extremes.get(period, {}).values()
+                    for side, candidates in coin_stats.extremes.items()
+                    for (tid, coin, pnl, entry, exit_) in candidates
+                ])
+
+            cursor.executemany("""
+                INSERT INTO archived_time_buckets (period, weekday, hour, trade_count, wins, pnl_sum)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (period, weekday, hour) DO UPDATE SET
+                    trade_count = trade_count + excluded.trade_count,
+                    wins = wins + excluded.wins,
+                    pnl_sum = pnl_sum + excluded.pnl_sum
+            """, [(*key, *values) for key, values in time_buckets.items()])
+
+            cursor.executemany("DELETE FROM trades WHERE id = ?", [(row[0],) for row in rows])
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    if vacuum:
+        conn.execute("VACUUM")
+    return len(rows)
+
+
+def load_archived_stats(conn, stats):
+    """
+    Adds the summaries of archived trades to a TradeStats object.
+    Does nothing if nothing has been archived yet.
+
+    Parameters:
+    conn (sqlite3.Connection): Connection to the main database.
+    stats (TradeStats): Statistics to add the archived groups to.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    if "trade_summaries" not in tables:
+        return
+
+    cursor.execute("""
+        SELECT coin_name, position, mode, leverage,
+               SUM(trade_count), SUM(pnl_count), SUM(wins), SUM(losses),
+               SUM(pnl_sum), SUM(spot_pnl_sum), MAX(pnl_max), MIN(pnl_min)
+        FROM trade_summaries
+        GROUP BY coin_name, position, mode, leverage
+        ORDER BY MIN(first_id)
+    """)
+    for (coin, position, mode, leverage, *values) in cursor.fetchall():
+        stats.add_group((coin, position, mode, leverage), values)
+
+    for (trade_id, coin, side, pnl, entry, exit_) in load_archived_extremes(conn):
+        stats.add_extreme(trade_id, coin, side, pnl, entry, exit_)
+
+    # Archives made before PnL sketches were kept have none
+    if "archived_sketches" not in tables:
+        return
+    cursor.execute("SELECT sketch_key, sketch FROM archived_sketches ORDER BY period, sketch_key")
+    for (sketch_key, sketch) in cursor.fetchall():
+        stats.add_sketch(sketch_key, KLLSketch.from_dict(json.loads(sketch)))
+
+
+
+def load_archived_extremes(conn):
+    """
+    Reads the best and worst archived trades: per month those of every coin, for
+    archives made before they were kept per coin only the month's overall ones.
+
+    Parameters:
+    conn (sqlite3.Connection): Connection to the main database (with the archive tables).
+
+    Returns:
+    list of tuple: (trade_id, coin_name, side, pnl, entry_price, exit_price)
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT trade_id, coin_name, side, pnl, entry_price, exit_price
+        FROM archived_extremes
+        ORDER BY trade_id
+    """)
+    return cursor.fetchall()
+
+
+def load_archived_time_grid(conn, grid):
+    """
+    Adds the weekday/hour buckets of archived trades to a time-of-day grid.
+    Does nothing if nothing has been archived yet.
+
+    Parameters:
+    conn (sqlite3.Connection): Connection to the main database.
+    grid (list of list): grid[weekday][hour] -> [trade_count, wins, pnl_sum], updated in place.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'archived_time_buckets'")
+    if cursor.fetchone() is None:
+        return
+    cursor.execute("""
+        SELECT weekday, hour, SUM(trade_count), SUM(wins), SUM(pnl_sum)
+        FROM archived_time_buckets
+        GROUP BY weekday, hour
+    """)
+    for (weekday, hour, count, wins, pnl_sum) in cursor.fetchall():
+        bucket = grid[weekday][hour]
+        bucket[0] += count
+        bucket[1] += wins
+        bucket[2] += pnl_sum
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old trades into per-year archive databases.")
+    parser.add_argument("cutoff", help="Archive closed trades dated before this day (YYYY-MM-DD)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--vacuum", action="store_true", help="Shrink the main database file afterwards")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    args = parser.parse_args()
+
+    connection = profiler.connect(args.db)
+    archived = archive_trades(connection, args.cutoff, args.archive_dir, args.vacuum)
+    connection.close()
+    print(f"Archived {archived} trades dated before {args.cutoff}.")
@@ -0,0 +1,260 @@
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import profiler
+
+BACKUP_DIR = "backups"
+SNAPSHOT_PREFIX = "trade_data_"
+# Copies of the database taken by restore_snapshot(); not snapshots, so never pruned
+RESTORE_PREFIX = "before_restore_"
+
+# Pages copied per backup step and the pause between steps. The source database is
+# only locked while a step runs, so writers never wait longer than one step.
+BACKUP_PAGES = 64
+BACKUP_SLEEP = 0.005
+
+
+def snapshot_path(backup_dir=BACKUP_DIR, now=None, prefix=SNAPSHOT_PREFIX):
+    """
+    Returns a new, unused snapshot file name based on the current time.
+    """
+    stamp = (now or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(backup_dir, f"{prefix}{stamp}.db")
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(backup_dir, f"{prefix}{stamp}_{counter}.db")
+        counter += 1
+    return path
+
+
+def check_integrity(path):
+    """
+    Runs SQLite's integrity check on a database file.
+
+    Parameters:
+    path (str): Database file to check.
+
+    Returns:
+    list of str: The problems found; empty if the file is intact.
+    """
+    if not os.path.exists(path):
+        return [f"{path} does not exist"]
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            messages = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return [str(e)]
+    return [] if messages == ["ok"] else messages
+
+
+def backup_database(database="trade_data.db", backup_dir=BACKUP_DIR, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP,
+                    prefix=SNAPSHOT_PREFIX):
+    """
+    Takes a consistent snapshot of the database while it stays in use.
+
+    The copy is made with the SQLite online backup API, `pages` pages at a time with
+    a pause of `sleep` seconds between steps. If another connection writes to the
+    database in the meantime, SQLite restarts the copy, so the snapshot always
+    reflects a single committed state. The snapshot is written under a temporary
+    name and only renamed into place once it passed the integrity check.
+
+    Parameters:
+    database (str): Database file to back up.
+    backup_dir (str): Directory for the snapshots.
+    pages (int): Pages copied per step.
+    sleep (float): Seconds to pause between steps.
+    prefix (str): File name prefix of the snapshot.
+
+    Returns:
+    str: Path of the new snapshot.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    path = snapshot_path(backup_dir, prefix=prefix)
+    temp_path = path + ".part"
+
+    with profiler.span("backup.copy"):
+        source = sqlite3.connect(database)
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target, pages=pages, sleep=sleep,
+                          progress=lambda status, remaining, total: profiler.count("backup.steps"))
+        finally:
+            target.close()
+            source.close()
+
+    with profiler.span("backup.check"):
+        problems = check_integrity(temp_path)
+    if problems:
+        os.remove(temp_path)
+        raise sqlite3.DatabaseError(f"Snapshot failed the integrity check: {problems[0]}")
+    os.replace(temp_path, path)
+    return path
+
+
+def list_snapshots(backup_dir=BACKUP_DIR, prefix=SNAPSHOT_PREFIX):
+    """
+    Returns the snapshot files in a backup directory, oldest first. With
+    prefix=RESTORE_PREFIX the copies saved before restores are listed instead.
+    """
+    return sorted(glob.glob(os.path.join(backup_dir, f"{prefix}*.db")))
+
+
+def prune_snapshots(backup_dir=BACKUP_DIR, keep=10):
+    """
+    Deletes all but the `keep` most recent snapshots. The copies saved before
+    restores are not snapshots and are never deleted.
+
+    Parameters:
+    backup_dir (str): Directory holding the snapshots.
+    keep (int): Number of snapshots to keep.
+
+    Returns:
+    list of str: The deleted files.
+    """
+    snapshots = list_snapshots(backup_dir)
+    removed = snapshots[:-keep] if keep > 0 else snapshots
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore_snapshot(snapshot, database="trade_data.db", backup_dir=BACKUP_DIR):
+    """
+    Replaces the contents of the database with a snapshot.
+
+    The snapshot is checked first, and the current database is backed up before it
+    is overwritten, so a restore can itself be undone. That copy is saved under
+    RESTORE_PREFIX rather than as a snapshot, so neither it nor later pruning can
+    push out the snapshots the user is choosing between. The data is copied with the
+    backup API into the existing file, which keeps it valid for connections that
+    are still open.
+
+    Parameters:
+    snapshot (str): Snapshot file to restore.
+    database (str): Database file to overwrite.
+    backup_dir (str): Directory for the backup of the current state.
+
+    Returns:
+    str: Path of the backup taken of the database before restoring, or None if
+    the database did not exist yet.
+    """
+    problems = check_integrity(snapshot)
+    if problems:
+        raise sqlite3.DatabaseError(f"Snapshot {snapshot} is damaged: {problems[0]}")
+
+    previous = None
+    if os.path.exists(database):
+        previous = backup_database(database, backup_dir, prefix=RESTORE_PREFIX)
+    with profiler.span("backup.restore"):
+        source = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+        target = sqlite3.connect(database)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    return previous
+
+
+class BackupScheduler:
+    """
+    Takes a snapshot every `interval` seconds on a background thread and keeps the
+    most recent `keep` snapshots.
+    """
+    def __init__(self, database="trade_data.db", backup_dir=BACKUP_DIR, interval=3600, keep=24):
+        """
+        Parameters:
+        database (str): Database file to back up.
+        backup_dir (str): Directory for the snapshots.
+        interval (float): Seconds between snapshots.
+        keep (int): Number of snapshots to keep.
+        """
+        self.database = database
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.last_snapshot = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the scheduler thread. The first snapshot is taken right away.
+        """
+        self._thread = threading.Thread(target=self._run, name="trade-journal-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops the scheduler thread, letting a snapshot in progress finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self):
+        """
+        Takes one snapshot and applies the retention limit.
+
+        Returns:
+        str: Path of the new snapshot, or None if it failed (see last_error).
+        """
+        try:
+            self.last_snapshot = backup_database(self.database, self.backup_dir)
+            prune_snapshots(self.backup_dir, self.keep)
+            self.last_error = None
+        except (sqlite3.Error, OSError) as e:
+            self.last_error = e
+            return None
+        return self.last_snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up, check and restore the trade database.")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    parser.add_argument("--backup-dir", default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser("backup", help="Take a snapshot now")
+    backup_parser.add_argument("--keep", type=int, default=0, help="Also delete all but the newest N snapshots")
+    commands.add_parser("list", help="List snapshots")
+    check_parser = commands.add_parser("check", help="Check the integrity of snapshots")
+    check_parser.add_argument("snapshot", nargs="?", help="Snapshot to check (default: all)")
+    restore_parser = commands.add_parser("restore", help="Restore a snapshot")
+    restore_parser.add_argument("snapshot", help="Snapshot file to restore")
+    prune_parser = commands.add_parser("prune", help="Delete old snapshots")
+    prune_parser.add_argument("--keep", type=int, default=24)
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        print(f"Snapshot written: {backup_database(args.db, args.backup_dir)}")
+        if args.keep:
+            for removed_path in prune_snapshots(args.backup_dir, args.keep):
+                print(f"Deleted old snapshot: {removed_path}")
+    elif args.command == "list":
+        for snapshot_file in list_snapshots(args.backup_dir) + list_snapshots(args.backup_dir, RESTORE_PREFIX):
+            print(f"{snapshot_file}  {os.path.getsize(snapshot_file)} bytes")
+    elif args.command == "check":
+        for snapshot_file in [args.snapshot] if args.snapshot else list_snapshots(args.backup_dir):
+            found = check_integrity(snapshot_file)
+            print(f"{snapshot_file}: {'ok' if not found else '; '.join(found)}")
+    elif args.command == "restore":
+        saved = restore_snapshot(args.snapshot, args.db, args.backup_dir)
+        if saved:
+            print(f"Previous state saved as: {saved}")
+        print(f"Restored {args.db} from {args.snapshot}")
+    elif args.command == "prune":
+        for removed_path in prune_snapshots(args.backup_dir, args.keep):
+            print(f"Deleted old snapshot: {removed_path}")
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from dimensions import canonical_coin, canonical_mode, canonical_position
+from timestamps import date_from_ms, parse_timestamp
+
+# Columns of the batch entry grid, in the order pasted data is expected in
+BATCH_COLUMNS = (
+    "Coin", "Position", "Mode", "Date", "Entry Time", "Exit Time",
+    "Leverage", "Entry Price", "Exit Price", "Size",
+)
+COIN, POSITION, MODE, DATE, ENTRY_TIME, EXIT_TIME, LEVERAGE, ENTRY_PRICE, EXIT_PRICE, SIZE = range(len(BATCH_COLUMNS))
+
+# Empty rows the grid starts with; pasting more rows grows it
+GRID_ROWS = 20
+
+
+def parse_clipboard(text):
+    """
+    Splits pasted spreadsheet data into rows of cells.
+
+    Cells are separated by tabs (what spreadsheets put on the clipboard), or by
+    commas or semicolons if the text has no tabs. Empty lines and a header line
+    starting with "Coin" are skipped.
+
+    Parameters:
+    text (str): The clipboard text.
+
+    Returns:
+    list of list of str: The rows, cells stripped of surrounding spaces.
+    """
+    lines = [line for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n") if line.strip()]
+    if "\t" in text:
+        separator = "\t"
+    elif any(";" in line for line in lines):
+        separator = ";"
+    else:
+        separator = ","
+    rows = [[cell.strip() for cell in line.split(separator)] for line in lines]
+    if rows and rows[0][0].lower() == "coin":
+        rows = rows[1:]
+    return rows
+
+
+def _number(text, name, positive=False):
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"{name} must be a number.")
+    if positive and value <= 0:
+        raise ValueError(f"{name} must be greater than 0.")
+    return value
+
+
+def validate_row(cells, default_date):
+    """
+    Validates one grid row and converts it to a trade for insert_trades().
+
+    Parameters:
+    cells (list of str): Cell texts in BATCH_COLUMNS order (missing cells count as empty).
+    default_date (str): Date used when the date cell is empty ('YYYY-MM-DD').
+
+    Returns:
+    tuple: (trade, errors). trade is a (coin, position, mode, date, leverage,
+    entry_price, exit_price, size, entry_time, exit_time) tuple, or None if the row
+    has errors; errors maps column indexes to messages.
+    """
+    cells = (list(cells) + [""] * len(BATCH_COLUMNS))[:len(BATCH_COLUMNS)]
+    errors = {}
+    values = {}
+    checks = (
+        (COIN, lambda text: canonical_coin(text)),
+        (POSITION, lambda text: canonical_position(text)),
+        (MODE, lambda text: canonical_mode(text)),
+        (LEVERAGE, lambda text: _number(text, "Leverage", positive=True)),
+        (ENTRY_PRICE, lambda text: _number(text, "Entry price", positive=True)),
+        (EXIT_PRICE, lambda text: _number(text, "Exit price") if text else None),
+        (SIZE, lambda text: _number(text, "Size", positive=True) if text else 1.0),
+    )
+    for column, check in checks:
+        try:
+            values[column] = check(cells[column])
+        except ValueError as e:
+            errors[column] = str(e)
+
+    date = cells[DATE] or default_date
+    try:
+        date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        errors[DATE] = "Date must be YYYY-MM-DD."
+    for column in (ENTRY_TIME, EXIT_TIME):
+        if DATE in errors:
+            break  # times without a date cannot be checked until the date is fixed
+        try:
+            values[column] = parse_timestamp(cells[column], date)
+        except ValueError as e:
+            errors[column] = str(e)
+
+    if errors:
+        return None, errors
+    entry_time = values[ENTRY_TIME]
+    trade = (
+        values[COIN], values[POSITION], values[MODE],
+        date_from_ms(entry_time) if entry_time is not None else date,
+        values[LEVERAGE], values[ENTRY_PRICE], values[EXIT_PRICE], values[SIZE],
+        entry_time, values[EXIT_TIME],
+    )
+    return trade, {}
+
+
+def validate_rows(rows, default_date):
+    """
+    Validates every row of the grid at once. Rows whose cells are all empty are ignored.
+
+    Parameters:
+    rows (list of list of str): Cell texts per row.
+    default_date (str): Date used for rows without one ('YYYY-MM-DD').
+
+    Returns:
+    tuple: (trades, errors). trades is a list of (row_index, trade) for the valid
+    rows; errors maps (row_index, column_index) to a message for every bad cell.
+    """
+    trades = []
+    errors = {}
+    for index, cells in enumerate(rows):
+        if not any(cell.strip() for cell in cells):
+            continue
+        trade, row_errors = validate_row([cell.strip() for cell in cells], default_date)
+        if trade is not None:
+            trades.append((index, trade))
+        for column, message in row_errors.items():
+            errors[(index, column)] = message
+    return trades, errors
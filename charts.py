@@ -0,0 +1,343 @@
+import math
+
+# Upper bounds on what a chart draws, whatever the number of trades
+MAX_CURVE_POINTS = 300
+HISTOGRAM_BINS = 40
+MAX_BARS = 12
+
+AXIS_COLOR = (120, 120, 120)
+LINE_COLOR = (30, 90, 200)
+POSITIVE_COLOR = (40, 160, 80)
+NEGATIVE_COLOR = (200, 60, 60)
+
+
+def lttb(values, threshold=MAX_CURVE_POINTS):
+    """
+    Downsamples a series with the largest-triangle-three-buckets algorithm.
+
+    The first and last points are kept; the points in between are split into
+    threshold - 2 buckets and from each bucket the point forming the largest
+    triangle with the previously chosen point and the average of the next bucket
+    is kept. Peaks and drops stay visible, unlike with plain decimation.
+
+    Parameters:
+    values (sequence of float): The y values; x is the index.
+    threshold (int): Maximum number of points to return.
+
+    Returns:
+    list of tuple: (x, y) points in x order.
+    """
+    n = len(values)
+    if n <= threshold or threshold < 3:
+        return list(enumerate(values))
+
+    every = (n - 2) / (threshold - 2)
+    sampled = [(0, values[0])]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= n - 1 or next_end <= next_start:
+            next_start, next_end = n - 1, n
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = math.fsum(values[next_start:next_end]) / (next_end - next_start)
+
+        ax, ay = a, values[a]
+        dx = avg_x - ax
+        dy = avg_y - ay
+        # Twice the triangle area, up to the sign: |dx * (y - ay) - (x - ax) * dy|
+        a = max(
+            range(start, end),
+            key=lambda j: abs(dx * (values[j] - ay) - (j - ax) * dy)
+        )
+        sampled.append((a, values[a]))
+    sampled.append((n - 1, values[n - 1]))
+    return sampled
+
+
+def histogram(values, bins=HISTOGRAM_BINS):
+    """
+    Counts values into equal-width bins between their minimum and maximum.
+
+    Parameters:
+    values (sequence of float): The values to count.
+    bins (int): Number of bins.
+
+    Returns:
+    tuple: (low, width, counts); counts is empty if there are no values.
+    """
+    if not values:
+        return 0.0, 0.0, []
+    low = min(values)
+    high = max(values)
+    width = (high - low) / bins or 1.0
+    counts = [0] * bins
+    last = bins - 1
+    for value in values:
+        index = int((value - low) / width)
+        counts[index if index < last else last] += 1
+    return low, width, counts
+
+
+def _frame(pdf, x, y, w, h, title):
+    """
+    Draws a chart title and frame and sets the style for the axis labels.
+    """
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.set_xy(x, y)
+    pdf.cell(w, 5, txt=title, align="L")
+    pdf.set_draw_color(*AXIS_COLOR)
+    pdf.set_line_width(0.2)
+    pdf.rect(x, y + 6, w, h - 6)
+    pdf.set_font("Helvetica", size=7)
+
+
+def _label(pdf, x, y, text, align="L", width=30):
+    pdf.set_xy(x, y)
+    pdf.cell(width, 3, txt=text, align=align)
+
+
+def _scale(low, high):
+    """
+    Returns a non-empty value range containing 0.
+    """
+    low = min(low, 0.0)
+    high = max(high, 0.0)
+    if high == low:
+        high = low + 1.0
+    return low, high
+
+
+def draw_line_chart(pdf, x, y, w, h, values, title, count=None):
+    """
+    Draws a downsampled line chart (e.g. an equity curve) with a zero line.
+
+    Parameters:
+    pdf (FPDF): The document to draw on.
+    x, y, w, h (float): Position and size of the chart in mm.
+    values (sequence of float): The series; x is the index.
+    title (str): Chart title.
+    count (int): Number of trades the series stands for, if it is itself a reduced
+        series such as report_state.equity_curve() (defaults to len(values)).
+    """
+    _frame(pdf, x, y, w, h, title)
+    top = y + 8
+    height = h - 10
+    if len(values) < 2:
+        _label(pdf, x + 2, top, "Not enough data.")
+        return
+
+    points = lttb(values)
+    low, high = _scale(min(v for _, v in points), max(v for _, v in points))
+    span_x = points[-1][0] or 1
+    to_y = lambda v: top + (high - v) / (high - low) * height
+
+    pdf.set_draw_color(*AXIS_COLOR)
+    pdf.dashed_line(x, to_y(0.0), x + w, to_y(0.0), 1, 1)
+    pdf.set_draw_color(*LINE_COLOR)
+    pdf.set_line_width(0.3)
+    pdf.polyline([(x + px / span_x * w, to_y(py)) for px, py in points])
+
+    _label(pdf, x + 1, top - 1, f"{high:.0f}%")
+    _label(pdf, x + 1, top + height - 2, f"{low:.0f}%")
+    _label(pdf, x + w - 31, y + h - 4, f"{count or len(values)} trades", align="R")
+
+
+def draw_histogram(pdf, x, y, w, h, hist, title):
+    """
+    Draws a pre-binned histogram (see histogram()).
+
+    Parameters:
+    pdf (FPDF): The document to draw on.
+    x, y, w, h (float): Position and size of the chart in mm.
+    hist (tuple): (low, width, counts) as returned by histogram().
+    title (str): Chart title.
+    """
+    _frame(pdf, x, y, w, h, title)
+    low, width, counts = hist
+    top = y + 8
+    height = h - 14
+    if not counts:
+        _label(pdf, x + 2, top, "No data.")
+        return
+
+    peak = max(counts)
+    bar_w = w / len(counts)
+    for i, count in enumerate(counts):
+        if not count:
+            continue
+        bar_h = count / peak * height
+        # Bins below zero are losses
+        pdf.set_fill_color(*(NEGATIVE_COLOR if low + (i + 0.5) * width < 0 else POSITIVE_COLOR))
+        pdf.rect(x + i * bar_w, top + height - bar_h, bar_w, bar_h, style="F")
+
+    _label(pdf, x + 1, y + h - 5, f"{low:.0f}%")
+    _label(pdf, x + w - 31, y + h - 5, f"{low + width * len(counts):.0f}%", align="R")
+    _label(pdf, x + 1, top - 1, f"max {peak} trades")
+
+
+def draw_bar_chart(pdf, x, y, w, h, items, title, value_format="{:.1f}"):
+    """
+    Draws horizontal bars for labelled values, positive ones to the right of the
+    zero line and negative ones to the left. Only the first MAX_BARS items are drawn.
+
+    Parameters:
+    pdf (FPDF): The document to draw on.
+    x, y, w, h (float): Position and size of the chart in mm.
+    items (list of tuple): (label, value) pairs.
+    title (str): Chart title.
+    value_format (str): Format of the value printed next to each bar.
+    """
+    _frame(pdf, x, y, w, h, title)
+    top = y + 8
+    if not items:
+        _label(pdf, x + 2, top, "No data.")
+        return
+
+    items = items[:MAX_BARS]
+    label_w = 18
+    value_w = 14
+    plot_x = x + label_w
+    plot_w = w - label_w - value_w
+    low, high = _scale(min(v for _, v in items), max(v for _, v in items))
+    zero_x = plot_x + (0.0 - low) / (high - low) * plot_w
+    row_h = min((h - 10) / len(items), 6)
+
+    for i, (label, value) in enumerate(items):
+        row_y = top + i * row_h
+        bar_x = plot_x + (min(value, 0.0) - low) / (high - low) * plot_w
+        bar_w = abs(value) / (high - low) * plot_w
+        pdf.set_fill_color(*(POSITIVE_COLOR if value >= 0 else NEGATIVE_COLOR))
+        pdf.rect(bar_x, row_y + 0.5, max(bar_w, 0.2), row_h - 1, style="F")
+        _label(pdf, x + 1, row_y + (row_h - 3) / 2, str(label)[:10], width=label_w - 2)
+        _label(pdf, x + w - value_w, row_y + (row_h - 3) / 2, value_format.format(value), align="R", width=value_w - 1)
+
+    pdf.set_draw_color(*AXIS_COLOR)
+    pdf.line(zero_x, top, zero_x, top + len(items) * row_h)
+
+
+def _blend(color, strength):
+    """
+    Mixes a color with white; strength 0 gives white, 1 the color itself.
+    """
+    return tuple(int(255 - (255 - c) * strength) for c in color)
+
+
+def draw_heatmap(pdf, x, y, w, h, cells, row_labels, column_labels, title, center=0.0):
+    """
+    Draws a grid of colored cells. Values above `center` are green and values below
+    it red, stronger the further they are from it; empty cells (None) are grey.
+
+    Parameters:
+    pdf (FPDF): The document to draw on.
+    x, y, w, h (float): Position and size of the chart in mm.
+    cells (list of list): Rows of values (float or None).
+    row_labels (list of str): Label of each row.
+    column_labels (list of str): Label of each column; empty strings are skipped.
+    title (str): Chart title.
+    center (float): Value drawn white.
+    """
+    _frame(pdf, x, y, w, h, title)
+    label_w = 10
+    top = y + 8
+    cell_w = (w - label_w - 2) / len(column_labels)
+    cell_h = (h - 14) / len(row_labels)
+    values = [v for row in cells for v in row if v is not None]
+    spread = max((abs(v - center) for v in values), default=0.0) or 1.0
+
+    for r, (label, row) in enumerate(zip(row_labels, cells)):
+        row_y = top + r * cell_h
+        _label(pdf, x + 1, row_y + (cell_h - 3) / 2, label, width=label_w - 1)
+        for c, value in enumerate(row):
+            if value is None:
+                color = (235, 235, 235)
+            else:
+                color = _blend(POSITIVE_COLOR if value >= center else NEGATIVE_COLOR,
+                               min(abs(value - center) / spread, 1.0))
+            pdf.set_fill_color(*color)
+            pdf.rect(x + label_w + c * cell_w, row_y, cell_w, cell_h, style="F")
+    for c, label in enumerate(column_labels):
+        if label:
+            _label(pdf, x + label_w + c * cell_w, top + len(row_labels) * cell_h + 1, label, width=cell_w * 2)
+
+
+def add_time_of_day_page(pdf, grid, weekday_names):
+    """
+    Adds a page with weekday x hour heatmaps of the average PnL and the win rate,
+    and the best and worst hour and weekday.
+
+    Parameters:
+    pdf (FPDF): The document to add the page to.
+    grid (list of list): grid[weekday][hour] -> [trade_count, wins, pnl_sum], with
+        Monday as weekday 0 (see time_of_day.bucket_of()).
+    weekday_names (list of str): Row labels, one per weekday.
+    """
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    pdf.cell(200, 10, txt="[TIME OF DAY]", align="L", ln=1)
+
+    hours = [f"{hour:02d}" if hour % 3 == 0 else "" for hour in range(24)]
+    average = [[pnl / count if count else None for count, _, pnl in row] for row in grid]
+    win_rate = [[wins / count if count else None for count, wins, _ in row] for row in grid]
+    draw_heatmap(pdf, 10, 22, 190, 75, average, weekday_names, hours,
+                 "Average PnL by Weekday and Hour of Entry (%, local time)")
+    draw_heatmap(pdf, 10, 102, 190, 75, win_rate, weekday_names, hours,
+                 "Win Rate by Weekday and Hour of Entry", center=0.5)
+
+    by_weekday = [[sum(cell[i] for cell in row) for i in range(3)] for row in grid]
+    by_hour = [[sum(row[hour][i] for row in grid) for i in range(3)] for hour in range(24)]
+    pdf.set_xy(10, 182)
+    pdf.set_font("Helvetica", size=10)
+    timed = sum(count for count, _, _ in by_weekday)
+    pdf.cell(200, 7, txt=f"Based on {timed} closed trades with an entry time.", align="L", ln=1)
+    for label, totals, names in (("Hour", by_hour, [f"{hour:02d}:00" for hour in range(24)]),
+                                 ("Weekday", by_weekday, weekday_names)):
+        averages = [(pnl / count, name, count) for (count, _, pnl), name in zip(totals, names) if count]
+        if averages:
+            best = max(averages)
+            worst = min(averages)
+            pdf.cell(200, 7, txt=f"Best {label}: {best[1]} ({best[0]:.2f}% average, {best[2]} trades) | "
+                                 f"Worst {label}: {worst[1]} ({worst[0]:.2f}% average, {worst[2]} trades)",
+                     align="L", ln=1)
+    pdf.set_font("Helvetica", size=12)
+
+
+def add_chart_page(pdf, equity, pnls, coin_rows, trade_count=None, archived=False):
+    """
+    Adds a page with the equity curve, the PnL histogram and per-coin bar charts.
+
+    Every chart draws a bounded number of shapes (MAX_CURVE_POINTS, HISTOGRAM_BINS,
+    MAX_BARS), so the page size does not depend on the number of trades.
+
+    Parameters:
+    pdf (FPDF): The document to add the page to.
+    equity (sequence of float): Cumulative PnL, at every trade or the low and high points
+        of each stretch of trades.
+    pnls (sequence of float): Leveraged PnL of every trade, or a random sample of them.
+    coin_rows (list of tuple): (coin, net_pnl, win_rate, trade_count) per coin.
+    trade_count (int): Number of trades behind equity and pnls (defaults to len(pnls)).
+    archived (bool): Whether some trades have been archived; their individual PnLs
+        are not available, so the curve and histogram only cover the others.
+    """
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    pdf.cell(200, 10, txt="[CHARTS]", align="L", ln=1)
+
+    trade_count = trade_count or len(pnls)
+    scope = ", trades not archived yet" if archived else ""
+    sampled = f", sample of {len(pnls)}" if len(pnls) < trade_count else ""
+    draw_line_chart(pdf, 10, 22, 190, 70, equity, f"Equity Curve (Cumulative PnL %{scope})", count=trade_count)
+    draw_histogram(pdf, 10, 97, 190, 60, histogram(pnls), f"PnL Distribution (% per trade{scope}{sampled})")
+
+    by_pnl = sorted(coin_rows, key=lambda row: row[1], reverse=True)
+    if len(by_pnl) > MAX_BARS:
+        # Best and worst coins; the middle is left out
+        by_pnl = by_pnl[:MAX_BARS // 2] + by_pnl[-(MAX_BARS - MAX_BARS // 2):]
+    draw_bar_chart(pdf, 10, 162, 93, 80, [(c, pnl) for c, pnl, _, _ in by_pnl], "Net PnL by Coin (%)")
+
+    by_count = sorted(coin_rows, key=lambda row: row[3], reverse=True)
+    draw_bar_chart(pdf, 107, 162, 93, 80, [(c, rate) for c, _, rate, _ in by_count],
+                   "Win Rate of Most Traded Coins", value_format="{:.2f}")
+    pdf.set_font("Helvetica", size=12)
@@ -0,0 +1,219 @@
+import argparse
+import json
+import math
+import operator
+import time
+from array import array
+
+import profiler
+
+# math.sumprod (Python 3.12+, see the README) computes a dot product in C; older
+# versions fall back to a much slower map()
+_dot = getattr(math, "sumprod", None) or (lambda a, b: sum(map(operator.mul, a, b)))
+
+
+def daily_coin_series(conn, start_date=None, end_date=None):
+    """
+    Builds the daily PnL and exposure series of every coin.
+
+    The closed trades are summed per (date, coin) in SQLite, so Python only sees one
+    row per coin and trading day. Days on which a coin was not traded count as 0.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    start_date (str): First day ('YYYY-MM-DD'), or None for the earliest trade.
+    end_date (str): Last day ('YYYY-MM-DD'), or None for the latest trade.
+
+    Returns:
+    tuple: (days, coins, pnl, exposure). days and coins are sorted lists; pnl and
+    exposure map each coin to an array('d') with one value per day: the summed
+    leveraged PnL percentage and the summed position value (entry price x size x
+    leverage) of the trades of that day.
+    """
+    conditions = ["t.exit_price IS NOT NULL", "t.entry_price != 0"]
+    parameters = []
+    if start_date:
+        conditions.append("t.date >= ?")
+        parameters.append(start_date)
+    if end_date:
+        conditions.append("t.date <= ?")
+        parameters.append(end_date)
+
+    cursor = conn.cursor()
+    with profiler.span("correlation.daily_series"):
+        cursor.execute(f"""
+            SELECT t.date, c.name,
+                   SUM(CASE WHEN p.name = 'long' THEN t.exit_price - t.entry_price
+                            ELSE t.entry_price - t.exit_price END
+                       / t.entry_price * 100 * t.leverage),
+                   SUM(t.entry_price * t.size * t.leverage)
+            FROM trades t
+            JOIN coins c ON c.id = t.coin_id
+            JOIN positions p ON p.id = t.position_id
+            WHERE {" AND ".join(conditions)}
+            GROUP BY t.date, t.coin_id
+        """, parameters)
+        rows = cursor.fetchall()
+
+    days = sorted({row[0] for row in rows})
+    coins = sorted({row[1] for row in rows})
+    day_index = {day: i for i, day in enumerate(days)}
+    pnl = {coin: array("d", bytes(8 * len(days))) for coin in coins}
+    exposure = {coin: array("d", bytes(8 * len(days))) for coin in coins}
+    for day, coin, pnl_sum, exposure_sum in rows:
+        pnl[coin][day_index[day]] = pnl_sum
+        exposure[coin][day_index[day]] = exposure_sum
+    return days, coins, pnl, exposure
+
+
+def _standardize(values):
+    """
+    Returns the values as z-scores divided by sqrt(n), so the dot product of two
+    standardized series is their Pearson correlation; None if the series is constant.
+    """
+    n = len(values)
+    mean = math.fsum(values) / n
+    centered = array("d", (v - mean for v in values))
+    norm = math.sqrt(_dot(centered, centered))
+    if norm == 0:
+        return None
+    return array("d", (v / norm for v in centered))
+
+
+def correlation_matrix(series):
+    """
+    Computes the Pearson correlation of every pair of series.
+
+    Each series is standardized once; a correlation is then a single dot product
+    of two standardized series, computed in C (math.sumprod), instead of a
+    per-day Python loop for every pair.
+
+    Parameters:
+    series (list of array): Series of equal length (e.g. daily PnL per coin).
+
+    Returns:
+    list of list: matrix[i][j] is the correlation of series i and j, or None if
+    either series is constant.
+    """
+    with profiler.span("correlation.matrix"):
+        standardized = [_standardize(values) if len(values) > 1 else None for values in series]
+        size = len(series)
+        matrix = [[None] * size for _ in range(size)]
+        for i, a in enumerate(standardized):
+            if a is None:
+                continue
+            matrix[i][i] = 1.0
+            for j in range(i + 1, size):
+                b = standardized[j]
+                if b is not None:
+                    matrix[i][j] = matrix[j][i] = max(-1.0, min(1.0, _dot(a, b)))
+    return matrix
+
+
+def concentration(coins, pnl, exposure):
+    """
+    Measures how much of the PnL and exposure sits in a few coins.
+
+    Parameters:
+    coins (list of str): Coin names.
+    pnl (dict): coin -> daily PnL series.
+    exposure (dict): coin -> daily exposure series.
+
+    Returns:
+    dict: "coins": (coin, net_pnl, pnl_share, exposure_share) per coin, by exposure
+    share (largest first). The PnL share is the coin's share of the summed absolute
+    net PnL of all coins. "exposure_hhi" and "pnl_hhi" are the Herfindahl-Hirschman
+    indexes (sum of squared shares, 1 = everything in one coin), and
+    "effective_coins" is 1 / exposure_hhi.
+    """
+    net = {coin: math.fsum(pnl[coin]) for coin in coins}
+    gross = {coin: math.fsum(exposure[coin]) for coin in coins}
+    net_total = math.fsum(abs(v) for v in net.values()) or 1.0
+    gross_total = math.fsum(gross.values()) or 1.0
+    rows = sorted(
+        ((coin, net[coin], abs(net[coin]) / net_total, gross[coin] / gross_total) for coin in coins),
+        key=lambda row: row[3], reverse=True
+    )
+    exposure_hhi = math.fsum(row[3] ** 2 for row in rows)
+    return {
+        "coins": rows,
+        "exposure_hhi": exposure_hhi,
+        "pnl_hhi": math.fsum(row[2] ** 2 for row in rows),
+        "effective_coins": 1 / exposure_hhi if exposure_hhi else 0.0,
+    }
+
+
+def correlated_pairs(coins, matrix, threshold=0.7):
+    """
+    Lists the coin pairs whose daily PnL correlation is at least `threshold` in
+    absolute value, strongest first.
+
+    Returns:
+    list of tuple: (coin_a, coin_b, correlation)
+    """
+    pairs = [
+        (coins[i], coins[j], matrix[i][j])
+        for i in range(len(coins)) for j in range(i + 1, len(coins))
+        if matrix[i][j] is not None and abs(matrix[i][j]) >= threshold
+    ]
+    pairs.sort(key=lambda pair: abs(pair[2]), reverse=True)
+    return pairs
+
+
+def analyze_correlation(conn, start_date=None, end_date=None, min_days=5):
+    """
+    Builds the daily series and computes the correlation matrix and concentration.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    start_date (str): First day ('YYYY-MM-DD'), or None.
+    end_date (str): Last day ('YYYY-MM-DD'), or None.
+    min_days (int): Coins traded on fewer days are left out of the correlation
+        matrix (their correlations would be noise); they still count for concentration.
+
+    Returns:
+    dict: "days" (number of days), "coins" (coins in the matrix), "matrix",
+    "concentration" (see concentration()).
+    """
+    days, coins, pnl, exposure = daily_coin_series(conn, start_date, end_date)
+    active = [coin for coin in coins if sum(1 for v in exposure[coin] if v) >= min_days]
+    return {
+        "days": len(days),
+        "coins": active,
+        "matrix": correlation_matrix([pnl[coin] for coin in active]),
+        "concentration": concentration(coins, pnl, exposure),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-coin daily PnL correlation and concentration.")
+    parser.add_argument("--start", default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--min-days", type=int, default=5, help="Minimum trading days for a coin to be correlated")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Report pairs with at least this |correlation|")
+    parser.add_argument("--json", default=None, help="Also write the full matrix and shares to this JSON file")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    args = parser.parse_args()
+
+    connection = profiler.connect(args.db)
+    started = time.perf_counter()
+    result = analyze_correlation(connection, args.start, args.end, args.min_days)
+    elapsed = time.perf_counter() - started
+    connection.close()
+
+    shares = result["concentration"]
+    print(f"{len(result['coins'])} coins over {result['days']} days ({elapsed:.2f}s)")
+    print(f"Exposure HHI: {shares['exposure_hhi']:.3f} (effective number of coins: {shares['effective_coins']:.1f})")
+    print(f"PnL HHI: {shares['pnl_hhi']:.3f}")
+    print("\nLargest exposure shares:")
+    for coin, net_pnl, pnl_share, exposure_share in shares["coins"][:10]:
+        print(f"  {coin:<10} exposure {exposure_share:6.1%}  PnL share {pnl_share:6.1%}  net PnL {net_pnl:.2f}%")
+    print(f"\nPairs with |correlation| >= {args.threshold:g}:")
+    pairs = correlated_pairs(result["coins"], result["matrix"], args.threshold)
+    for coin_a, coin_b, corr in pairs[:20]:
+        print(f"  {coin_a} / {coin_b}: {corr:.2f}")
+    if not pairs:
+        print("  None.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f)
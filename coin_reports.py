@@ -0,0 +1,311 @@
+import argparse
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from fpdf import FPDF
+
+import profiler
+from archive_trades import load_archived_extremes, load_archived_stats
+from dimensions import load_dimension_names
+from trade_stats import (COUNT, LOSSES, PNL_COUNT, PNL_SUM, WINS, TradeStats, analyze,
+                         calculate_metrics, coin_summary, pnl_percentiles)
+
+PERCENTILES = (1, 5, 50, 95, 99)
+
+
+def split_by_coin(stats):
+    """
+    Splits aggregated trades into one TradeStats per coin.
+
+    Groups and extreme trades are split by their coin and the "coin:<COIN>" sketch
+    becomes the coin's "all" sketch. Sketches by mode or leverage cover several coins
+    and cannot be split, so they are left out.
+
+    Parameters:
+    stats (TradeStats): Aggregated trades of all coins.
+
+    Returns:
+    dict: coin -> TradeStats, in the order the coins were first seen.
+    """
+    per_coin = {}
+    for key, values in stats.groups.items():
+        coin_stats = per_coin.get(key[0])
+        if coin_stats is None:
+            coin_stats = per_coin[key[0]] = TradeStats()
+        coin_stats.add_group(key, values)
+    for side, candidates in stats.extremes.items():
+        for (trade_id, coin, pnl, entry, exit_) in candidates:
+            if coin in per_coin:
+                per_coin[coin].add_extreme(trade_id, coin, side, pnl, entry, exit_)
+    for sketch_key, sketch in stats.sketches.items():
+        coin = sketch_key[5:] if sketch_key.startswith("coin:") else None
+        if coin in per_coin:
+            per_coin[coin].add_sketch("all", sketch)
+            per_coin[coin].add_sketch(sketch_key, sketch)
+    return per_coin
+
+
+def load_coin_stats(conn):
+    """
+    Aggregates every closed trade per coin in one scan of the trades table, plus the
+    summaries of archived trades.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+    dict: coin -> TradeStats, in the order the coins were first seen.
+    """
+    archived = TradeStats()
+    load_archived_stats(conn, archived)
+    # The merged extremes only keep the overall best and worst trades; each coin
+    # gets its own from the archive instead
+    archived.extremes = {"long": [], "short": []}
+    per_coin = split_by_coin(archived)
+    if per_coin:  # something has been archived
+        for (trade_id, coin, side, pnl, entry, exit_) in load_archived_extremes(conn):
+            if coin in per_coin:
+                per_coin[coin].add_extreme(trade_id, coin, side, pnl, entry, exit_)
+
+    cursor = conn.cursor()
+    coins, positions, modes = load_dimension_names(cursor)
+    with profiler.span("coins.scan"):
+        cursor.execute("""
+            SELECT id, coin_id, position_id, leverage, entry_price, exit_price, mode_id
+            FROM trades
+            WHERE exit_price IS NOT NULL
+            ORDER BY id
+        """)
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for (trade_id, coin_id, position_id, lev, entry, exit_, mode_id) in rows:
+                coin = coins[coin_id]
+                coin_stats = per_coin.get(coin)
+                if coin_stats is None:
+                    coin_stats = per_coin[coin] = TradeStats()
+                coin_stats.add_trade(trade_id, coin, positions[position_id], lev, entry, exit_, modes[mode_id])
+            profiler.count("rows_scanned", len(rows))
+    return per_coin
+
+
+def leverage_breakdown(stats):
+    """
+    Sums up the trades of each leverage.
+
+    Parameters:
+    stats (TradeStats): Aggregated trades.
+
+    Returns:
+    list of tuple: (leverage, trade_count, wins, losses, net_pnl, avg_pnl), by leverage.
+    """
+    totals = {}  # leverage -> [count, pnl_count, wins, losses, pnl_sum]
+    for (coin, position, mode, leverage), values in stats.groups.items():
+        row = totals.setdefault(leverage, [0, 0, 0, 0, 0.0])
+        row[0] += values[COUNT]
+        row[1] += values[PNL_COUNT]
+        row[2] += values[WINS]
+        row[3] += values[LOSSES]
+        row[4] += values[PNL_SUM]
+    return [
+        (leverage, count, wins, losses, pnl_sum, pnl_sum / pnl_count if pnl_count else 0.0)
+        for leverage, (count, pnl_count, wins, losses, pnl_sum) in sorted(totals.items())
+    ]
+
+
+def coin_figures(coin, stats):
+    """
+    Calculates everything a coin report shows. The result is plain data, so it is
+    cheap to send to a worker process.
+
+    Parameters:
+    coin (str): Coin name.
+    stats (TradeStats): The coin's aggregated trades.
+
+    Returns:
+    dict: The figures of the coin report.
+    """
+    percentiles = pnl_percentiles(stats, "all", PERCENTILES)
+    return {
+        "coin": coin,
+        "metrics": calculate_metrics(stats),
+        "analysis": analyze(stats),
+        "leverage": leverage_breakdown(stats),
+        "percentiles": percentiles[1] if percentiles else None,
+    }
+
+
+def report_file_name(coin):
+    """
+    Returns the PDF file name of a coin report. Characters that are not safe in file
+    names are replaced; the name then gets a checksum of the coin name, so coins
+    such as "BTC/USD" and "BTC-USD" never share a file.
+    """
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", coin)
+    if safe != coin:
+        safe += f"~{zlib.crc32(coin.encode('utf-8')):08x}"
+    return safe + ".pdf"
+
+
+def _trade_lines(pdf, title, trades):
+    pdf.cell(200, 8, txt=title, align="L", ln=1)
+    if trades:
+        for (coin, pnl, entry, exit_) in trades:
+            pdf.cell(200, 8, txt=f"  {pnl:.2f}% (Entry: {entry}, Exit: {exit_})", align="L", ln=1)
+    else:
+        pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
+    pdf.ln(3)
+
+
+def render_coin_report(figures, path, date_str):
+    """
+    Writes the drill-down PDF of one coin.
+
+    Parameters:
+    figures (dict): Output of coin_figures().
+    path (str): PDF file to write.
+    date_str (str): Date shown in the title.
+    """
+    coin = figures["coin"]
+    metrics = figures["metrics"]
+    analysis = figures["analysis"]
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    pdf.cell(200, 10, txt=f"{coin} TRADING REPORT - {date_str}", align="C", ln=1)
+    pdf.ln(5)
+
+    # --- METRICS ---
+    pdf.cell(200, 10, txt="[METRICS]", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Total Trades: {metrics['total_trades']}", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Most Used Position: {metrics['top_position']}", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Most Used Leverage: {metrics['top_leverage']}x", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Average PnL: {metrics['best_coin_avg_pnl']:.2f}%", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Highest Single Trade PnL: {metrics['max_pnl']:.2f}%", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Lowest Single Trade PnL: {metrics['min_pnl']:.2f}%", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Net PnL (Total): {metrics['net_pnl']:.2f}%", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Real Trades: {analysis['real_count']} (Wins: {analysis['real_win']}, Losses: {analysis['real_loss']})", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Demo Trades: {analysis['demo_count']} (Wins: {analysis['demo_win']}, Losses: {analysis['demo_loss']})", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Long Trades: {analysis['long_count']} (Wins: {analysis['long_win']}, Losses: {analysis['long_loss']})", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Short Trades: {analysis['short_count']} (Wins: {analysis['short_win']}, Losses: {analysis['short_loss']})", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Average Spot PnL: {analysis['avg_spot_pnl']:.2f}% | Average Leveraged PnL: {analysis['avg_lev_pnl']:.2f}%", align="L", ln=1)
+    if figures["percentiles"]:
+        p1, p5, p50, p95, p99 = figures["percentiles"]
+        pdf.cell(200, 8, txt=f"PnL Percentiles (approx.): p1 {p1:.2f}% | p5 {p5:.2f}% | median {p50:.2f}% | p95 {p95:.2f}% | p99 {p99:.2f}%", align="L", ln=1)
+    pdf.ln(5)
+
+    # --- TOP AND WORST TRADES ---
+    pdf.cell(200, 10, txt="[TOP AND WORST TRADES]", align="L", ln=1)
+    _trade_lines(pdf, "Top 3 Long Trades:", analysis['top3_long'])
+    _trade_lines(pdf, "Worst 3 Long Trades:", analysis['worst3_long'])
+    _trade_lines(pdf, "Top 3 Short Trades:", analysis['top3_short'])
+    _trade_lines(pdf, "Worst 3 Short Trades:", analysis['worst3_short'])
+    pdf.ln(2)
+
+    # --- LEVERAGE BREAKDOWN ---
+    pdf.cell(200, 10, txt="[LEVERAGE BREAKDOWN]", align="L", ln=1)
+    pdf.set_font("Helvetica", size=10)
+    for (leverage, count, wins, losses, net_pnl, avg_pnl) in figures["leverage"]:
+        pdf.cell(200, 7, txt=f"{leverage}x: {count} trades (Wins: {wins}, Losses: {losses}) | Net PnL: {net_pnl:.2f}% | Average PnL: {avg_pnl:.2f}%", align="L", ln=1)
+    pdf.set_font("Helvetica", size=12)
+
+    pdf.output(path)
+
+
+def _render_jobs(jobs):
+    for figures, path, date_str in jobs:
+        render_coin_report(figures, path, date_str)
+    return len(jobs)
+
+
+def render_index(rows, path, date_str):
+    """
+    Writes the index PDF with one linked line per coin report.
+
+    Parameters:
+    rows (list of tuple): (coin, file_name, trade_count, net_pnl, win_rate) per coin.
+    path (str): PDF file to write, in the same folder as the coin reports.
+    date_str (str): Date shown in the title.
+    """
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    pdf.cell(200, 10, txt=f"COIN REPORTS - {date_str}", align="C", ln=1)
+    pdf.ln(5)
+    pdf.set_font("Helvetica", size=10)
+    for (coin, file_name, count, net_pnl, win_rate) in rows:
+        pdf.set_text_color(30, 90, 200)
+        pdf.cell(40, 7, txt=coin, align="L", link=file_name)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(160, 7, txt=f"{count} trades | Net PnL: {net_pnl:.2f}% | Win Rate: {win_rate:.2f}", align="L", ln=1)
+    pdf.output(path)
+
+
+def generate_coin_reports(conn, output_dir=None, processes=1):
+    """
+    Generates a drill-down PDF for every coin plus an index PDF linking them.
+
+    The trades are read in one scan and aggregated per coin; the PDFs are then
+    rendered from the small per-coin figures, spread over a process pool when
+    processes > 1 (each worker renders a batch of coins).
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    output_dir (str): Folder for the PDFs (default reports/coins_<today>).
+    processes (int): Worker processes (1 renders in-process).
+
+    Returns:
+    str: Path of the index PDF.
+    """
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    if output_dir is None:
+        output_dir = os.path.join("reports", f"coins_{date_str}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    per_coin = load_coin_stats(conn)
+    with profiler.span("coins.figures"):
+        jobs = []
+        index_rows = []
+        for coin, stats in per_coin.items():
+            figures = coin_figures(coin, stats)
+            file_name = report_file_name(coin)
+            jobs.append((figures, os.path.join(output_dir, file_name), date_str))
+            _, net_pnl, win_rate, _ = coin_summary(stats)[0]
+            index_rows.append((coin, file_name, figures["metrics"]["total_trades"], net_pnl, win_rate))
+        index_rows.sort(key=lambda row: row[0])
+
+    with profiler.span("coins.render"):
+        if processes > 1 and len(jobs) > 1:
+            # A few batches per worker, so a slow coin does not hold up the rest
+            batch = max(1, len(jobs) // (processes * 4))
+            batches = [jobs[i:i + batch] for i in range(0, len(jobs), batch)]
+            with ProcessPoolExecutor(min(processes, len(batches))) as pool:
+                for _ in pool.map(_render_jobs, batches):
+                    pass
+        else:
+            _render_jobs(jobs)
+
+    index_path = os.path.join(output_dir, "index.pdf")
+    render_index(index_rows, index_path, date_str)
+    return index_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a drill-down PDF report for every coin.")
+    parser.add_argument("--output-dir", default=None, help="Folder for the PDFs (default reports/coins_<today>)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    args = parser.parse_args()
+
+    connection = profiler.connect(args.db)
+    started = time.perf_counter()
+    index_file = generate_coin_reports(connection, args.output_dir, args.processes)
+    elapsed = time.perf_counter() - started
+    connection.close()
+    print(f"Coin reports generated in {elapsed:.2f}s: {index_file}")
@@ -0,0 +1,350 @@
+import argparse
+import bisect
+import json
+import math
+import mmap
+import os
+import sqlite3
+import struct
+from array import array
+
+import profiler
+from dimensions import load_dimension_names
+from setup_database import create_trade_revision_table
+
+# Snapshots written with another format version are rebuilt
+SNAPSHOT_FORMAT = 2
+META_FILE = "meta.json"
+
+# Column name -> array typecode. Each column is a file of fixed-width native values
+# in trade id order. Open positions have a NaN exit_price; date is YYYYMMDD as an
+# integer (0 if the stored date is not 'YYYY-MM-DD'); entry_time and exit_time are
+# epoch milliseconds (0 if not recorded).
+COLUMNS = (
+    ("id", "q"),
+    ("coin_id", "i"),
+    ("position_id", "b"),
+    ("mode_id", "b"),
+    ("date", "i"),
+    ("leverage", "d"),
+    ("entry_price", "d"),
+    ("exit_price", "d"),
+    ("size", "d"),
+    ("entry_time", "q"),
+    ("exit_time", "q"),
+)
+
+TRADE_COLUMNS = ("id, coin_id, position_id, mode_id, date, leverage, entry_price, exit_price, size, "
+                 "entry_time, exit_time")
+
+
+def snapshot_dir(database):
+    """
+    Returns the snapshot directory of a database ('trade_data.db' -> 'trade_data.columns').
+    """
+    return os.path.splitext(database)[0] + ".columns"
+
+
+def _date_key(text):
+    try:
+        return int(text[0:4] + text[5:7] + text[8:10]) if len(text) >= 10 else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _encode(rows):
+    """
+    Converts trade rows (in TRADE_COLUMNS order) into one array per column.
+    """
+    columns = [array(code) for _, code in COLUMNS]
+    (ids, coin_ids, position_ids, mode_ids, dates,
+     leverages, entries, exits, sizes, entry_times, exit_times) = columns
+    for (trade_id, coin_id, position_id, mode_id, dte, lev, entry, exit_, size, entry_time, exit_time) in rows:
+        ids.append(trade_id)
+        coin_ids.append(coin_id)
+        position_ids.append(position_id)
+        mode_ids.append(mode_id)
+        dates.append(_date_key(dte))
+        leverages.append(lev)
+        entries.append(entry)
+        exits.append(math.nan if exit_ is None else exit_)
+        sizes.append(1.0 if size is None else size)
+        entry_times.append(entry_time or 0)
+        exit_times.append(exit_time or 0)
+    return columns
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("format") == SNAPSHOT_FORMAT else None
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, META_FILE)
+    with open(path + ".part", "w") as f:
+        json.dump(meta, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".part", path)
+
+
+def _last_row_key(cursor, trade_id):
+    """
+    Returns what identifies the trade with the given id (coin, position, date and entry
+    price), or None if there is no such trade. A different value under the same id
+    means the trades table was recreated.
+    """
+    row = cursor.execute(
+        "SELECT coin_id, position_id, date, entry_price FROM trades WHERE id = ?", (trade_id,)
+    ).fetchone()
+    return list(row) if row is not None else None
+
+
+def _sequence(cursor):
+    """
+    Returns the AUTOINCREMENT counter of the trades table (0 if it has none yet).
+    """
+    try:
+        row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'trades'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row is not None else 0
+
+
+def _matches_table(cursor, meta):
+    """
+    Checks that a snapshot still describes the current trades table. Recreating the
+    table (e.g. populate_trades.py) fires no trigger, so besides the revision the
+    highest id, the AUTOINCREMENT counter and the last exported row are compared.
+    """
+    if not meta["last_id"]:
+        return True
+    max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM trades").fetchone()[0]
+    return (
+        max_id >= meta["last_id"]
+        and _sequence(cursor) >= meta.get("sequence", 0)
+        and _last_row_key(cursor, meta["last_id"]) == meta.get("last_row")
+    )
+
+
+def _column_path(directory, name):
+    return os.path.join(directory, name + ".col")
+
+
+def refresh_snapshot(conn, directory):
+    """
+    Brings the columnar snapshot of the trades table up to date.
+
+    Trades with an id above the last exported one are appended to the column files,
+    and positions that were open at the last export are rewritten in place (they may
+    have been closed or edited since). The snapshot is rebuilt from scratch when there
+    is none yet, when it has another format, when the trade_revision counter shows
+    that a closed trade was updated or a trade deleted since it was written, or when
+    the trades table no longer holds the last exported trade under its id or its ids
+    went backwards (the table was dropped and recreated).
+
+    The column files are appended first and meta.json is replaced last, so a reader
+    never sees rows that are not complete in every column; leftovers of an interrupted
+    refresh are cut off by the next one.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    directory (str): Snapshot directory (see snapshot_dir()).
+
+    Returns:
+    tuple: (appended_rows, rebuilt)
+    """
+    create_trade_revision_table(conn)
+    conn.commit()
+    os.makedirs(directory, exist_ok=True)
+    cursor = conn.cursor()
+
+    # Read the counter and the rows in one read transaction
+    cursor.execute("BEGIN")
+    try:
+        revision = cursor.execute("SELECT revision FROM trade_revision WHERE id = 1").fetchone()[0]
+        meta = _read_meta(directory)
+        rebuilt = meta is None or meta["revision"] != revision or not _matches_table(cursor, meta)
+        if rebuilt:
+            meta = {"format": SNAPSHOT_FORMAT, "revision": revision, "rows": 0, "last_id": 0, "open_ids": []}
+
+        with profiler.span("snapshot.patch_open"):
+            for name, code in COLUMNS:
+                path = _column_path(directory, name)
+                if rebuilt and os.path.exists(path):
+                    # New files; snapshots open in other processes keep the old ones mapped
+                    os.remove(path)
+                with open(path, "ab") as f:
+                    f.truncate(meta["rows"] * array(code).itemsize)
+            open_rows = cursor.execute(f"""
+                SELECT {TRADE_COLUMNS} FROM trades
+                WHERE id IN (SELECT value FROM json_each(?))
+                ORDER BY id
+            """, (json.dumps(meta["open_ids"]),)).fetchall()
+            if open_rows:
+                _patch_rows(directory, meta["rows"], open_rows)
+            still_open = [row[0] for row in open_rows if row[7] is None]
+
+        with profiler.span("snapshot.append"):
+            cursor.execute(f"SELECT {TRADE_COLUMNS} FROM trades WHERE id > ? ORDER BY id", (meta["last_id"],))
+            files = [open(_column_path(directory, name), "ab") for name, _ in COLUMNS]
+            appended = 0
+            try:
+                while True:
+                    rows = cursor.fetchmany(10000)
+                    if not rows:
+                        break
+                    for f, column in zip(files, _encode(rows)):
+                        column.tofile(f)
+                    still_open.extend(row[0] for row in rows if row[7] is None)
+                    meta["last_id"] = rows[-1][0]
+                    appended += len(rows)
+                for f in files:
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                for f in files:
+                    f.close()
+            profiler.count("rows_scanned", appended + len(open_rows))
+
+        coins, positions, modes = load_dimension_names(cursor)
+        meta["sequence"] = _sequence(cursor)
+        meta["last_row"] = _last_row_key(cursor, meta["last_id"])
+    finally:
+        conn.commit()
+
+    meta["rows"] += appended
+    meta["open_ids"] = still_open
+    meta["coins"] = coins
+    meta["positions"] = positions
+    meta["modes"] = modes
+    _write_meta(directory, meta)
+    return appended, rebuilt
+
+
+def _patch_rows(directory, row_count, rows):
+    """
+    Overwrites existing snapshot rows in place; rows are found by id.
+    """
+    with open(_column_path(directory, "id"), "rb") as f:
+        ids = array("q")
+        ids.fromfile(f, row_count)
+    positions = [bisect.bisect_left(ids, row[0]) for row in rows]
+    for (name, code), column in zip(COLUMNS, _encode(rows)):
+        width = column.itemsize
+        with open(_column_path(directory, name), "r+b") as f:
+            for position, value in zip(positions, column):
+                f.seek(position * width)
+                f.write(struct.pack("=" + code, value))
+
+
+class ColumnarSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot written by refresh_snapshot().
+
+    Every column in COLUMNS is an attribute holding a memoryview over the mapped
+    file, so opening a snapshot copies nothing and costs the same for any number of
+    trades; pages are read from disk (or the OS cache) as they are accessed.
+    coins, positions and modes map the ids to names.
+    """
+    def __init__(self, directory):
+        """
+        Parameters:
+        directory (str): Snapshot directory (see snapshot_dir()).
+
+        Raises:
+        FileNotFoundError: If there is no snapshot in the directory.
+        """
+        meta = _read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"No snapshot in {directory}; run refresh_snapshot() first.")
+        self.rows = meta["rows"]
+        self.last_id = meta["last_id"]
+        self.coins = {int(k): v for k, v in meta["coins"].items()}
+        self.positions = {int(k): v for k, v in meta["positions"].items()}
+        self.modes = {int(k): v for k, v in meta["modes"].items()}
+        self._maps = []
+        for name, code in COLUMNS:
+            if self.rows:
+                with open(_column_path(directory, name), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                # The file may be longer while a refresh is appending to it
+                view = memoryview(mapped)[:self.rows * array(code).itemsize].cast(code)
+            else:
+                view = memoryview(array(code))
+            setattr(self, name, view)
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        """
+        Releases the column views and unmaps the files.
+        """
+        for name, _ in COLUMNS:
+            getattr(self, name).release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def date_order(self, closed_only=True):
+        """
+        Returns row indexes sorted by date, then id (the order of the analytics
+        queries' ORDER BY date, id).
+
+        Parameters:
+        closed_only (bool): Leave out open positions.
+        """
+        exits = self.exit_price
+        indexes = range(self.rows)
+        if closed_only:
+            # NaN is the only value not equal to itself
+            indexes = [i for i in indexes if exits[i] == exits[i]]
+        return sorted(indexes, key=self.date.__getitem__)
+
+
+def open_snapshot(database, refresh=True):
+    """
+    Refreshes (optionally) and opens the snapshot of a database file.
+
+    Parameters:
+    database (str): Database file.
+    refresh (bool): Append new trades first; without it a stale snapshot is used as is.
+
+    Returns:
+    ColumnarSnapshot: The opened snapshot; close() it when done.
+    """
+    directory = snapshot_dir(database)
+    if refresh:
+        conn = profiler.connect(database)
+        try:
+            with profiler.span("snapshot.refresh"):
+                refresh_snapshot(conn, directory)
+        finally:
+            conn.close()
+    return ColumnarSnapshot(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trades table to a memory-mappable columnar snapshot.")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    args = parser.parse_args()
+
+    connection = profiler.connect(args.db)
+    target = snapshot_dir(args.db)
+    added, from_scratch = refresh_snapshot(connection, target)
+    connection.close()
+    with ColumnarSnapshot(target) as snapshot:
+        action = "Rebuilt" if from_scratch else "Updated"
+        print(f"{action} {target}: {added} rows appended, {len(snapshot)} rows, last id {snapshot.last_id}.")
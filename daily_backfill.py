@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import sqlite3
+
+from fpdf import FPDF
+
+import profiler
+from dimensions import load_dimension_names
+from report_generator import add_daily_section
+from setup_database import create_daily_stats_table
+from trade_stats import TradeStats, calculate_metrics
+
+# Order of the metrics in the daily_stats table
+METRIC_COLUMNS = (
+    "total_trades", "top_coin", "top_coin_count", "top_position", "top_leverage",
+    "best_coin", "best_coin_avg_pnl", "worst_coin", "worst_coin_avg_pnl",
+    "max_pnl", "min_pnl", "net_pnl",
+)
+
+
+def iter_daily_stats(conn, start_date=None, end_date=None):
+    """
+    Yields the daily report figures of every day with closed trades in a range.
+
+    The trades are read in one scan ordered by date (using the date index), and
+    each day's figures are computed when the scan moves on to the next day, so the
+    cost is one pass however many days the range covers. Within a day trades are
+    added in id order, as in the report, so ties are decided the same way.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    start_date (str): First day ('YYYY-MM-DD'), or None for the earliest trade.
+    end_date (str): Last day ('YYYY-MM-DD'), or None for the latest trade.
+
+    Yields:
+    tuple: (date, metrics) with metrics as returned by calculate_metrics().
+    """
+    conditions = ["exit_price IS NOT NULL"]
+    parameters = []
+    if start_date:
+        conditions.append("date >= ?")
+        parameters.append(start_date)
+    if end_date:
+        conditions.append("date <= ?")
+        parameters.append(end_date)
+
+    cursor = conn.cursor()
+    coins, positions, modes = load_dimension_names(cursor)
+    cursor.execute(f"""
+        SELECT id, coin_id, position_id, leverage, entry_price, exit_price, mode_id, date
+        FROM trades
+        WHERE {" AND ".join(conditions)}
+        ORDER BY date, id
+    """, parameters)
+
+    day = None
+    stats = None
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        for (trade_id, coin_id, position_id, lev, entry, exit_, mode_id, dte) in rows:
+            if dte != day:
+                if stats is not None:
+                    yield day, calculate_metrics(stats)
+                day = dte
+                stats = TradeStats()
+            stats.add_trade(trade_id, coins[coin_id], positions[position_id], lev, entry, exit_, modes[mode_id])
+        profiler.count("rows_scanned", len(rows))
+    if stats is not None:
+        yield day, calculate_metrics(stats)
+
+
+def save_daily_stats(conn, days):
+    """
+    Stores daily figures in the daily_stats table in one transaction, replacing
+    earlier figures of the same days.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    days (iterable of tuple): (date, metrics) pairs, e.g. from iter_daily_stats().
+
+    Returns:
+    int: Number of days stored.
+    """
+    create_daily_stats_table(conn)
+    rows = [(day, *(metrics[column] for column in METRIC_COLUMNS)) for day, metrics in days]
+    try:
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO daily_stats (date, {", ".join(METRIC_COLUMNS)})
+            VALUES ({", ".join("?" * (len(METRIC_COLUMNS) + 1))})
+        """, rows)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def write_daily_files(days, output_dir, pdf=False):
+    """
+    Writes one JSON file (and optionally one PDF with the daily report section)
+    per day into a folder.
+
+    Parameters:
+    days (iterable of tuple): (date, metrics) pairs, e.g. from iter_daily_stats().
+    output_dir (str): Folder for the files (daily_<date>.json / .pdf).
+    pdf (bool): Also write the PDFs.
+
+    Returns:
+    int: Number of days written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    count = 0
+    for day, metrics in days:
+        with open(os.path.join(output_dir, f"daily_{day}.json"), "w") as f:
+            json.dump({"date": day, **metrics}, f, indent=2)
+        if pdf:
+            document = FPDF()
+            document.add_page()
+            document.set_font("Helvetica", size=12)
+            add_daily_section(document, day, metrics)
+            document.output(os.path.join(output_dir, f"daily_{day}.pdf"))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the daily report figures of every trading day in one pass.")
+    parser.add_argument("--start", default=None, help="First day (YYYY-MM-DD); default: the earliest trade")
+    parser.add_argument("--end", default=None, help="Last day (YYYY-MM-DD); default: the latest trade")
+    parser.add_argument("--output-dir", default=None,
+                        help="Write daily_<date>.json files to this folder instead of the daily_stats table")
+    parser.add_argument("--pdf", action="store_true", help="With --output-dir, also write a PDF per day")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    args = parser.parse_args()
+
+    connection = profiler.connect(args.db)
+    daily = iter_daily_stats(connection, args.start, args.end)
+    with profiler.span("backfill"):
+        if args.output_dir:
+            written = write_daily_files(daily, args.output_dir, args.pdf)
+            print(f"Wrote the figures of {written} days to {args.output_dir}.")
+        else:
+            written = save_daily_stats(connection, daily)
+            print(f"Stored the figures of {written} days in the daily_stats table.")
+    connection.close()
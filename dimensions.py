@@ -0,0 +1,129 @@
+from timestamps import date_from_ms
+
+POSITIONS = ("long", "short")
+MODES = ("real", "demo")
+
+# Inserts a trade given its canonical names; the ids are looked up in the dimension tables
+INSERT_TRADE_SQL = """
+    INSERT INTO trades (coin_id, position_id, mode_id, date, leverage, entry_price, exit_price, size,
+                        entry_time, exit_time)
+    VALUES (
+        (SELECT id FROM coins WHERE name = ?),
+        (SELECT id FROM positions WHERE name = ?),
+        (SELECT id FROM modes WHERE name = ?),
+        ?, ?, ?, ?, ?, ?, ?
+    )
+"""
+
+
+def canonical_coin(name):
+    """
+    Returns the canonical spelling of a coin name ("btc " -> "BTC").
+
+    Raises:
+    ValueError: If the name is empty.
+    """
+    coin = name.strip().upper()
+    if not coin:
+        raise ValueError("Coin name cannot be empty.")
+    return coin
+
+
+def canonical_position(name):
+    """
+    Returns the canonical position name ('long' or 'short').
+
+    Raises:
+    ValueError: If the name is neither.
+    """
+    position = name.strip().lower()
+    if position not in POSITIONS:
+        raise ValueError("Position must be 'long' or 'short'.")
+    return position
+
+
+def canonical_mode(name):
+    """
+    Returns the canonical mode name ('real' or 'demo').
+
+    Raises:
+    ValueError: If the name is neither.
+    """
+    mode = name.strip().lower()
+    if mode not in MODES:
+        raise ValueError("Mode must be 'real' or 'demo'.")
+    return mode
+
+
+def load_dimension_names(cursor):
+    """
+    Reads the id -> name mappings of the dimension tables.
+
+    Reading trades by id and mapping the names in Python is cheaper than joining
+    the tables (the trade_details view) for full scans.
+
+    Returns:
+    tuple: (coins, positions, modes) dictionaries.
+    """
+    return tuple(
+        dict(cursor.execute(f"SELECT id, name FROM {table}").fetchall())
+        for table in ("coins", "positions", "modes")
+    )
+
+
+def insert_trades(cursor, trades):
+    """
+    Inserts trades, adding coins that are not known yet.
+
+    Parameters:
+    cursor (sqlite3.Cursor): Cursor of the connection to write with.
+    trades (list of tuple): (coin_name, position, mode, date, leverage, entry_price, exit_price, size)
+        rows, optionally followed by entry_time and exit_time in epoch milliseconds;
+        names are canonicalized here. If a row has an entry_time, its date is derived
+        from it (the date given may then be None).
+
+    Returns:
+    list of int: The ids of the new trades, in the order of `trades`.
+
+    Raises:
+    ValueError: If a position or mode name is invalid.
+    """
+    if not trades:
+        return []
+    rows = []
+    for (coin, position, mode, date, *rest) in trades:
+        entry_time, exit_time = rest[4:6] if len(rest) > 4 else (None, None)
+        if entry_time is not None:
+            date = date_from_ms(entry_time)
+        rows.append((canonical_coin(coin), canonical_position(position), canonical_mode(mode),
+                     date, *rest[:4], entry_time, exit_time))
+    cursor.executemany("INSERT OR IGNORE INTO coins (name) VALUES (?)", {(row[0],) for row in rows})
+    if len(rows) == 1:
+        cursor.execute(INSERT_TRADE_SQL, rows[0])
+        return [cursor.lastrowid]
+    # executemany() does not report the ids it assigned. With AUTOINCREMENT every new
+    # row gets the next id after the largest one ever used, and the write lock held
+    # for the insert keeps other connections out, so the rows get consecutive ids
+    # starting after the sequence value read here.
+    cursor.execute("""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'trades'), 0),
+                   COALESCE((SELECT MAX(id) FROM trades), 0))
+    """)
+    first_id = cursor.fetchone()[0] + 1
+    cursor.executemany(INSERT_TRADE_SQL, rows)
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    if last_id != first_id + len(rows) - 1:
+        raise RuntimeError("The inserted trades did not get consecutive ids.")
+    return list(range(first_id, last_id + 1))
+
+
+def insert_trade(cursor, coin_name, position, mode, date, leverage, entry_price, exit_price=None, size=1,
+                 entry_time=None, exit_time=None):
+    """
+    Inserts a single trade (see insert_trades()).
+
+    Returns:
+    int: The id of the new trade.
+    """
+    return insert_trades(cursor, [(coin_name, position, mode, date, leverage, entry_price, exit_price, size,
+                                   entry_time, exit_time)])[0]
@@ -0,0 +1,339 @@
+import argparse
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import profiler
+from columnar_snapshot import open_snapshot
+
+
+class LeverageScenario:
+    """
+    An alternative leverage policy to re-evaluate the trade history under.
+
+    kind is one of:
+        "actual"   - the leverage actually used
+        "fixed"    - every trade at `value`x
+        "cap"      - the actual leverage, capped at `value`x
+        "per_coin" - the actual leverage multiplied by a per-coin factor
+    """
+    def __init__(self, name, kind, value=None, coin_factors=None, default_factor=1.0):
+        """
+        Parameters:
+        name (str): Label shown in the result table.
+        kind (str): Policy type (see class docstring).
+        value (float): Leverage for "fixed", cap for "cap".
+        coin_factors (dict): coin -> factor for "per_coin".
+        default_factor (float): Factor for coins not in coin_factors.
+        """
+        self.name = name
+        self.kind = kind
+        self.value = value
+        self.coin_factors = {k.lower(): v for k, v in (coin_factors or {}).items()}
+        self.default_factor = default_factor
+
+    @classmethod
+    def actual(cls):
+        return cls("actual", "actual")
+
+    @classmethod
+    def fixed(cls, leverage):
+        return cls(f"fixed {leverage:g}x", "fixed", value=leverage)
+
+    @classmethod
+    def cap(cls, leverage):
+        return cls(f"cap {leverage:g}x", "cap", value=leverage)
+
+    @classmethod
+    def per_coin(cls, coin_factors, default_factor=1.0):
+        label = ",".join(f"{coin}*{factor:g}" for coin, factor in coin_factors.items())
+        return cls(f"scale {label}", "per_coin", coin_factors=coin_factors, default_factor=default_factor)
+
+
+class TradeMoves:
+    """
+    The trade history decoded once into flat typed columns, ordered by date.
+
+    move is the direction-adjusted unleveraged price move in percent (the spot PnL),
+    so the leveraged PnL of a trade under any policy is move * leverage.
+    """
+    def __init__(self):
+        self.coins = []          # coin index -> coin name
+        self.coin_index = array("i")
+        self.leverage = array("d")
+        self.move = array("d")
+
+    def __len__(self):
+        return len(self.move)
+
+    def append(self, coin, position, leverage, entry_price, exit_price, coin_ids):
+        """
+        Adds one closed trade. Trades with an entry price of 0 are skipped, as in the report.
+        """
+        if entry_price == 0:
+            return
+        if position.lower() == "long":
+            move = (exit_price - entry_price) / entry_price * 100
+        else:
+            move = (entry_price - exit_price) / entry_price * 100
+        key = coin.lower()
+        idx = coin_ids.get(key)
+        if idx is None:
+            idx = coin_ids[key] = len(self.coins)
+            self.coins.append(key)
+        self.coin_index.append(idx)
+        self.leverage.append(leverage)
+        self.move.append(move)
+
+
+def load_trade_moves(conn):
+    """
+    Reads every closed trade from the database into a TradeMoves object.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+    TradeMoves: The decoded trade history.
+    """
+    moves = TradeMoves()
+    coin_ids = {}
+    cursor = conn.cursor()
+    with profiler.span("whatif.load"):
+        cursor.execute("""
+            SELECT coin_name, position, leverage, entry_price, exit_price
+            FROM trade_details
+            WHERE exit_price IS NOT NULL
+            ORDER BY date, id
+        """)
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for coin, position, leverage, entry, exit_ in rows:
+                moves.append(coin, position, leverage, entry, exit_, coin_ids)
+            profiler.count("rows_scanned", len(rows))
+    return moves
+
+
+def trade_moves_from_snapshot(snapshot):
+    """
+    Builds the same TradeMoves as load_trade_moves() from a memory-mapped columnar
+    snapshot (see columnar_snapshot.py) instead of the database.
+
+    Parameters:
+    snapshot (ColumnarSnapshot): The opened snapshot.
+
+    Returns:
+    TradeMoves: The decoded trade history.
+    """
+    moves = TradeMoves()
+    coin_ids = {}
+    with profiler.span("whatif.load_snapshot"):
+        coins, positions = snapshot.coins, snapshot.positions
+        coin_id, position_id = snapshot.coin_id, snapshot.position_id
+        leverage, entry, exit_ = snapshot.leverage, snapshot.entry_price, snapshot.exit_price
+        order = snapshot.date_order()
+        for i in order:
+            moves.append(coins[coin_id[i]], positions[position_id[i]], leverage[i], entry[i], exit_[i], coin_ids)
+        profiler.count("rows_scanned", len(order))
+    return moves
+
+
+class _ScenarioTotals:
+    """
+    Running totals of one scenario, updated trade by trade during the sweep.
+    """
+    __slots__ = ("equity", "peak", "drawdown", "wins", "liquidations", "leverage_sum")
+
+    def __init__(self):
+        self.equity = 0.0
+        self.peak = 0.0
+        self.drawdown = 0.0
+        self.wins = 0
+        self.liquidations = 0
+        self.leverage_sum = 0.0
+
+
+def _leverage_rule(scenario, moves):
+    """
+    Returns (kind, parameter) used to compute a trade's leverage under a scenario:
+    the fixed leverage, the cap, or the per-coin factors indexed like moves.coins.
+    """
+    if scenario.kind == "fixed":
+        return "fixed", float(scenario.value)
+    if scenario.kind == "actual":
+        return "actual", None
+    if scenario.kind == "cap":
+        return "cap", float(scenario.value)
+    if scenario.kind == "per_coin":
+        return "per_coin", [scenario.coin_factors.get(coin, scenario.default_factor) for coin in moves.coins]
+    raise ValueError(f"Unknown scenario kind: {scenario.kind}")
+
+
+def _evaluate_batch(moves, scenarios):
+    """
+    Evaluates a batch of scenarios in a single pass over the trade history, keeping
+    one set of running totals per scenario.
+    """
+    n = len(moves)
+    rules = [_leverage_rule(scenario, moves) for scenario in scenarios]
+    totals = [_ScenarioTotals() for _ in scenarios]
+    batch = list(zip(rules, totals))
+    with profiler.span("whatif.batch"):
+        for move, actual, coin in zip(moves.move, moves.leverage, moves.coin_index):
+            for (kind, parameter), t in batch:
+                if kind == "fixed":
+                    leverage = parameter
+                elif kind == "actual":
+                    leverage = actual
+                elif kind == "cap":
+                    leverage = actual if actual < parameter else parameter
+                else:
+                    leverage = actual * parameter[coin]
+                pnl = move * leverage
+                if pnl <= -100.0:
+                    pnl = -100.0
+                    t.liquidations += 1
+                elif pnl > 0.0:
+                    t.wins += 1
+                t.leverage_sum += leverage
+                equity = t.equity + pnl
+                t.equity = equity
+                if equity > t.peak:
+                    t.peak = equity
+                elif t.peak - equity > t.drawdown:
+                    t.drawdown = t.peak - equity
+        profiler.count("whatif.trade_scenarios", n * len(scenarios))
+
+    results = []
+    for scenario, ((kind, parameter), t) in zip(scenarios, batch):
+        if kind == "fixed":
+            avg_leverage = parameter
+        else:
+            avg_leverage = t.leverage_sum / n if n else 0.0
+        results.append({
+            "scenario": scenario.name,
+            "trades": n,
+            "net_pnl": t.equity,
+            "win_rate": t.wins / n if n else 0.0,
+            "max_drawdown": t.drawdown,
+            "liquidations": t.liquidations,
+            "avg_leverage": avg_leverage,
+        })
+    return results
+
+
+_worker_moves = None
+
+
+def _init_worker(moves):
+    global _worker_moves
+    _worker_moves = moves
+
+
+def _evaluate_in_worker(scenarios):
+    return _evaluate_batch(_worker_moves, scenarios)
+
+
+def sweep(moves, scenarios, processes=1):
+    """
+    Re-evaluates the whole trade history under every scenario.
+
+    All scenarios are evaluated together in one pass over the trades: each trade is
+    read once and applied to a set of running totals per scenario (equity, peak,
+    drawdown, wins, liquidations). A trade is liquidated when its leveraged loss
+    reaches 100% of the margin, i.e. an adverse move of at least 1/leverage.
+    With processes > 1 the scenarios are split into one batch per worker; each
+    worker receives the history once and makes its own single pass.
+
+    Parameters:
+    moves (TradeMoves): The decoded trade history.
+    scenarios (list of LeverageScenario): Policies to evaluate.
+    processes (int): Number of worker processes.
+
+    Returns:
+    list of dict: One row per scenario (in input order) with net_pnl, win_rate,
+    max_drawdown, liquidations and avg_leverage.
+    """
+    processes = min(processes, len(scenarios))
+    if processes > 1:
+        size = -(-len(scenarios) // processes)
+        batches = [scenarios[i:i + size] for i in range(0, len(scenarios), size)]
+        with ProcessPoolExecutor(len(batches), initializer=_init_worker, initargs=(moves,)) as pool:
+            return [row for rows in pool.map(_evaluate_in_worker, batches) for row in rows]
+    return _evaluate_batch(moves, scenarios)
+
+
+def format_results(results):
+    """
+    Formats sweep results as a fixed-width text table.
+
+    Parameters:
+    results (list of dict): Output of sweep().
+
+    Returns:
+    str: The table.
+    """
+    width = max([len("Scenario")] + [len(r["scenario"]) for r in results])
+    lines = [
+        f"{'Scenario':<{width}}  {'Net PnL %':>12}  {'Win Rate':>8}  {'Max DD %':>10}  {'Liquidated':>10}  {'Avg Lev':>7}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r['scenario']:<{width}}  {r['net_pnl']:>12.2f}  {r['win_rate']:>8.2f}  "
+            f"{r['max_drawdown']:>10.2f}  {r['liquidations']:>10}  {r['avg_leverage']:>7.2f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_coin_factors(text):
+    """
+    Parses "btc=2,eth=0.5" into {"btc": 2.0, "eth": 0.5}.
+    """
+    factors = {}
+    for item in text.split(","):
+        coin, _, factor = item.partition("=")
+        factors[coin.strip().lower()] = float(factor)
+    return factors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-evaluate the trade history under alternative leverage policies.")
+    parser.add_argument("--fixed", default="1-50", help="Fixed leverage range 'a-b' or list 'a,b,c' (default 1-50)")
+    parser.add_argument("--cap", default="", help="Comma separated leverage caps, e.g. 5,10,20")
+    parser.add_argument("--coin-scale", action="append", default=[],
+                        help="Per-coin leverage factors, e.g. btc=2,eth=0.5 (repeatable)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Read the trades from the columnar snapshot next to the database (refreshed first)")
+    args = parser.parse_args()
+
+    scenario_list = [LeverageScenario.actual()]
+    if args.fixed:
+        if "-" in args.fixed:
+            low, high = (int(x) for x in args.fixed.split("-"))
+            fixed_values = range(low, high + 1)
+        else:
+            fixed_values = [float(x) for x in args.fixed.split(",")]
+        scenario_list += [LeverageScenario.fixed(v) for v in fixed_values]
+    if args.cap:
+        scenario_list += [LeverageScenario.cap(float(x)) for x in args.cap.split(",")]
+    for spec in args.coin_scale:
+        scenario_list.append(LeverageScenario.per_coin(parse_coin_factors(spec)))
+
+    if args.snapshot:
+        with open_snapshot(args.db) as trade_snapshot:
+            trade_moves = trade_moves_from_snapshot(trade_snapshot)
+    else:
+        connection = profiler.connect(args.db)
+        trade_moves = load_trade_moves(connection)
+        connection.close()
+
+    started = time.perf_counter()
+    sweep_results = sweep(trade_moves, scenario_list, processes=args.processes)
+    elapsed = time.perf_counter() - started
+    print(format_results(sweep_results))
+    print(f"\n{len(scenario_list)} scenarios over {len(trade_moves)} trades in {elapsed:.2f}s")
@@ -0,0 +1,197 @@
+import profiler
+from trade_stats import get_pnl
+
+# Positions of the values kept per coin
+COUNT, WINS, PNL_SUM, BEST_PNL, TODAY_COUNT, TODAY_WINS, TODAY_PNL = range(7)
+
+
+def new_coin():
+    """
+    Returns the empty value list of a coin (see the index constants above).
+    """
+    return [0, 0, 0.0, float("-inf"), 0, 0, 0.0]
+
+
+class LiveStats:
+    """
+    Running totals for the dashboard, updated in O(1) per saved trade.
+
+    The totals are seeded once from the database (see load_seed()) and afterwards only
+    changed by add_trade(), so showing them never queries the trades table. Trades saved
+    before the seed has arrived are kept aside and folded in on top of it unless the seed
+    already contains them (their id is not above the seed's last_trade_id).
+
+    Only closed trades with an entry price other than 0 are counted, like in the report's
+    per-coin figures. Closing a position does not add a new trade id, so the GUI loads a new
+    seed then; trades closed or edited outside the application show up after a restart.
+    """
+    def __init__(self, today_str):
+        """
+        Parameters:
+        today_str (str): Today's date ('YYYY-MM-DD').
+        """
+        self.today = today_str
+        self.seeded = False
+        self.last_trade_id = 0
+        self.coins = {}  # coin -> values, see new_coin()
+        self.count = self.wins = 0
+        self.net_pnl = 0.0
+        self.today_count = self.today_wins = 0
+        self.today_pnl = 0.0
+        self._early = []  # trades saved before the seed arrived
+
+    def add_trade(self, trade_id, coin, position, date, leverage, entry_price, exit_price):
+        """
+        Adds one saved trade.
+
+        Parameters:
+        trade_id (int): Id of the saved trade.
+        coin (str): Coin name.
+        position (str): 'long' or 'short'.
+        date (str): Trade date ('YYYY-MM-DD').
+        leverage (float): Leverage used.
+        entry_price (float): Entry price of the trade.
+        exit_price (float): Exit price, or None for an open position (not counted).
+        """
+        if not self.seeded:
+            self._early.append((trade_id, coin, position, date, leverage, entry_price, exit_price))
+            return
+        if trade_id <= self.last_trade_id or exit_price is None:
+            return
+        pnl = get_pnl(position, leverage, entry_price, exit_price)
+        if pnl is None:
+            return
+        win = pnl > 0
+
+        values = self.coins.get(coin)
+        if values is None:
+            values = self.coins[coin] = new_coin()
+        values[COUNT] += 1
+        values[WINS] += win
+        values[PNL_SUM] += pnl
+        if pnl > values[BEST_PNL]:
+            values[BEST_PNL] = pnl
+        self.count += 1
+        self.wins += win
+        self.net_pnl += pnl
+        if date == self.today:
+            values[TODAY_COUNT] += 1
+            values[TODAY_WINS] += win
+            values[TODAY_PNL] += pnl
+            self.today_count += 1
+            self.today_wins += win
+            self.today_pnl += pnl
+        self.last_trade_id = max(self.last_trade_id, trade_id)
+
+    def apply_seed(self, seed):
+        """
+        Takes over the totals loaded by load_seed() and adds the trades saved meanwhile.
+
+        Parameters:
+        seed (tuple): (last_trade_id, coins) as returned by load_seed().
+        """
+        self.last_trade_id, self.coins = seed
+        for values in self.coins.values():
+            self.count += values[COUNT]
+            self.wins += values[WINS]
+            self.net_pnl += values[PNL_SUM]
+            self.today_count += values[TODAY_COUNT]
+            self.today_wins += values[TODAY_WINS]
+            self.today_pnl += values[TODAY_PNL]
+        self.seeded = True
+        early, self._early = self._early, []
+        for trade in early:
+            self.add_trade(*trade)
+
+    def roll_day(self, today_str):
+        """
+        Starts a new day: today's figures begin again at 0.
+
+        Parameters:
+        today_str (str): The current date ('YYYY-MM-DD').
+        """
+        if today_str == self.today:
+            return
+        self.today = today_str
+        self.today_count = self.today_wins = 0
+        self.today_pnl = 0.0
+        for values in self.coins.values():
+            values[TODAY_COUNT] = values[TODAY_WINS] = 0
+            values[TODAY_PNL] = 0.0
+
+    @property
+    def win_rate(self):
+        return self.wins / self.count if self.count else 0.0
+
+    @property
+    def today_win_rate(self):
+        return self.today_wins / self.today_count if self.today_count else 0.0
+
+    def coin_rows(self, limit=None):
+        """
+        Returns the per-coin figures, highest net PnL first.
+
+        Parameters:
+        limit (int): Maximum number of coins, or None for all.
+
+        Returns:
+        list of tuple: (coin, trade_count, win_rate, net_pnl, best_pnl, today_pnl)
+        """
+        rows = sorted(
+            ((coin, values[COUNT], values[WINS] / values[COUNT], values[PNL_SUM], values[BEST_PNL], values[TODAY_PNL])
+             for coin, values in self.coins.items() if values[COUNT]),
+            key=lambda row: row[3], reverse=True
+        )
+        return rows[:limit] if limit is not None else rows
+
+    def best_coin_today(self):
+        """
+        Returns (coin, net_pnl) of the coin with the highest PnL today, or None if
+        nothing was closed today.
+        """
+        traded = [(values[TODAY_PNL], coin) for coin, values in self.coins.items() if values[TODAY_COUNT]]
+        if not traded:
+            return None
+        pnl, coin = max(traded)
+        return coin, pnl
+
+
+def load_seed(conn, today_str):
+    """
+    Computes the dashboard totals from the trades table in one grouped scan.
+
+    The highest trade id is read first and the scan is limited to it, so a trade
+    saved while the scan runs is either in the seed or has a higher id (and is then
+    added by LiveStats.apply_seed()), never both.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    today_str (str): Today's date ('YYYY-MM-DD').
+
+    Returns:
+    tuple: (last_trade_id, coins) with coins mapping each coin name to its values
+    (see new_coin()).
+    """
+    cursor = conn.cursor()
+    with profiler.span("live_stats.seed"):
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM trades")
+        last_trade_id = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT c.name, COUNT(*), SUM(pnl > 0), SUM(pnl), MAX(pnl),
+                   SUM(date = :today), SUM(date = :today AND pnl > 0),
+                   SUM(CASE WHEN date = :today THEN pnl ELSE 0 END)
+            FROM (
+                SELECT t.coin_id, t.date,
+                       CASE WHEN p.name = 'long' THEN t.exit_price - t.entry_price
+                            ELSE t.entry_price - t.exit_price END
+                       / t.entry_price * 100 * t.leverage AS pnl
+                FROM trades t
+                JOIN positions p ON p.id = t.position_id
+                WHERE t.id <= :last AND t.exit_price IS NOT NULL AND t.entry_price != 0
+            )
+            JOIN coins c ON c.id = coin_id
+            GROUP BY coin_id
+        """, {"today": today_str, "last": last_trade_id})
+        coins = {row[0]: [row[1], row[2], row[3], row[4], row[5], row[6], float(row[7])]
+                 for row in cursor.fetchall()}
+    return last_trade_id, coins
@@ -4,11 +4,26 @@ from tkinter import messagebox
 import sqlite3
 import webbrowser
 import os
+import queue
+import threading
 from datetime import datetime
 
+import profiler
+from setup_database import migrate_trades_table
+from dimensions import canonical_coin, canonical_mode, canonical_position, insert_trade, insert_trades
+from timestamps import date_from_ms, parse_timestamp
+from batch_entry import BATCH_COLUMNS, GRID_ROWS, parse_clipboard, validate_rows
+from live_stats import LiveStats, load_seed
+from mark_to_market import close_position
+from write_queue import WriteQueue
+from backup import BackupScheduler
+
 # The function you defined in the report_generator.py file
 from report_generator import generate_full_report_with_recommendations
 
+# Seconds to wait for queued writes before a report or when closing
+FLUSH_TIMEOUT = 10
+
 class TradeEntryGUI:
     """
     Crypto Trade Tracker GUI application.
@@ -25,12 +40,34 @@ class TradeEntryGUI:
         """
         self.root = root
         self.root.title("Crypto Trade Tracker")
-        self.root.geometry("900x600")
+        self.root.geometry("900x720")
         self.root.resizable(False, False)
 
         # Connect to the SQLite database
-        self.conn = sqlite3.connect("trade_data.db")
+        self.conn = profiler.connect("trade_data.db")
         self.cursor = self.conn.cursor()
+        migrate_trades_table(self.conn)
+
+        # All writes go through a background writer thread with group commit;
+        # results come back to the Tk thread through the polling loop
+        self.writer = WriteQueue("trade_data.db")
+        self.writer.attach(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Hourly snapshots in the background, the last 24 are kept
+        self.backups = BackupScheduler("trade_data.db")
+        self.backups.start()
+
+        # Status bar for asynchronous save confirmations
+        self.status_var = tk.StringVar(value="Ready")
+        tk.Label(
+            self.root,
+            textvariable=self.status_var,
+            bg="#222222",
+            fg="#FFD700",
+            anchor="w",
+            font=("Helvetica", 9)
+        ).pack(side=tk.BOTTOM, fill=tk.X)
 
         # Create Notebook (tabs)
         self.notebook = ttk.Notebook(self.root)
@@ -40,12 +77,27 @@ class TradeEntryGUI:
         self.trade_tab = tk.Frame(self.notebook, bg="#333333")
         self.notebook.add(self.trade_tab, text="Trade Entry")
 
+        # Batch Entry Tab
+        self.batch_tab = tk.Frame(self.notebook, bg="#333333")
+        self.notebook.add(self.batch_tab, text="Batch Entry")
+
+        # Dashboard Tab
+        self.dashboard_tab = tk.Frame(self.notebook, bg="#333333")
+        self.notebook.add(self.dashboard_tab, text="Dashboard")
+
+        # Open Positions Tab
+        self.positions_tab = tk.Frame(self.notebook, bg="#333333")
+        self.notebook.add(self.positions_tab, text="Open Positions")
+
         # Notes Tab
         self.notes_tab = tk.Frame(self.notebook, bg="#333333")
         self.notebook.add(self.notes_tab, text="Notes")
 
         # Create content for tabs
         self.create_trade_section()
+        self.create_batch_section()
+        self.create_dashboard_section()
+        self.create_positions_section()
         self.create_notes_section()
 
     def create_trade_section(self):
@@ -74,7 +126,7 @@ class TradeEntryGUI:
             activebackground="#FFC300",
             activeforeground="black"
         )
-        self.save_button.grid(row=7, column=0, columnspan=2, pady=20, ipadx=10, ipady=5)
+        self.save_button.grid(row=10, column=0, columnspan=2, pady=20, ipadx=10, ipady=5)
 
         # Reports Section
         self.create_reports_section()
@@ -84,16 +136,20 @@ class TradeEntryGUI:
 
     def create_input_fields(self):
         """
-        Create input fields for trade entry including Coin Name, Position, Mode, Date, Leverage, Entry and Exit Prices.
+        Create input fields for trade entry including Coin Name, Position, Mode, Date, Entry and Exit Times, Leverage,
+        Entry and Exit Prices and Size. Leaving the exit price empty records an open position; the times are optional.
         """
         fields = [
             ("Coin Name", "#FFD700"),
             ("Position (long/short)", "#FFD700"),
             ("Mode (real/demo)", "#FFD700"),
             ("Date (YYYY-MM-DD)", "#FFD700"),
+            ("Entry Time (HH:MM, optional)", "#FFD700"),
+            ("Exit Time (HH:MM or date + time)", "#FFD700"),
             ("Leverage", "#FFD700"),
             ("Entry Price", "#FFD700"),
-            ("Exit Price", "#FFD700")
+            ("Exit Price (empty if open)", "#FFD700"),
+            ("Size", "#FFD700")
         ]
 
         self.entries = {}
@@ -212,6 +268,9 @@ class TradeEntryGUI:
     def save_trade(self):
         """
         Save the trade data entered by the user into the SQLite database.
+
+        The insert is queued to the background writer so the form is ready for the next
+        trade immediately; the outcome is reported once the write has been committed.
         """
         trade_data = {
             "coin_name": self.entries["Coin Name"].get(),
@@ -220,45 +279,85 @@ class TradeEntryGUI:
             "date": self.entries["Date (YYYY-MM-DD)"].get(),
             "leverage": self.entries["Leverage"].get(),
             "entry_price": self.entries["Entry Price"].get(),
-            "exit_price": self.entries["Exit Price"].get()
+            "exit_price": self.entries["Exit Price (empty if open)"].get().strip(),
+            "size": self.entries["Size"].get().strip() or "1",
+            "entry_time": self.entries["Entry Time (HH:MM, optional)"].get().strip(),
+            "exit_time": self.entries["Exit Time (HH:MM or date + time)"].get().strip()
         }
 
-        if not all(trade_data.values()):
-            messagebox.showerror("Error", "All fields must be filled!")
+        # The exit price may be left empty for an open position, the times are optional
+        optional = ("exit_price", "entry_time", "exit_time")
+        required = {key: value for key, value in trade_data.items() if key not in optional}
+        if not all(required.values()):
+            messagebox.showerror("Error", "All fields except the exit price, size and entry/exit times must be filled!")
+            return
+
+        try:
+            # "btc", "BTC " and "Btc" are stored as the same coin
+            names = (
+                canonical_coin(trade_data["coin_name"]),
+                canonical_position(trade_data["position"]),
+                canonical_mode(trade_data["mode"])
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
         try:
-            self.cursor.execute('''
-                INSERT INTO trades (coin_name, position, mode, date, leverage, entry_price, exit_price)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                trade_data["coin_name"],
-                trade_data["position"],
-                trade_data["mode"],
-                trade_data["date"],
+            # Times are stored as epoch milliseconds; a time without a date is on the trade date
+            entry_time = parse_timestamp(trade_data["entry_time"], trade_data["date"])
+            exit_time = parse_timestamp(trade_data["exit_time"], trade_data["date"])
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        try:
+            values = names + (
+                date_from_ms(entry_time) if entry_time is not None else trade_data["date"],
                 float(trade_data["leverage"]),
                 float(trade_data["entry_price"]),
-                float(trade_data["exit_price"])
-            ))
-            self.conn.commit()
-
-            messagebox.showinfo("Success", "Trade data saved successfully!")
+                float(trade_data["exit_price"]) if trade_data["exit_price"] else None,
+                float(trade_data["size"]),
+                entry_time,
+                exit_time
+            )
+        except ValueError:
+            messagebox.showerror("Error", "Leverage, prices and size must be numbers!")
+            return
 
-            # Clear fields
-            for key, entry in self.entries.items():
-                entry.delete(0, tk.END)
-                if key == "Date (YYYY-MM-DD)":
-                    entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to save data: {e}")
+        def on_saved(trade_id, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save data: {error}\n\n{values}")
+            else:
+                self.status_var.set(f"Trade #{trade_id} saved ({values[0]} {values[1]}).")
+                self.live_stats.add_trade(trade_id, values[0], values[1], values[3], *values[4:7])
+                self.refresh_dashboard()
+                if values[6] is None:
+                    self.load_open_positions()
+
+        with profiler.span("gui.save_trade"):
+            self.writer.submit(lambda cursor: insert_trade(cursor, *values), on_saved)
+        self.status_var.set("Saving trade...")
+
+        # Clear fields right away so the next trade can be entered while this one is written
+        for key, entry in self.entries.items():
+            entry.delete(0, tk.END)
+            if key == "Date (YYYY-MM-DD)":
+                entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
 
     def create_report(self):
         """
         Generate a comprehensive PDF report and open it if successfully created.
         """
         try:
+            # Make sure queued trades are in the report, without freezing the window
+            # if the database stays locked
+            if not self.writer.flush(timeout=FLUSH_TIMEOUT):
+                messagebox.showwarning("Warning", "Some entries are still being saved and may be missing from the report.")
+
             # Execute the report generation function
-            generate_full_report_with_recommendations(self.conn)
+            with profiler.span("gui.create_report"):
+                generate_full_report_with_recommendations(self.conn)
 
             # Define the path for reports directory
             raporlar_path = os.path.join(os.getcwd(), "reports")
@@ -288,6 +387,427 @@ class TradeEntryGUI:
         else:
             messagebox.showerror("Error", "Reports folder not found!")
 
+    def create_batch_section(self):
+        """
+        Create the batch entry section: a spreadsheet-like grid that rows can be pasted into
+        from the clipboard, validated together and saved in one transaction.
+        """
+        toolbar = tk.Frame(self.batch_tab, bg="#333333")
+        toolbar.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+
+        buttons = [
+            ("Paste from Clipboard", self.paste_batch),
+            ("Validate", self.validate_batch),
+            ("Save Valid Rows", self.save_batch),
+            ("Clear", self.clear_batch),
+        ]
+        self.batch_buttons = {}
+        for text, command in buttons:
+            button = tk.Button(
+                toolbar,
+                text=text,
+                command=command,
+                bg="#FFD700",
+                fg="black",
+                font=("Helvetica", 11),
+                bd=0,
+                activebackground="#FFC300",
+                activeforeground="black",
+                padx=10,
+                pady=3
+            )
+            button.pack(side=tk.LEFT, padx=5)
+            self.batch_buttons[text] = button
+
+        # The grid scrolls vertically, since a pasted day of trades may not fit the window
+        grid_area = tk.Frame(self.batch_tab, bg="#333333")
+        grid_area.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        canvas = tk.Canvas(grid_area, bg="#333333", highlightthickness=0)
+        scrollbar = tk.Scrollbar(grid_area, orient=tk.VERTICAL, command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.batch_grid = tk.Frame(canvas, bg="#333333")
+        canvas.create_window((0, 0), window=self.batch_grid, anchor="nw")
+        self.batch_grid.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+
+        for column, name in enumerate(BATCH_COLUMNS):
+            tk.Label(
+                self.batch_grid,
+                text=name,
+                bg="#333333",
+                fg="#FFD700",
+                font=("Helvetica", 9, "bold")
+            ).grid(row=0, column=column + 1, padx=1, pady=2)
+
+        self.batch_cells = []
+        self.batch_errors = {}
+        self.add_batch_rows(GRID_ROWS)
+
+    def add_batch_rows(self, count):
+        """
+        Append empty rows to the batch grid.
+
+        Parameters:
+        count (int): Number of rows to add.
+        """
+        for _ in range(count):
+            row = len(self.batch_cells)
+            tk.Label(
+                self.batch_grid,
+                text=str(row + 1),
+                bg="#333333",
+                fg="white",
+                font=("Helvetica", 9)
+            ).grid(row=row + 1, column=0, padx=(0, 4))
+            cells = []
+            for column in range(len(BATCH_COLUMNS)):
+                cell = tk.Entry(
+                    self.batch_grid,
+                    width=9,
+                    bg="white",
+                    readonlybackground="#BBBBBB",
+                    font=("Helvetica", 10)
+                )
+                cell.grid(row=row + 1, column=column + 1, padx=1, pady=1)
+                cell.bind("<<Paste>>", lambda e, r=row, c=column: self.paste_batch(r, c))
+                cell.bind("<FocusIn>", lambda e, r=row, c=column: self.show_batch_error(r, c))
+                cells.append(cell)
+            self.batch_cells.append(cells)
+
+    def batch_rows(self):
+        """
+        Return the texts of the batch grid as a list of rows.
+        """
+        return [[cell.get() for cell in cells] for cells in self.batch_cells]
+
+    def paste_batch(self, start_row=None, start_column=0):
+        """
+        Paste tab- or comma-separated rows from the clipboard into the batch grid.
+
+        Pressing Ctrl+V in a cell pastes from that cell on; the Paste button fills the rows
+        after the last non-empty one. The grid grows as needed.
+
+        Parameters:
+        start_row (int): Grid row to start at, or None for the first row after the data.
+        start_column (int): Grid column to start at.
+
+        Returns:
+        str: "break" when the clipboard held several cells, so Tk does not also paste it
+        into the focused cell.
+        """
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            self.status_var.set("The clipboard is empty.")
+            return "break"
+        if start_row is not None and "\t" not in text and "\n" not in text.strip():
+            return None  # a single value, pasted into the cell as usual
+
+        rows = parse_clipboard(text)
+        if start_row is None:
+            filled = [index for index, cells in enumerate(self.batch_rows()) if any(c.strip() for c in cells)]
+            start_row = filled[-1] + 1 if filled else 0
+        missing = start_row + len(rows) - len(self.batch_cells)
+        if missing > 0:
+            self.add_batch_rows(missing)
+
+        for offset, values in enumerate(rows):
+            cells = self.batch_cells[start_row + offset]
+            for column, value in enumerate(values[:len(BATCH_COLUMNS) - start_column]):
+                cell = cells[start_column + column]
+                cell.delete(0, tk.END)
+                cell.insert(0, value)
+        self.validate_batch()
+        return "break"
+
+    def validate_batch(self):
+        """
+        Validate every row of the batch grid and highlight the bad cells.
+
+        Returns:
+        list: (row_index, trade) for each valid row, as returned by validate_rows().
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        with profiler.span("gui.validate_batch"):
+            trades, self.batch_errors = validate_rows(self.batch_rows(), today)
+        for row, cells in enumerate(self.batch_cells):
+            for column, cell in enumerate(cells):
+                cell.config(bg="#FF9999" if (row, column) in self.batch_errors else "white")
+
+        bad_rows = len({row for row, _ in self.batch_errors})
+        if bad_rows:
+            self.status_var.set(f"{len(trades)} valid rows, {bad_rows} rows with errors "
+                                f"(select a red cell to see why).")
+        else:
+            self.status_var.set(f"{len(trades)} valid rows.")
+        return trades
+
+    def show_batch_error(self, row, column):
+        """
+        Show the validation message of a highlighted cell in the status bar.
+        """
+        message = self.batch_errors.get((row, column))
+        if message:
+            self.status_var.set(f"Row {row + 1}, {BATCH_COLUMNS[column]}: {message}")
+
+    def save_batch(self):
+        """
+        Save the valid rows of the batch grid in a single transaction.
+
+        All rows are inserted by one executemany in one writer job, so a day of trades costs
+        one commit. The rows are locked until the write is done; saved rows are then cleared
+        and rows with errors stay in the grid to be fixed.
+        """
+        trades = self.validate_batch()
+        if not trades:
+            return
+        saved_rows = [row for row, _ in trades]
+        bad_rows = len({row for row, _ in self.batch_errors})
+
+        def set_locked(locked):
+            for row in saved_rows:
+                for cell in self.batch_cells[row]:
+                    cell.config(state="readonly" if locked else "normal")
+            self.batch_buttons["Save Valid Rows"].config(state=tk.DISABLED if locked else tk.NORMAL)
+
+        def on_saved(result, error):
+            set_locked(False)
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save the batch, no rows were saved: {error}")
+                return
+            for row in saved_rows:
+                for cell in self.batch_cells[row]:
+                    cell.delete(0, tk.END)
+            # insert_trades() returns the id of each trade
+            for trade_id, (_, trade) in zip(result, trades):
+                self.live_stats.add_trade(trade_id, trade[0], trade[1], trade[3], *trade[4:7])
+            self.refresh_dashboard()
+            if any(trade[6] is None for _, trade in trades):
+                self.load_open_positions()
+            message = f"{len(saved_rows)} trades saved in one transaction."
+            if bad_rows:
+                message += f" {bad_rows} rows with errors are left to fix."
+            self.status_var.set(message)
+
+        set_locked(True)
+        with profiler.span("gui.save_batch"):
+            self.writer.submit(lambda cursor: insert_trades(cursor, [trade for _, trade in trades]), on_saved)
+        self.status_var.set(f"Saving {len(trades)} trades...")
+
+    def clear_batch(self):
+        """
+        Empty the batch grid and remove the highlighting.
+        """
+        self.batch_errors = {}
+        for cells in self.batch_cells:
+            for cell in cells:
+                if cell.cget("state") != "readonly":
+                    cell.delete(0, tk.END)
+                    cell.config(bg="white")
+        self.status_var.set("Ready")
+
+    def create_dashboard_section(self):
+        """
+        Create the dashboard: running totals, today's figures and the per-coin table.
+
+        The figures come from an in-memory accumulator (see live_stats.py) that is seeded
+        once in the background and then updated by every saved trade, so they are shown
+        without querying the trades table.
+        """
+        kpi_frame = tk.Frame(self.dashboard_tab, bg="#333333")
+        kpi_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+
+        tiles = ["Net PnL", "Win Rate", "Closed Trades", "Today's PnL", "Today's Win Rate", "Best Coin Today"]
+        self.kpi_vars = {}
+        for idx, title in enumerate(tiles):
+            tile = tk.Frame(kpi_frame, bg="#FFD700", bd=2, relief="solid", padx=10, pady=8)
+            tile.grid(row=idx // 3, column=idx % 3, padx=5, pady=5, sticky="ew")
+            kpi_frame.grid_columnconfigure(idx % 3, weight=1)
+            tk.Label(tile, text=title, bg="#FFD700", fg="black", font=("Helvetica", 10, "bold")).pack()
+            var = tk.StringVar(value="...")
+            tk.Label(tile, textvariable=var, bg="#FFD700", fg="black", font=("Helvetica", 16, "bold")).pack()
+            self.kpi_vars[title] = var
+
+        tk.Label(
+            self.dashboard_tab,
+            text="Coins by Net PnL",
+            bg="#333333",
+            fg="#FFD700",
+            font=("Helvetica", 12, "bold")
+        ).pack(pady=(5, 0))
+
+        columns = ("Coin", "Trades", "Win Rate", "Net PnL", "Best Trade", "Today")
+        table_frame = tk.Frame(self.dashboard_tab, bg="#333333")
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.coin_table = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for column in columns:
+            self.coin_table.heading(column, text=column)
+            self.coin_table.column(column, width=120, anchor="center")
+        scrollbar = tk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.coin_table.yview)
+        self.coin_table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.coin_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.live_stats = LiveStats(datetime.now().strftime("%Y-%m-%d"))
+        self.start_dashboard_seed()
+
+    def start_dashboard_seed(self):
+        """
+        Load the dashboard totals on a background thread with its own connection, and hand
+        them to the Tk thread once they are ready.
+        """
+        results = queue.Queue()
+        # A reload replaces the accumulator; a seed still loading for the old one is dropped
+        live_stats = self.live_stats
+
+        def load():
+            try:
+                conn = profiler.connect("trade_data.db")
+                try:
+                    results.put((load_seed(conn, live_stats.today), None))
+                finally:
+                    conn.close()
+            except Exception as e:
+                results.put((None, e))
+
+        def check():
+            try:
+                seed, error = results.get_nowait()
+            except queue.Empty:
+                self.root.after(100, check)
+                return
+            if error is not None:
+                self.status_var.set(f"Could not load the dashboard: {error}")
+                return
+            live_stats.apply_seed(seed)
+            if live_stats is self.live_stats:
+                self.refresh_dashboard()
+
+        threading.Thread(target=load, name="trade-journal-dashboard", daemon=True).start()
+        self.root.after(100, check)
+
+    def refresh_dashboard(self):
+        """
+        Show the current figures of the accumulator on the dashboard.
+        """
+        stats = self.live_stats
+        if not stats.seeded:
+            return
+        stats.roll_day(datetime.now().strftime("%Y-%m-%d"))
+        best_today = stats.best_coin_today()
+        self.kpi_vars["Net PnL"].set(f"{stats.net_pnl:.2f}%")
+        self.kpi_vars["Win Rate"].set(f"{stats.win_rate:.1%}")
+        self.kpi_vars["Closed Trades"].set(str(stats.count))
+        self.kpi_vars["Today's PnL"].set(f"{stats.today_pnl:.2f}% ({stats.today_count} trades)")
+        self.kpi_vars["Today's Win Rate"].set(f"{stats.today_win_rate:.1%}")
+        self.kpi_vars["Best Coin Today"].set(f"{best_today[0]} ({best_today[1]:.2f}%)" if best_today else "None")
+
+        self.coin_table.delete(*self.coin_table.get_children())
+        for coin, count, win_rate, net_pnl, best_pnl, today_pnl in stats.coin_rows():
+            self.coin_table.insert("", tk.END, values=(
+                coin, count, f"{win_rate:.1%}", f"{net_pnl:.2f}%", f"{best_pnl:.2f}%", f"{today_pnl:.2f}%"
+            ))
+
+    def create_positions_section(self):
+        """
+        Create the open positions section: the trades saved without an exit price, and
+        fields to close the selected one.
+        """
+        columns = ("ID", "Coin", "Position", "Mode", "Date", "Leverage", "Entry Price", "Size")
+        table_frame = tk.Frame(self.positions_tab, bg="#333333")
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.positions_table = ttk.Treeview(table_frame, columns=columns, show="headings", selectmode="browse")
+        for column in columns:
+            self.positions_table.heading(column, text=column)
+            self.positions_table.column(column, width=100, anchor="center")
+        scrollbar = tk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.positions_table.yview)
+        self.positions_table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.positions_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        close_frame = tk.Frame(self.positions_tab, bg="#333333")
+        close_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.close_entries = {}
+        for idx, label in enumerate(["Exit Price", "Exit Time (HH:MM, optional)"]):
+            ttk.Label(
+                close_frame,
+                text=label,
+                background="#333333",
+                foreground="#FFD700",
+                font=("Helvetica", 12)
+            ).grid(row=0, column=idx * 2, padx=5, pady=5, sticky="e")
+            entry = ttk.Entry(close_frame, width=20)
+            entry.grid(row=0, column=idx * 2 + 1, padx=5, pady=5)
+            self.close_entries[label] = entry
+
+        for idx, (text, command) in enumerate([
+            ("Close Position", self.close_selected_position),
+            ("Refresh", self.load_open_positions),
+        ]):
+            tk.Button(
+                close_frame,
+                text=text,
+                command=command,
+                bg="#FFD700",
+                fg="black",
+                font=("Helvetica", 12),
+                bd=0,
+                activebackground="#FFC300",
+                activeforeground="black"
+            ).grid(row=0, column=4 + idx, padx=5, pady=5)
+
+        self.load_open_positions()
+
+    def load_open_positions(self):
+        """
+        Load the open positions from the SQLite database into the table.
+        """
+        self.positions_table.delete(*self.positions_table.get_children())
+        self.cursor.execute("""
+            SELECT id, coin_name, position, mode, date, leverage, entry_price, size
+            FROM trade_details
+            WHERE exit_price IS NULL
+            ORDER BY id
+        """)
+        for row in self.cursor.fetchall():
+            self.positions_table.insert("", tk.END, iid=str(row[0]), values=row)
+
+    def close_selected_position(self):
+        """
+        Close the selected open position at the entered exit price.
+        """
+        selection = self.positions_table.selection()
+        if not selection:
+            messagebox.showerror("Error", "You must select a position to close!")
+            return
+        trade_id = int(selection[0])
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        try:
+            exit_price = float(self.close_entries["Exit Price"].get())
+            exit_time = parse_timestamp(self.close_entries["Exit Time (HH:MM, optional)"].get(), today_str)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid data: {e}")
+            return
+
+        def on_closed(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to close the position: {error}")
+                self.load_open_positions()
+                return
+            for entry in self.close_entries.values():
+                entry.delete(0, tk.END)
+            self.load_open_positions()
+            # The accumulator only adds new trades, so it is loaded again with this one closed
+            self.live_stats = LiveStats(today_str)
+            self.start_dashboard_seed()
+            self.status_var.set(f"Position #{trade_id} closed.")
+
+        with profiler.span("gui.close_position"):
+            self.writer.submit(lambda cursor: close_position(cursor, trade_id, exit_price, exit_time), on_closed)
+        self.status_var.set(f"Closing position #{trade_id}...")
+
     def create_notes_section(self):
         """
         Create the notes management section of the GUI, allowing users to add, update, delete, and view notes.
@@ -385,14 +905,16 @@ class TradeEntryGUI:
             messagebox.showerror("Error", "Title and content cannot be empty!")
             return
 
-        try:
-            self.cursor.execute("INSERT INTO notes (title, content) VALUES (?, ?)", (title, content))
-            self.conn.commit()
+        def on_saved(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save note: {error}")
+                return
             self.load_notes()
             self.clear_note_fields()
-            messagebox.showinfo("Success", "Note saved successfully!")
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to save note: {e}")
+            self.status_var.set(f"Note '{title}' saved.")
+
+        with profiler.span("gui.save_note"):
+            self.writer.execute("INSERT INTO notes (title, content) VALUES (?, ?)", (title, content), on_saved)
 
     def update_note(self):
         """
@@ -411,15 +933,17 @@ class TradeEntryGUI:
             messagebox.showerror("Error", "Title and content cannot be empty!")
             return
 
-        try:
-            self.cursor.execute("UPDATE notes SET title=?, content=? WHERE title=?", 
-                                (new_title, new_content, old_title))
-            self.conn.commit()
+        def on_updated(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to update note: {error}")
+                return
             self.load_notes()
             self.clear_note_fields()
-            messagebox.showinfo("Success", "Note updated successfully!")
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to update note: {e}")
+            self.status_var.set(f"Note '{new_title}' updated.")
+
+        with profiler.span("gui.update_note"):
+            self.writer.execute("UPDATE notes SET title=?, content=? WHERE title=?",
+                                (new_title, new_content, old_title), on_updated)
 
     def delete_note(self):
         """
@@ -431,14 +955,16 @@ class TradeEntryGUI:
             return
 
         title = self.notes_listbox.get(selected_note).lstrip("- ")
-        try:
-            self.cursor.execute("DELETE FROM notes WHERE title = ?", (title,))
-            self.conn.commit()
+        def on_deleted(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to delete note: {error}")
+                return
             self.load_notes()
             self.clear_note_fields()
-            messagebox.showinfo("Success", "Note deleted successfully!")
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to delete note: {e}")
+            self.status_var.set(f"Note '{title}' deleted.")
+
+        with profiler.span("gui.delete_note"):
+            self.writer.execute("DELETE FROM notes WHERE title = ?", (title,), on_deleted)
 
     def load_notes(self):
         """
@@ -468,6 +994,15 @@ class TradeEntryGUI:
             self.note_title_var.set(selected_title)
             self.note_content_text.insert("1.0", result[0])
 
+    def on_close(self):
+        """
+        Wait for queued writes to be committed, then close the application.
+        """
+        self.writer.close(timeout=FLUSH_TIMEOUT)
+        self.backups.stop()
+        self.conn.close()
+        self.root.destroy()
+
     def clear_note_fields(self):
         """
         Clear the note title and content fields.
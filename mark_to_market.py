@@ -0,0 +1,306 @@
+import csv
+import struct
+import sys
+
+import profiler
+from dimensions import canonical_coin
+
+# Binary tick record: timestamp in epoch milliseconds, canonical coin name (UTF-8, NUL padded), price
+TICK_RECORD = struct.Struct("<q16sd")
+
+# Number of binary records decoded per read
+TICK_BATCH = 4096
+
+
+class OpenPosition:
+    """
+    An open trade together with its latest mark price and unrealized PnL.
+    """
+    __slots__ = ("trade_id", "coin", "direction", "size", "leverage", "entry_price",
+                 "mark_price", "unrealized_pnl")
+
+    def __init__(self, trade_id, coin, position, size, leverage, entry_price):
+        """
+        Parameters:
+        trade_id (int): Id of the row in the 'trades' table.
+        coin (str): Coin name.
+        position (str): 'long' or 'short'.
+        size (float): Position size in coin units.
+        leverage (float): Leverage used.
+        entry_price (float): Entry price of the trade.
+        """
+        self.trade_id = trade_id
+        self.coin = coin
+        self.direction = 1 if position.lower() == "long" else -1
+        self.size = size
+        self.leverage = leverage
+        self.entry_price = entry_price
+        self.mark_price = None
+        self.unrealized_pnl = 0.0
+
+    def unrealized_pnl_percent(self):
+        """
+        Returns the leveraged unrealized PnL percentage, computed the same way as
+        the PnL of closed trades in the report.
+
+        Returns:
+        float: The PnL percentage, or 0.0 if the position has not been marked yet.
+        """
+        if self.mark_price is None or self.entry_price == 0:
+            return 0.0
+        move = (self.mark_price - self.entry_price) / self.entry_price
+        return self.direction * move * 100 * self.leverage
+
+
+class CoinBook:
+    """
+    Open positions of a single coin, with the aggregates needed to mark them all at once.
+
+    Unrealized PnL of the book is price * net_size - net_cost, so applying a tick is O(1)
+    no matter how many positions are open on the coin.
+    """
+    __slots__ = ("positions", "net_size", "net_cost", "mark_price", "unrealized_pnl")
+
+    def __init__(self):
+        self.positions = []
+        self.net_size = 0.0
+        self.net_cost = 0.0
+        self.mark_price = None
+        self.unrealized_pnl = 0.0
+
+    def add(self, position):
+        """
+        Parameters:
+        position (OpenPosition): Position to add to the book.
+        """
+        self.positions.append(position)
+        self.net_size += position.direction * position.size
+        self.net_cost += position.direction * position.size * position.entry_price
+
+
+class MarkToMarketEngine:
+    """
+    Replays price ticks against the open positions and keeps their unrealized PnL up to date.
+
+    Positions are indexed by coin into CoinBook objects, so a tick only touches the book of
+    its own coin and the running total is adjusted by the change of that book alone.
+    Per-position values are filled in on demand by mark_positions().
+    """
+    def __init__(self, positions):
+        """
+        Parameters:
+        positions (iterable of OpenPosition): The open positions to track.
+        """
+        self.positions = list(positions)
+        self.total_unrealized_pnl = 0.0
+        self.ticks_processed = 0
+
+        # canonical coin name (dimensions.canonical_coin) -> book of the open positions on that coin
+        self.index = {}
+        for position in self.positions:
+            self.index.setdefault(canonical_coin(position.coin), CoinBook()).add(position)
+
+        # Same index keyed by the padded coin field of binary tick records,
+        # so binary replay never has to decode coin names
+        self._binary_index = {
+            coin.encode("utf-8")[:16].ljust(16, b"\0"): book
+            for coin, book in self.index.items()
+        }
+
+    @classmethod
+    def from_connection(cls, conn):
+        """
+        Builds an engine from the open positions (trades without an exit price) in the database.
+
+        Parameters:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+        Returns:
+        MarkToMarketEngine: The engine.
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, coin_name, position, size, leverage, entry_price
+            FROM trade_details
+            WHERE exit_price IS NULL
+        """)
+        return cls(OpenPosition(*row) for row in cursor.fetchall())
+
+    def _mark(self, book, price):
+        pnl = price * book.net_size - book.net_cost
+        self.total_unrealized_pnl += pnl - book.unrealized_pnl
+        book.unrealized_pnl = pnl
+        book.mark_price = price
+
+    def on_tick(self, coin, price):
+        """
+        Applies a single price tick.
+
+        Parameters:
+        coin (str): Coin name of the tick.
+        price (float): Traded price.
+        """
+        self.ticks_processed += 1
+        try:
+            book = self.index.get(canonical_coin(coin))
+        except ValueError:
+            # Tick without a coin name
+            return
+        if book is not None:
+            self._mark(book, price)
+
+    def mark_positions(self):
+        """
+        Updates mark_price and unrealized_pnl of every position from the latest tick of its coin.
+
+        Returns:
+        list of OpenPosition: The positions.
+        """
+        for book in self.index.values():
+            if book.mark_price is None:
+                continue
+            for position in book.positions:
+                position.mark_price = book.mark_price
+                position.unrealized_pnl = (
+                    position.direction * position.size * (book.mark_price - position.entry_price)
+                )
+        return self.positions
+
+    def replay(self, ticks):
+        """
+        Applies a sequence of ticks in order.
+
+        Parameters:
+        ticks (iterable of tuple): (timestamp_ms, coin, price) tuples.
+
+        Returns:
+        int: Number of ticks processed.
+        """
+        start = self.ticks_processed
+        with profiler.span("mtm.replay"):
+            for _, coin, price in ticks:
+                self.on_tick(coin, price)
+        profiler.count("ticks_processed", self.ticks_processed - start)
+        return self.ticks_processed - start
+
+    def replay_binary(self, path):
+        """
+        Applies every tick of a binary tick file (see TICK_RECORD) in order.
+
+        Parameters:
+        path (str): Path to the binary tick file.
+
+        Returns:
+        int: Number of ticks processed.
+        """
+        start = self.ticks_processed
+        index = self._binary_index
+        with profiler.span("mtm.replay_binary"), open(path, "rb") as f:
+            while True:
+                chunk = f.read(TICK_RECORD.size * TICK_BATCH)
+                if not chunk:
+                    break
+                usable = len(chunk) - len(chunk) % TICK_RECORD.size
+                for _, coin, price in TICK_RECORD.iter_unpack(chunk[:usable]):
+                    self.ticks_processed += 1
+                    book = index.get(coin)
+                    if book is not None:
+                        self._mark(book, price)
+        profiler.count("ticks_processed", self.ticks_processed - start)
+        return self.ticks_processed - start
+
+    def replay_file(self, path):
+        """
+        Applies every tick of a CSV (.csv) or binary tick file.
+
+        Parameters:
+        path (str): Path to the tick file.
+
+        Returns:
+        int: Number of ticks processed.
+        """
+        if path.lower().endswith(".csv"):
+            return self.replay(read_csv_ticks(path))
+        return self.replay_binary(path)
+
+
+def read_csv_ticks(path):
+    """
+    Reads ticks from a CSV file with the columns timestamp, coin, price.
+    A header row is skipped if present.
+
+    Parameters:
+    path (str): Path to the CSV file.
+
+    Yields:
+    tuple: (timestamp_ms, coin, price)
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            try:
+                yield int(row[0]), row[1], float(row[2])
+            except ValueError:
+                # Header or malformed line
+                continue
+
+
+def write_binary_ticks(path, ticks):
+    """
+    Writes ticks into the binary tick format read by MarkToMarketEngine.replay_binary.
+
+    Parameters:
+    path (str): Output file path.
+    ticks (iterable of tuple): (timestamp_ms, coin, price) tuples.
+    """
+    with open(path, "wb") as f:
+        for timestamp, coin, price in ticks:
+            f.write(TICK_RECORD.pack(timestamp, canonical_coin(coin).encode("utf-8"), price))
+
+
+def close_position(cursor, trade_id, exit_price, exit_time=None):
+    """
+    Closes an open position by setting its exit price. The caller commits.
+
+    Parameters:
+    cursor (sqlite3.Cursor): Cursor of the connection to write with.
+    trade_id (int): Id of the open trade.
+    exit_price (float): Price at which the position was closed.
+    exit_time (int): Time the position was closed, in epoch milliseconds, or None.
+
+    Returns:
+    int: The id of the closed trade.
+
+    Raises:
+    ValueError: If there is no open position with that id.
+    """
+    cursor.execute(
+        "UPDATE trades SET exit_price = ?, exit_time = COALESCE(?, exit_time) WHERE id = ? AND exit_price IS NULL",
+        (exit_price, exit_time, trade_id)
+    )
+    if cursor.rowcount == 0:
+        raise ValueError(f"No open position with id {trade_id}.")
+    return trade_id
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python mark_to_market.py <ticks.csv | ticks.bin>")
+        sys.exit(1)
+
+    connection = profiler.connect("trade_data.db")
+    engine = MarkToMarketEngine.from_connection(connection)
+    connection.close()
+
+    processed = engine.replay_file(sys.argv[1])
+    print(f"Processed {processed} ticks for {len(engine.positions)} open positions.")
+    for position in engine.mark_positions():
+        if position.mark_price is None:
+            print(f"  #{position.trade_id} {position.coin}: no price seen")
+            continue
+        print(
+            f"  #{position.trade_id} {position.coin} @ {position.mark_price}: "
+            f"{position.unrealized_pnl:.2f} ({position.unrealized_pnl_percent():.2f}%)"
+        )
+    print(f"Total unrealized PnL: {engine.total_unrealized_pnl:.2f}")
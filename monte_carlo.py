@@ -0,0 +1,294 @@
+import argparse
+import math
+import os
+import random
+import time
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+import profiler
+from columnar_snapshot import open_snapshot
+
+# Simulations per work unit. Each unit has its own seed derived from the base seed
+# and the unit index, so results do not depend on the number of worker processes.
+CHUNK_SIZE = 2000
+
+# The forward projection in the PDF report simulates a fixed number of sequences of
+# the next REPORT_HORIZON trades, so its cost does not grow with the trade history
+REPORT_SIMULATIONS = 1000
+REPORT_HORIZON = 100
+
+
+def load_pnls(conn, position=None):
+    """
+    Reads the leveraged PnL percentage of every closed trade, in date order.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    position (str): Optional 'long' or 'short' filter.
+
+    Returns:
+    list of float: PnL percentages.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT position, leverage, entry_price, exit_price
+        FROM trade_details
+        WHERE exit_price IS NOT NULL AND entry_price != 0
+        ORDER BY date, id
+    """)
+    pnls = []
+    for pos, lev, entry, exit_ in cursor.fetchall():
+        is_long = pos.lower() == "long"
+        if position is not None and is_long != (position.lower() == "long"):
+            continue
+        if is_long:
+            pnls.append((exit_ - entry) / entry * 100 * lev)
+        else:
+            pnls.append((entry - exit_) / entry * 100 * lev)
+    profiler.count("rows_scanned", len(pnls))
+    return pnls
+
+
+def pnls_from_snapshot(snapshot, position=None):
+    """
+    Returns the same PnLs as load_pnls() from a memory-mapped columnar snapshot
+    (see columnar_snapshot.py) instead of the database.
+
+    Parameters:
+    snapshot (ColumnarSnapshot): The opened snapshot.
+    position (str): Optional 'long' or 'short' filter.
+
+    Returns:
+    list of float: PnL percentages.
+    """
+    long_ids = {pid for pid, name in snapshot.positions.items() if name == "long"}
+    position_id, lev = snapshot.position_id, snapshot.leverage
+    entry, exit_ = snapshot.entry_price, snapshot.exit_price
+    pnls = []
+    for i in snapshot.date_order():
+        if entry[i] == 0:
+            continue
+        is_long = position_id[i] in long_ids
+        if position is not None and is_long != (position.lower() == "long"):
+            continue
+        if is_long:
+            pnls.append((exit_[i] - entry[i]) / entry[i] * 100 * lev[i])
+        else:
+            pnls.append((entry[i] - exit_[i]) / entry[i] * 100 * lev[i])
+    profiler.count("rows_scanned", len(pnls))
+    return pnls
+
+
+_worker_data = None
+
+
+def _init_worker(pnls, log_growth):
+    global _worker_data
+    _worker_data = (pnls, log_growth)
+
+
+def _simulate_chunk(args):
+    """
+    Runs one unit of bootstrap simulations on the data installed by _init_worker.
+
+    Returns:
+    tuple: (win_rates, net_pnls, ruined_count)
+    """
+    pnls, log_growth = _worker_data
+    horizon, simulations, seed, chunk_index, log_ruin, risk_fraction = args
+    rng = random.Random(f"{seed}:{chunk_index}")
+    indices = range(len(pnls))
+    is_win = (0.0).__lt__
+    if log_growth is None:
+        # Not precomputed (fewer draws than trades): convert only the drawn PnLs
+        log_growth = _LogGrowth(pnls, risk_fraction)
+
+    win_rates = []
+    net_pnls = []
+    ruined = 0
+    for _ in range(simulations):
+        sample = rng.choices(indices, k=horizon)
+        sample_pnls = list(map(pnls.__getitem__, sample))
+        win_rates.append(sum(map(is_win, sample_pnls)) / horizon)
+        net_pnls.append(math.fsum(sample_pnls))
+        # Equity path in log space; ruin when it ever touches the ruin level
+        if min(accumulate(map(log_growth.__getitem__, sample))) <= log_ruin:
+            ruined += 1
+    return win_rates, net_pnls, ruined
+
+
+def _log_growth(pnl, risk_fraction):
+    """
+    Log of the equity factor of one trade with risk_fraction of equity at stake
+    (-inf if the trade wipes out the equity).
+    """
+    factor = 1 + risk_fraction * pnl / 100
+    return math.log(factor) if factor > 0 else -math.inf
+
+
+class _LogGrowth:
+    """
+    Computes the log growth of a trade when it is looked up, for simulations that
+    draw fewer trades than there are.
+    """
+    __slots__ = ("pnls", "risk_fraction")
+
+    def __init__(self, pnls, risk_fraction):
+        self.pnls = pnls
+        self.risk_fraction = risk_fraction
+
+    def __getitem__(self, index):
+        return _log_growth(self.pnls[index], self.risk_fraction)
+
+
+def _percentile(sorted_values, q):
+    """
+    Linear-interpolated percentile of an already sorted list (q in 0..100).
+    """
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    low = math.floor(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def win_rate_interval(wins, count, confidence=0.95):
+    """
+    Wilson score interval of a win rate, i.e. how precisely `count` trades pin down
+    the true win rate. Unlike a bootstrap over a fixed horizon it narrows as the
+    history grows, so it is the one to compare two groups of trades with.
+
+    Parameters:
+    wins (int): Number of winning trades.
+    count (int): Number of trades.
+    confidence (float): Confidence level of the interval.
+
+    Returns:
+    tuple: (low, high), or None if there are no trades.
+    """
+    if not count:
+        return None
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = wins / count
+    center = (rate + z * z / (2 * count)) / (1 + z * z / count)
+    margin = z / (1 + z * z / count) * math.sqrt(rate * (1 - rate) / count + z * z / (4 * count * count))
+    return (max(center - margin, 0.0), min(center + margin, 1.0))
+
+
+def bootstrap(pnls, simulations=10000, horizon=None, seed=0, processes=1,
+              confidence=0.95, risk_fraction=0.02, ruin_level=0.5):
+    """
+    Bootstraps resampled trade sequences from the journal's PnL distribution.
+
+    Each simulation draws `horizon` trades with replacement. Equity for risk of ruin
+    starts at 1 and every trade changes it by risk_fraction * PnL%; a simulation is
+    ruined once equity falls to ruin_level or below.
+
+    Parameters:
+    pnls (list of float): Observed PnL percentages.
+    simulations (int): Number of simulated sequences.
+    horizon (int): Trades per sequence (defaults to the number of observed trades).
+    seed (int): Base seed; the same seed gives the same result for any process count.
+    processes (int): Worker processes (1 runs in-process).
+    confidence (float): Confidence level of the intervals and value-at-risk.
+    risk_fraction (float): Fraction of equity put at stake per trade.
+    ruin_level (float): Equity level counted as ruin.
+
+    Returns:
+    dict: Confidence intervals for win rate and net PnL, value-at-risk and
+    expected shortfall of the net PnL (as positive loss percentages) and risk of
+    ruin, or None if there are no trades.
+    """
+    if not pnls:
+        return None
+    horizon = horizon or len(pnls)
+    # Converting every trade up front only pays off if more trades are drawn than
+    # there are; otherwise the cost would grow with the history instead of the draws
+    if simulations * horizon >= len(pnls):
+        log_growth = [_log_growth(p, risk_fraction) for p in pnls]
+    else:
+        log_growth = None
+    log_ruin = math.log(ruin_level)
+
+    jobs = []
+    remaining = simulations
+    chunk_index = 0
+    while remaining > 0:
+        size = min(CHUNK_SIZE, remaining)
+        jobs.append((horizon, size, seed, chunk_index, log_ruin, risk_fraction))
+        remaining -= size
+        chunk_index += 1
+
+    with profiler.span("monte_carlo.bootstrap"):
+        if processes > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(pnls, log_growth)) as pool:
+                results = list(pool.map(_simulate_chunk, jobs))
+        else:
+            _init_worker(pnls, log_growth)
+            results = [_simulate_chunk(job) for job in jobs]
+
+    win_rates = sorted(w for chunk in results for w in chunk[0])
+    net_pnls = sorted(p for chunk in results for p in chunk[1])
+    ruined = sum(chunk[2] for chunk in results)
+
+    tail = (1 - confidence) / 2 * 100
+    var_level = (1 - confidence) * 100
+    var_cut = _percentile(net_pnls, var_level)
+    shortfall = [p for p in net_pnls if p <= var_cut]
+
+    return {
+        "simulations": simulations,
+        "horizon": horizon,
+        "confidence": confidence,
+        "win_rate_ci": (_percentile(win_rates, tail), _percentile(win_rates, 100 - tail)),
+        "net_pnl_ci": (_percentile(net_pnls, tail), _percentile(net_pnls, 100 - tail)),
+        "net_pnl_median": _percentile(net_pnls, 50),
+        # Reported as losses; 0 when even the worst tail of outcomes is a profit
+        "value_at_risk": max(-var_cut, 0.0),
+        "expected_shortfall": max(-math.fsum(shortfall) / len(shortfall), 0.0) if shortfall else 0.0,
+        "risk_of_ruin": ruined / simulations,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo bootstrap of trade outcomes.")
+    parser.add_argument("--simulations", type=int, default=100000)
+    parser.add_argument("--horizon", type=int, default=None, help="Trades per simulated sequence")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--position", choices=["long", "short"], default=None)
+    parser.add_argument("--risk-fraction", type=float, default=0.02, help="Fraction of equity risked per trade")
+    parser.add_argument("--ruin-level", type=float, default=0.5, help="Equity level counted as ruin")
+    parser.add_argument("--db", default="trade_data.db", help="Database file")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Read the trades from the columnar snapshot next to the database (refreshed first)")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        with open_snapshot(args.db) as trade_snapshot:
+            trade_pnls = pnls_from_snapshot(trade_snapshot, args.position)
+    else:
+        connection = profiler.connect(args.db)
+        trade_pnls = load_pnls(connection, args.position)
+        connection.close()
+
+    started = time.perf_counter()
+    result = bootstrap(
+        trade_pnls, simulations=args.simulations, horizon=args.horizon, seed=args.seed,
+        processes=args.processes, risk_fraction=args.risk_fraction, ruin_level=args.ruin_level
+    )
+    elapsed = time.perf_counter() - started
+    if result is None:
+        print("No closed trades to simulate.")
+    else:
+        pct = int(result["confidence"] * 100)
+        print(f"{result['simulations']} simulations of {result['horizon']} trades ({elapsed:.2f}s)")
+        print(f"Win rate {pct}% CI: {result['win_rate_ci'][0]:.3f} - {result['win_rate_ci'][1]:.3f}")
+        print(f"Net PnL {pct}% CI: {result['net_pnl_ci'][0]:.2f}% - {result['net_pnl_ci'][1]:.2f}%")
+        print(f"Median net PnL: {result['net_pnl_median']:.2f}%")
+        print(f"Value-at-risk ({pct}%): {result['value_at_risk']:.2f}%")
+        print(f"Expected shortfall ({pct}%): {result['expected_shortfall']:.2f}%")
+        print(f"Risk of ruin: {result['risk_of_ruin']:.4f}")
@@ -1,6 +1,13 @@
 import sqlite3
 import random
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from dimensions import insert_trades
+from timestamps import to_epoch_ms
+from setup_database import (
+    create_archive_tables, create_daily_stats_table, create_dimension_tables, create_trade_revision_table,
+    create_trades_table, migrate_trades_table
+)
 
 def populate_trades():
     """
@@ -11,23 +18,25 @@ def populate_trades():
     conn = sqlite3.connect("trade_data.db")
     cursor = conn.cursor()
 
-    # 1. Reset the 'trades' table
+    # 1. Reset the 'trades' table. Everything derived from the old trades goes with it:
+    # the saved report figures, the daily figures and the summaries of archived trades
     cursor.execute("DROP TABLE IF EXISTS trades")
+    for table in ("report_state", "report_pnls", "daily_stats", "trade_summaries",
+                  "archived_extremes", "archived_sketches", "archived_time_buckets"):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
     conn.commit()
 
     # 2. Recreate the 'trades' table
-    cursor.execute("""
-        CREATE TABLE trades (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            coin_name TEXT NOT NULL,
-            position TEXT NOT NULL,
-            leverage INTEGER NOT NULL,
-            entry_price REAL NOT NULL,
-            exit_price REAL NOT NULL,
-            mode TEXT NOT NULL,
-            date TEXT NOT NULL
-        )
-    """)
+    create_dimension_tables(conn)
+    create_trades_table(conn)
+    migrate_trades_table(conn)
+    create_archive_tables(conn)
+    create_daily_stats_table(conn)
+
+    # The revision triggers were dropped with the table; recreate them and move the
+    # counter on, so columnar snapshots of the old trades are rebuilt
+    create_trade_revision_table(conn)
+    cursor.execute("UPDATE trade_revision SET revision = revision + 1 WHERE id = 1")
     conn.commit()
 
     # 3. Define coin price ranges
@@ -67,7 +76,9 @@ def populate_trades():
 
     # All trades will have today's date
     today_str = datetime.now().strftime("%Y-%m-%d")
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
+    new_trades = []
     for coin, num_trades in trades_distribution.items():
         min_price, max_price = coins[coin]
 
@@ -99,19 +110,17 @@ def populate_trades():
 
             trade_date = today_str  # All trades have today's date
 
-            # Insert the trade into the database
-            cursor.execute("""
-                INSERT INTO trades (coin_name, position, leverage, entry_price, exit_price, mode, date)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                coin,
-                position,
-                leverage,
-                entry_price,
-                exit_price,
-                mode,
-                trade_date
-            ))
+            # Random entry time during the day, closed up to a few hours later (same day)
+            entry_minute = random.randint(0, 24 * 60 - 2)
+            exit_minute = random.randint(entry_minute + 1, min(entry_minute + 240, 24 * 60 - 1))
+            entry_time = to_epoch_ms(midnight + timedelta(minutes=entry_minute))
+            exit_time = to_epoch_ms(midnight + timedelta(minutes=exit_minute))
+
+            # Collect the trade; all trades are inserted at once below
+            new_trades.append((coin, position, mode, trade_date, leverage, entry_price, exit_price, 1,
+                               entry_time, exit_time))
+
+    insert_trades(cursor, new_trades)
 
     # 6. Commit changes and close the connection
     conn.commit()
@@ -0,0 +1,392 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Set TRADE_JOURNAL_PROFILE=1 to turn instrumentation on for a run.
+PROFILE_ENV_VAR = "TRADE_JOURNAL_PROFILE"
+
+# Number of SQLite virtual machine instructions between progress callbacks.
+PROGRESS_INTERVAL = 1000
+
+
+class _NullSpan:
+    """
+    Context manager returned by span() while profiling is disabled. It does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    A named timing span. Spans nest per thread; the full stack path is recorded.
+    """
+    __slots__ = ("profiler", "name", "path", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.path = None
+        self.start = 0.0
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        stack.append(self.name)
+        self.path = ";".join(stack)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        self.profiler._stack().pop()
+        self.profiler._record_span(self.path, elapsed)
+        return False
+
+
+class Profiler:
+    """
+    Collects timing spans, per-statement SQL timings and named counters.
+
+    All recording methods return immediately while the profiler is disabled,
+    so instrumented code costs a single attribute check when not profiling.
+    """
+    def __init__(self, enabled=False):
+        """
+        Parameters:
+        enabled (bool): Whether to start collecting immediately.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard everything recorded so far.
+        """
+        with self._lock:
+            # path -> [calls, total_seconds]
+            self.spans = {}
+            # sql -> [calls, total_seconds, rows]
+            self.statements = {}
+            # name -> int
+            self.counters = {}
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record_span(self, path, elapsed):
+        with self._lock:
+            entry = self.spans.get(path)
+            if entry is None:
+                self.spans[path] = [1, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def _record_statement(self, sql, elapsed, rows, calls=1):
+        sql = " ".join(sql.split())
+        with self._lock:
+            entry = self.statements.get(sql)
+            if entry is None:
+                self.statements[sql] = [calls, elapsed, rows]
+            else:
+                entry[0] += calls
+                entry[1] += elapsed
+                entry[2] += rows
+        # Show SQL time inside the enclosing span in the flame graph
+        if elapsed:
+            stack = self._stack()
+            label = "sql:" + sql[:60].replace(";", ",")
+            self._record_span(";".join(stack + [label]), elapsed)
+
+    def span(self, name):
+        """
+        Return a context manager that times the enclosed block under the given name.
+
+        Parameters:
+        name (str): Name of the span, e.g. "report.pdf_render".
+
+        Returns:
+        A context manager.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def count(self, name, amount=1):
+        """
+        Add an amount to a named counter (e.g. "rows_scanned").
+
+        Parameters:
+        name (str): Counter name.
+        amount (int): Amount to add.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _on_trace(self, statement):
+        """
+        sqlite3 trace callback: called for every statement SQLite runs, including
+        implicit BEGIN/COMMIT statements issued by the sqlite3 module.
+        """
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "EMPTY"
+        self.count("sql_statements")
+        self.count(f"sql_statements.{keyword}")
+
+    def _on_progress(self):
+        """
+        sqlite3 progress handler: approximates the work SQLite does inside a statement.
+        """
+        self.count("sqlite_vm_steps", PROGRESS_INTERVAL)
+        return 0
+
+    def instrument(self, conn):
+        """
+        Install the trace and progress callbacks on an existing connection.
+
+        Parameters:
+        conn (sqlite3.Connection): Connection to instrument.
+        """
+        if not self.enabled:
+            return
+        conn.set_trace_callback(self._on_trace)
+        conn.set_progress_handler(self._on_progress, PROGRESS_INTERVAL)
+
+    def to_dict(self):
+        """
+        Return everything recorded so far as a JSON-serializable dictionary.
+
+        Returns:
+        dict: Spans (with total and self time), SQL statements and counters.
+        """
+        with self._lock:
+            spans = {path: list(values) for path, values in self.spans.items()}
+            statements = {sql: list(values) for sql, values in self.statements.items()}
+            counters = dict(self.counters)
+
+        self_times = _self_times(spans)
+        return {
+            "spans": [
+                {
+                    "path": path,
+                    "calls": calls,
+                    "total_ms": total * 1000,
+                    "self_ms": self_times[path] * 1000,
+                }
+                for path, (calls, total) in sorted(spans.items())
+            ],
+            "statements": [
+                {"sql": sql, "calls": calls, "total_ms": total * 1000, "rows": rows}
+                for sql, (calls, total, rows) in sorted(
+                    statements.items(), key=lambda item: item[1][1], reverse=True
+                )
+            ],
+            "counters": counters,
+        }
+
+    def export_json(self, path):
+        """
+        Write the profile as JSON.
+
+        Parameters:
+        path (str): Output file path.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def export_folded(self, path):
+        """
+        Write the spans in the collapsed-stack format ("a;b;c <microseconds>")
+        understood by flamegraph.pl, speedscope and similar tools.
+
+        Parameters:
+        path (str): Output file path.
+        """
+        with self._lock:
+            spans = {p: list(values) for p, values in self.spans.items()}
+        self_times = _self_times(spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack_path in sorted(self_times):
+                micros = int(round(self_times[stack_path] * 1_000_000))
+                if micros > 0:
+                    f.write(f"{stack_path} {micros}\n")
+
+    def dump(self, directory="profiles"):
+        """
+        Write the JSON and collapsed-stack profiles into a directory with a timestamped name.
+
+        Parameters:
+        directory (str): Output directory, created if missing.
+
+        Returns:
+        str: The path of the JSON file written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        base = os.path.join(directory, f"profile_{stamp}_{os.getpid()}")
+        self.export_json(base + ".json")
+        self.export_folded(base + ".folded")
+        return base + ".json"
+
+
+def _self_times(spans):
+    """
+    Compute self time per span path: total time minus the time of direct children.
+    """
+    self_times = {path: total for path, (calls, total) in spans.items()}
+    for path, (calls, total) in spans.items():
+        parent, sep, _ = path.rpartition(";")
+        if sep and parent in self_times:
+            self_times[parent] -= total
+    return {path: max(value, 0.0) for path, value in self_times.items()}
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that records execution time and row counts of each statement.
+    Time spent fetching rows is attributed to the statement that produced them.
+    """
+    _sql = ""
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            PROFILER._record_statement(sql, time.perf_counter() - start, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            PROFILER._record_statement(sql, time.perf_counter() - start, max(self.rowcount, 0))
+
+    def executescript(self, sql_script):
+        self._sql = sql_script
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            PROFILER._record_statement(sql_script, time.perf_counter() - start, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        PROFILER._record_statement(self._sql, time.perf_counter() - start, 1 if row is not None else 0, calls=0)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        PROFILER._record_statement(self._sql, time.perf_counter() - start, len(rows), calls=0)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        PROFILER._record_statement(self._sql, time.perf_counter() - start, len(rows), calls=0)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        PROFILER._record_statement(self._sql, time.perf_counter() - start, 1, calls=0)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    Connection whose cursors are ProfiledCursor instances and whose commits are timed.
+    """
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            PROFILER._record_statement("COMMIT", time.perf_counter() - start, 0)
+
+    def rollback(self):
+        start = time.perf_counter()
+        try:
+            return super().rollback()
+        finally:
+            PROFILER._record_statement("ROLLBACK", time.perf_counter() - start, 0)
+
+
+PROFILER = Profiler(enabled=os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0"))
+
+
+def span(name):
+    """
+    Shortcut for PROFILER.span(name).
+    """
+    return PROFILER.span(name)
+
+
+def count(name, amount=1):
+    """
+    Shortcut for PROFILER.count(name, amount).
+    """
+    PROFILER.count(name, amount)
+
+
+def connect(database, **kwargs):
+    """
+    Open an SQLite connection. When profiling is enabled the connection records
+    every statement with its duration and row count; otherwise it is a plain
+    sqlite3 connection.
+
+    Parameters:
+    database (str): Path to the SQLite database file.
+    **kwargs: Passed through to sqlite3.connect.
+
+    Returns:
+    sqlite3.Connection: The database connection.
+    """
+    if not PROFILER.enabled:
+        return sqlite3.connect(database, **kwargs)
+    conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+    PROFILER.instrument(conn)
+    return conn
+
+
+def _dump_at_exit():
+    if PROFILER.enabled and (PROFILER.spans or PROFILER.statements):
+        path = PROFILER.dump()
+        print(f"Profile written: {path}")
+
+
+atexit.register(_dump_at_exit)
@@ -0,0 +1,211 @@
+import math
+
+# Default accuracy parameter: the top compactor holds about K values
+DEFAULT_K = 200
+# Each lower compactor holds C times as many values as the one above it
+C = 2 / 3
+
+
+def rank_error_bound(k=DEFAULT_K):
+    """
+    Returns the approximate normalized rank error of a KLLSketch with parameter k
+    (about 1.3% for k = 200, 0.7% for k = 400), holding with ~99% confidence.
+
+    A quantile query for q returns a value whose true rank lies within
+    (q +/- error) * n. The constants are the empirical ones published for KLL
+    sketches with c = 2/3; the bound does not depend on the number of values added.
+    """
+    return 2.296 / k ** 0.9723
+
+
+class KLLSketch:
+    """
+    A mergeable quantile sketch (Karnin, Lang and Liberty, "Optimal Quantile
+    Approximation in Streams", 2016).
+
+    Values enter compactor 0. When the sketch is full, the lowest compactor that
+    exceeds its capacity is sorted and every other value moves one level up with
+    twice the weight. Capacities shrink geometrically towards lower levels, so the
+    sketch holds at most about k / (1 - c) = 3k values however many are added, and
+    the rank error is bounded by rank_error_bound(k) (see there).
+
+    Two sketches built from different parts of the data (parallel workers, archived
+    months, other journals) can be merged into a sketch of the union with the same
+    error bound. The minimum and maximum are tracked exactly.
+
+    Which half of a compactor moves up alternates in a fixed pattern instead of
+    being random, so the same input always gives the same sketch.
+    """
+    __slots__ = ("k", "compactors", "count", "min", "max", "_size", "_max_size", "_compactions")
+
+    def __init__(self, k=DEFAULT_K):
+        """
+        Parameters:
+        k (int): Accuracy parameter; memory grows linearly with k.
+        """
+        self.k = k
+        self.compactors = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._size = 0
+        self._max_size = 0
+        self._compactions = 0
+        self._grow()
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(C ** depth * self.k)) + 1
+
+    def add(self, value):
+        """
+        Adds one value.
+        """
+        self.compactors[0].append(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update(self, values):
+        """
+        Adds many values. Gives the same sketch as calling add() for each value,
+        but fills compactor 0 in slices.
+
+        Parameters:
+        values (list of float): Values to add.
+        """
+        if not values:
+            return
+        self.count += len(values)
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+        start = 0
+        while start < len(values):
+            chunk = values[start:start + self._max_size - self._size]
+            self.compactors[0].extend(chunk)
+            self._size += len(chunk)
+            start += len(chunk)
+            if self._size >= self._max_size:
+                self._compress()
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self._grow()
+                    items.sort()
+                    # Keep the odd one out at this level
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    offset = (self._compactions * 0x9E3779B1 >> 7) & 1
+                    self._compactions += 1
+                    promoted = items[offset::2]
+                    self.compactors[level + 1].extend(promoted)
+                    self.compactors[level] = leftover
+                    self._size -= len(items) - len(promoted)
+                    break
+            else:
+                return
+
+    def merge(self, other):
+        """
+        Adds all values summarized by another sketch, in place.
+
+        Parameters:
+        other (KLLSketch): Sketch to merge in (not modified).
+        """
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(c) for c in self.compactors)
+        self._compress()
+
+    def _weighted(self):
+        """
+        Returns the retained values with their weights, sorted by value.
+        """
+        pairs = [(value, 1 << level) for level, items in enumerate(self.compactors) for value in items]
+        pairs.sort()
+        return pairs
+
+    def quantiles(self, qs):
+        """
+        Returns approximate quantiles.
+
+        Parameters:
+        qs (list of float): Quantile levels between 0 and 1 (0.5 is the median).
+
+        Returns:
+        list of float: The quantile values, or an empty list if nothing was added.
+        """
+        if not self.count:
+            return []
+        pairs = self._weighted()
+        total = sum(weight for _, weight in pairs)
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            if q >= 1:
+                results.append(self.max)
+                continue
+            target = q * total
+            seen = 0
+            value = pairs[-1][0]
+            for item, weight in pairs:
+                seen += weight
+                if seen >= target:
+                    value = item
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, q):
+        """
+        Returns one approximate quantile (see quantiles()), or None if empty.
+        """
+        values = self.quantiles([q])
+        return values[0] if values else None
+
+    def to_dict(self):
+        """
+        Returns the sketch as JSON-serializable data (see from_dict()).
+        """
+        return {
+            "k": self.k,
+            "compactors": self.compactors,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "compactions": self._compactions,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuilds a sketch saved with to_dict().
+        """
+        sketch = cls(data["k"])
+        sketch.compactors = [list(items) for items in data["compactors"]] or [[]]
+        sketch.count = data["count"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        sketch._compactions = data["compactions"]
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        return sketch
@@ -2,7 +2,38 @@ import os
 import sqlite3
 from datetime import datetime
 from fpdf import FPDF
-from collections import Counter
+
+import profiler
+from charts import add_chart_page, add_time_of_day_page
+from monte_carlo import REPORT_HORIZON, REPORT_SIMULATIONS, bootstrap, win_rate_interval
+from report_state import equity_curve, sample_pnls, update_report_state
+from quantile_sketch import rank_error_bound
+from time_of_day import WEEKDAYS
+from trade_stats import analyze, calculate_metrics, coin_summary, pnl_percentiles
+
+def add_daily_section(pdf, date_str, daily_stats):
+    """
+    Adds the daily report section for one day.
+
+    Parameters:
+    pdf (FPDF): The document to add the section to.
+    date_str (str): The day ('YYYY-MM-DD').
+    daily_stats (dict): calculate_metrics() of the day's trades.
+    """
+    pdf.cell(200, 10, txt=f"[DAILY REPORT] - Date: {date_str}", align="L", ln=1)
+    pdf.cell(200, 8, txt=f"Total Trades: {daily_stats['total_trades']}", align="L", ln=1)
+    if daily_stats['total_trades'] > 0:
+        pdf.cell(200, 8, txt=f"Most Traded Coin: {daily_stats['top_coin']} ({daily_stats['top_coin_count']} trades)", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Most Used Position: {daily_stats['top_position']}", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Most Used Leverage: {daily_stats['top_leverage']}x", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Best Performing Coin (Average PnL): {daily_stats['best_coin']} ({daily_stats['best_coin_avg_pnl']:.2f}%)", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Worst Performing Coin (Average PnL): {daily_stats['worst_coin']} ({daily_stats['worst_coin_avg_pnl']:.2f}%)", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Highest Single Trade PnL: {daily_stats['max_pnl']:.2f}%", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Lowest Single Trade PnL: {daily_stats['min_pnl']:.2f}%", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Net PnL (Total): {daily_stats['net_pnl']:.2f}%", align="L", ln=1)
+    else:
+        pdf.cell(200, 8, txt="No trades recorded today.", align="L", ln=1)
+    pdf.ln(5)
 
 def generate_full_report_with_recommendations(conn):
     """
@@ -12,7 +43,6 @@ def generate_full_report_with_recommendations(conn):
     Parameters:
     conn (sqlite3.Connection): The SQLite database connection.
     """
-    cursor = conn.cursor()
     today_str = datetime.now().strftime("%Y-%m-%d")
 
     # Ensure the reports directory exists
@@ -20,439 +50,250 @@ def generate_full_report_with_recommendations(conn):
     pdf_name = f"report_{today_str}.pdf"
     pdf_path = os.path.join("reports", pdf_name)
 
-    # Fetch all trades
-    cursor.execute("""
-        SELECT coin_name, position, leverage, entry_price, exit_price, mode, date
-        FROM trades
-    """)
-    all_trades = cursor.fetchall()
-
-    # Fetch today's trades
-    cursor.execute("""
-        SELECT coin_name, position, leverage, entry_price, exit_price, mode, date
-        FROM trades
-        WHERE date = ?
-    """, (today_str,))
-    daily_trades = cursor.fetchall()
-
     ############################################################################
-    # 1) GENERAL + DAILY METRICS CALCULATION
+    # 1) FOLD THE NEW TRADES INTO THE SAVED AGGREGATES
     ############################################################################
-    def calculate_metrics(trades):
-        """
-        Calculates various trading metrics based on the provided trades.
-
-        Parameters:
-        trades (list of tuple): List of trade records.
-
-        Returns:
-        dict: A dictionary containing calculated metrics.
-        """
-        if not trades:
-            return {
-                "total_trades": 0,
-                "top_coin": "None",
-                "top_coin_count": 0,
-                "top_position": "None",
-                "top_leverage": 0,
-                "best_coin": "None",
-                "best_coin_avg_pnl": 0.0,
-                "worst_coin": "None",
-                "worst_coin_avg_pnl": 0.0,
-                "max_pnl": 0.0,
-                "min_pnl": 0.0,
-                "net_pnl": 0.0,
-            }
-
-        total_trades = len(trades)
-
-        # Most traded coin
-        coin_counter = Counter([t[0] for t in trades])  # coin_name
-        top_coin, top_coin_count = coin_counter.most_common(1)[0]
-
-        # Most used position
-        position_counter = Counter([t[1].lower() for t in trades])
-        top_position, _ = position_counter.most_common(1)[0]
-
-        # Most used leverage
-        leverage_counter = Counter([t[2] for t in trades])
-        top_leverage, _ = leverage_counter.most_common(1)[0]
-
-        # Calculate PnL
-        def get_pnl(position, leverage, entry_price, exit_price):
-            if entry_price == 0:
-                return 0
-            if position.lower() == "long":
-                return ((exit_price - entry_price) / entry_price) * 100 * leverage
-            else:  # short
-                return ((entry_price - exit_price) / entry_price) * 100 * leverage
-
-        coin_pnl_dict = {}
-        all_pnl_list = []
-
-        for (coin, pos, lev, entry, exit_, mode_, dte) in trades:
-            pnl = get_pnl(pos, lev, entry, exit_)
-            coin_pnl_dict.setdefault(coin, []).append(pnl)
-            all_pnl_list.append(pnl)
-
-        if all_pnl_list:
-            max_pnl = max(all_pnl_list)
-            min_pnl = min(all_pnl_list)
-            net_pnl = sum(all_pnl_list)
-        else:
-            max_pnl = 0.0
-            min_pnl = 0.0
-            net_pnl = 0.0
-
-        # Best and worst coins based on average PnL
-        best_coin = "None"
-        best_coin_avg_pnl = float("-inf")
-        worst_coin = "None"
-        worst_coin_avg_pnl = float("inf")
-
-        for c, pnls in coin_pnl_dict.items():
-            avg_pnl = sum(pnls) / len(pnls)
-            if avg_pnl > best_coin_avg_pnl:
-                best_coin_avg_pnl = avg_pnl
-                best_coin = c
-            if avg_pnl < worst_coin_avg_pnl:
-                worst_coin_avg_pnl = avg_pnl
-                worst_coin = c
-
-        return {
-            "total_trades": total_trades,
-            "top_coin": top_coin,
-            "top_coin_count": top_coin_count,
-            "top_position": top_position,
-            "top_leverage": top_leverage,
-            "best_coin": best_coin,
-            "best_coin_avg_pnl": best_coin_avg_pnl,
-            "worst_coin": worst_coin,
-            "worst_coin_avg_pnl": worst_coin_avg_pnl,
-            "max_pnl": max_pnl,
-            "min_pnl": min_pnl,
-            "net_pnl": net_pnl,
-        }
-
-    all_time_stats = calculate_metrics(all_trades)
-    daily_stats = calculate_metrics(daily_trades)
+    # Archived trades only contribute their stored summaries; open positions have
+    # no exit price yet and are left out until they are closed
+    state = update_report_state(conn, today_str)
+    stats = state.stats
+    daily = state.daily
+    hot_trades = state.hot_trades
 
     ############################################################################
-    # 2) DETAILED ANALYSIS
+    # 2) GENERAL + DAILY METRICS, DETAILED ANALYSIS AND RECOMMENDATIONS
     ############################################################################
-    def get_pnl(position, leverage, entry_price, exit_price):
-        """
-        Calculates the leveraged PnL for a trade.
-
-        Parameters:
-        position (str): 'long' or 'short'.
-        leverage (int): The leverage used.
-        entry_price (float): Entry price of the trade.
-        exit_price (float): Exit price of the trade.
-
-        Returns:
-        float: The PnL percentage.
-        """
-        if entry_price == 0:
-            return None
-        if position.lower() == "long":
-            return ((exit_price - entry_price) / entry_price) * 100 * leverage
-        else:  # short
-            return ((entry_price - exit_price) / entry_price) * 100 * leverage
-
-    def get_spot_pnl(position, entry_price, exit_price):
-        """
-        Calculates the spot (1x) PnL for a trade.
-
-        Parameters:
-        position (str): 'long' or 'short'.
-        entry_price (float): Entry price of the trade.
-        exit_price (float): Exit price of the trade.
-
-        Returns:
-        float: The PnL percentage.
-        """
-        if entry_price == 0:
-            return None
-        if position.lower() == "long":
-            return ((exit_price - entry_price) / entry_price) * 100
-        else:
-            return ((entry_price - exit_price) / entry_price) * 100
-
-    real_count = real_win = real_loss = 0
-    demo_count = demo_win = demo_loss = 0
-    long_count = long_win = long_loss = 0
-    short_count = short_win = short_loss = 0
-    low_count = low_win = low_loss = 0
-    high_count = high_win = high_loss = 0
-
-    long_trades = []
-    short_trades = []
-
-    # Calculate average Spot and Leveraged PnL
-    spot_pnl_list = []
-    leverage_pnl_list = []
-
-    # Coin success analysis: coin -> (win_count, total_count)
-    coin_success_dict = {}
-
-    for (coin, position, lev, entry, exit_, mode_, dte) in all_trades:
-        actual_pnl = get_pnl(position, lev, entry, exit_)
-        spot_pnl = get_spot_pnl(position, entry, exit_)
-
-        # Add to PnL lists if valid
-        if actual_pnl is not None and spot_pnl is not None:
-            leverage_pnl_list.append(actual_pnl)
-            spot_pnl_list.append(spot_pnl)
-
-        # Track coin success ratio
-        if coin not in coin_success_dict:
-            coin_success_dict[coin] = [0, 0]  # [win_count, total_count]
-
-        # REAL vs DEMO
-        if actual_pnl is not None:
-            if mode_.lower() == "real":
-                real_count += 1
-                if actual_pnl > 0:
-                    real_win += 1
-                    coin_success_dict[coin][0] += 1
-                elif actual_pnl < 0:
-                    real_loss += 1
-                coin_success_dict[coin][1] += 1
-            else:
-                demo_count += 1
-                if actual_pnl > 0:
-                    demo_win += 1
-                    coin_success_dict[coin][0] += 1
-                elif actual_pnl < 0:
-                    demo_loss += 1
-                coin_success_dict[coin][1] += 1
-
-        # LONG vs SHORT
-        if actual_pnl is not None:
-            if position.lower() == "long":
-                long_count += 1
-                if actual_pnl > 0:
-                    long_win += 1
-                elif actual_pnl < 0:
-                    long_loss += 1
-                long_trades.append((coin, actual_pnl, entry, exit_))
-            else:
-                short_count += 1
-                if actual_pnl > 0:
-                    short_win += 1
-                elif actual_pnl < 0:
-                    short_loss += 1
-                short_trades.append((coin, actual_pnl, entry, exit_))
-
-        # Low vs High leverage
-        if actual_pnl is not None:
-            if lev <= 5:
-                low_count += 1
-                if actual_pnl > 0:
-                    low_win += 1
-                elif actual_pnl < 0:
-                    low_loss += 1
-            else:
-                high_count += 1
-                if actual_pnl > 0:
-                    high_win += 1
-                elif actual_pnl < 0:
-                    high_loss += 1
-
-    # Top 3 and worst 3 Long trades
-    long_trades_sorted = sorted(long_trades, key=lambda x: x[1], reverse=True)
-    top3_long = long_trades_sorted[:3]
-    worst3_long = long_trades_sorted[-3:]
-
-    # Top 3 and worst 3 Short trades
-    short_trades_sorted = sorted(short_trades, key=lambda x: x[1], reverse=True)
-    top3_short = short_trades_sorted[:3]
-    worst3_short = short_trades_sorted[-3:]
-
-    # Calculate average PnLs
-    avg_spot_pnl = sum(spot_pnl_list) / len(spot_pnl_list) if spot_pnl_list else 0
-    avg_lev_pnl = sum(leverage_pnl_list) / len(leverage_pnl_list) if leverage_pnl_list else 0
+    with profiler.span("report.general_metrics"):
+        all_time_stats = calculate_metrics(stats)
+        daily_stats = calculate_metrics(daily)
+
+    with profiler.span("report.detailed_analysis"):
+        analysis = analyze(stats)
+        coins = coin_summary(stats)
+
+    # Approximate PnL percentiles from the quantile sketches built during the scan
+    with profiler.span("report.percentiles"):
+        percentile_groups = [
+            ("All Trades", "all"),
+            ("Real", "mode:real"),
+            ("Demo", "mode:demo"),
+            ("Low Leverage (1-5x)", "leverage:low"),
+            ("High Leverage (5x+)", "leverage:high"),
+        ]
+        # The ten most traded coins
+        for coin, _, _, _ in sorted(coins, key=lambda row: row[3], reverse=True)[:10]:
+            percentile_groups.append((coin, f"coin:{coin}"))
+        percentile_rows = []
+        for label, sketch_key in percentile_groups:
+            result = pnl_percentiles(stats, sketch_key)
+            if result is not None:
+                percentile_rows.append((label, *result))
 
     ############################################################################
-    # 3) RECOMMENDATION SECTION
+    # 3) RISK ESTIMATES
     ############################################################################
-    # coin_success_dict = { coin: [win_count, total_count] }
-    coin_recommendations = []
-    for c, (win_count, total_count) in coin_success_dict.items():
-        if total_count > 0:
-            sr = win_count / total_count
-            coin_recommendations.append((c, sr, total_count))
-
-    coin_recommendations.sort(key=lambda x: x[1], reverse=True)
-
-    # Position type success ratios
-    long_ratio = long_win / long_count if long_count > 0 else 0
-    short_ratio = short_win / short_count if short_count > 0 else 0
-
-    # Leverage success ratios
-    low_ratio = low_win / low_count if low_count > 0 else 0
-    high_ratio = high_win / high_count if high_count > 0 else 0
+    # Project the next REPORT_HORIZON trades by bootstrapping the PnL distribution.
+    # A fixed number of sequences drawn from a bounded sample of the saved PnLs keeps
+    # the cost independent of the history; monte_carlo.py runs the full simulation.
+    overall_pnls = sample_pnls(conn, state)
+    with profiler.span("report.monte_carlo"):
+        overall_risk = bootstrap(overall_pnls, simulations=REPORT_SIMULATIONS, horizon=REPORT_HORIZON)
+    # Long and short are compared by how precisely each side's own trades pin down its win rate
+    long_interval = win_rate_interval(analysis['long_win'], analysis['long_count'])
+    short_interval = win_rate_interval(analysis['short_win'], analysis['short_count'])
 
     ############################################################################
     # 4) PDF CREATION
     ############################################################################
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Helvetica", size=12)
-
-    # Title
-    pdf.cell(200, 10, txt="CRYPTO TRADING REPORT", align="C", ln=1)
-    pdf.ln(5)
-
-    # --- GENERAL REPORT ---
-    pdf.cell(200, 10, txt="[GENERAL REPORT]", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Total Trades: {all_time_stats['total_trades']}", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Most Traded Coin: {all_time_stats['top_coin']} ({all_time_stats['top_coin_count']} trades)", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Most Used Position: {all_time_stats['top_position']}", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Most Used Leverage: {all_time_stats['top_leverage']}x", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Best Performing Coin (Average PnL): {all_time_stats['best_coin']} ({all_time_stats['best_coin_avg_pnl']:.2f}%)", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Worst Performing Coin (Average PnL): {all_time_stats['worst_coin']} ({all_time_stats['worst_coin_avg_pnl']:.2f}%)", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Highest Single Trade PnL: {all_time_stats['max_pnl']:.2f}%", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Lowest Single Trade PnL: {all_time_stats['min_pnl']:.2f}%", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Net PnL (Total): {all_time_stats['net_pnl']:.2f}%", align="L", ln=1)
-    pdf.ln(5)
-
-    # --- DAILY REPORT ---
-    pdf.cell(200, 10, txt=f"[DAILY REPORT] - Date: {today_str}", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Total Trades: {daily_stats['total_trades']}", align="L", ln=1)
-    if daily_stats['total_trades'] > 0:
-        pdf.cell(200, 8, txt=f"Most Traded Coin: {daily_stats['top_coin']} ({daily_stats['top_coin_count']} trades)", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Most Used Position: {daily_stats['top_position']}", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Most Used Leverage: {daily_stats['top_leverage']}x", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Best Performing Coin (Average PnL): {daily_stats['best_coin']} ({daily_stats['best_coin_avg_pnl']:.2f}%)", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Worst Performing Coin (Average PnL): {daily_stats['worst_coin']} ({daily_stats['worst_coin_avg_pnl']:.2f}%)", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Highest Single Trade PnL: {daily_stats['max_pnl']:.2f}%", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Lowest Single Trade PnL: {daily_stats['min_pnl']:.2f}%", align="L", ln=1)
-        pdf.cell(200, 8, txt=f"Net PnL (Total): {daily_stats['net_pnl']:.2f}%", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="No trades recorded today.", align="L", ln=1)
-    pdf.ln(5)
-
-    # --- DETAILED ANALYSIS ---
-    pdf.cell(200, 10, txt="[DETAILED ANALYSIS]", align="L", ln=1)
-    pdf.ln(2)
-
-    # (Real / Demo)
-    pdf.cell(200, 8, txt=f"Real Trades: {real_count} (Wins: {real_win}, Losses: {real_loss})", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Demo Trades: {demo_count} (Wins: {demo_win}, Losses: {demo_loss})", align="L", ln=1)
-    pdf.ln(3)
-
-    # (Long / Short)
-    pdf.cell(200, 8, txt=f"Long Trades: {long_count} (Wins: {long_win}, Losses: {long_loss})", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Short Trades: {short_count} (Wins: {short_win}, Losses: {short_loss})", align="L", ln=1)
-    pdf.ln(3)
-
-    # Top 3 and worst 3 Long trades
-    pdf.cell(200, 8, txt="Top 3 Long Trades:", align="L", ln=1)
-    if top3_long:
-        for (coin, pnl, entry, exit_) in top3_long:
-            pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
-    pdf.ln(3)
-
-    pdf.cell(200, 8, txt="Worst 3 Long Trades:", align="L", ln=1)
-    if worst3_long:
-        for (coin, pnl, entry, exit_) in worst3_long:
-            pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
-    pdf.ln(3)
-
-    # Top 3 and worst 3 Short trades
-    pdf.cell(200, 8, txt="Top 3 Short Trades:", align="L", ln=1)
-    if top3_short:
-        for (coin, pnl, entry, exit_) in top3_short:
-            pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
-    pdf.ln(3)
-
-    pdf.cell(200, 8, txt="Worst 3 Short Trades:", align="L", ln=1)
-    if worst3_short:
-        for (coin, pnl, entry, exit_) in worst3_short:
-            pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
-    pdf.ln(3)
+    with profiler.span("report.pdf_render"):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Helvetica", size=12)
+
+        # Title
+        pdf.cell(200, 10, txt="CRYPTO TRADING REPORT", align="C", ln=1)
+        pdf.ln(5)
+
+        # --- GENERAL REPORT ---
+        pdf.cell(200, 10, txt="[GENERAL REPORT]", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Total Trades: {all_time_stats['total_trades']}", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Most Traded Coin: {all_time_stats['top_coin']} ({all_time_stats['top_coin_count']} trades)", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Most Used Position: {all_time_stats['top_position']}", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Most Used Leverage: {all_time_stats['top_leverage']}x", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Best Performing Coin (Average PnL): {all_time_stats['best_coin']} ({all_time_stats['best_coin_avg_pnl']:.2f}%)", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Worst Performing Coin (Average PnL): {all_time_stats['worst_coin']} ({all_time_stats['worst_coin_avg_pnl']:.2f}%)", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Highest Single Trade PnL: {all_time_stats['max_pnl']:.2f}%", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Lowest Single Trade PnL: {all_time_stats['min_pnl']:.2f}%", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Net PnL (Total): {all_time_stats['net_pnl']:.2f}%", align="L", ln=1)
+        pdf.ln(5)
+
+        # --- DAILY REPORT ---
+        add_daily_section(pdf, today_str, daily_stats)
+
+        # --- DETAILED ANALYSIS ---
+        pdf.cell(200, 10, txt="[DETAILED ANALYSIS]", align="L", ln=1)
+        pdf.ln(2)
+
+        # (Real / Demo)
+        pdf.cell(200, 8, txt=f"Real Trades: {analysis['real_count']} (Wins: {analysis['real_win']}, Losses: {analysis['real_loss']})", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Demo Trades: {analysis['demo_count']} (Wins: {analysis['demo_win']}, Losses: {analysis['demo_loss']})", align="L", ln=1)
+        pdf.ln(3)
 
-    # Low vs High leverage
-    pdf.cell(200, 8, txt=f"Low Leverage (1-5x): {low_count} (Wins: {low_win}, Losses: {low_loss})", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"High Leverage (5x+): {high_count} (Wins: {high_win}, Losses: {high_loss})", align="L", ln=1)
-    pdf.ln(5)
+        # (Long / Short)
+        pdf.cell(200, 8, txt=f"Long Trades: {analysis['long_count']} (Wins: {analysis['long_win']}, Losses: {analysis['long_loss']})", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Short Trades: {analysis['short_count']} (Wins: {analysis['short_win']}, Losses: {analysis['short_loss']})", align="L", ln=1)
+        pdf.ln(3)
 
-    # --- SPOT vs LEVERAGED PnL COMPARISON ---
-    pdf.cell(200, 10, txt="[SPOT (1x) vs LEVERAGED PnL COMPARISON]", align="L", ln=1)
-    pdf.ln(2)
-    pdf.cell(200, 8, txt=f"Average Spot PnL: {avg_spot_pnl:.2f}%", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Average Leveraged PnL: {avg_lev_pnl:.2f}%", align="L", ln=1)
-    if avg_spot_pnl != 0:
-        ratio = avg_lev_pnl / avg_spot_pnl
-        pdf.cell(200, 8, txt=f"Leverage/Spot Ratio: {ratio:.2f}x", align="L", ln=1)
-    pdf.ln(5)
+        # Top 3 and worst 3 Long trades
+        pdf.cell(200, 8, txt="Top 3 Long Trades:", align="L", ln=1)
+        if analysis['top3_long']:
+            for (coin, pnl, entry, exit_) in analysis['top3_long']:
+                pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
+        pdf.ln(3)
 
-    # --- RECOMMENDATION SECTION ---
-    pdf.cell(200, 10, txt="[RECOMMENDATION SECTION]", align="L", ln=1)
-    pdf.ln(2)
+        pdf.cell(200, 8, txt="Worst 3 Long Trades:", align="L", ln=1)
+        if analysis['worst3_long']:
+            for (coin, pnl, entry, exit_) in analysis['worst3_long']:
+                pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
+        pdf.ln(3)
 
-    # a) Coin Recommendations
-    pdf.cell(200, 8, txt="Which coins should be focused on / avoided?", align="L", ln=1)
-    pdf.ln(2)
-    if not coin_recommendations:
-        pdf.cell(200, 8, txt="No recommendations due to lack of trade data.", align="L", ln=1)
-    else:
-        # Top 5 successful coins
-        best_coins = coin_recommendations[:5]
-        # Bottom 5 successful coins
-        worst_coins = coin_recommendations[-5:]
-
-        pdf.cell(200, 8, txt="Top Performing Coins (Success Rate):", align="L", ln=1)
-        for (c, sr, count_) in best_coins:
-            pdf.cell(200, 8, txt=f"  {c}: {sr:.2f} (Total {count_} trades)", align="L", ln=1)
+        # Top 3 and worst 3 Short trades
+        pdf.cell(200, 8, txt="Top 3 Short Trades:", align="L", ln=1)
+        if analysis['top3_short']:
+            for (coin, pnl, entry, exit_) in analysis['top3_short']:
+                pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
         pdf.ln(3)
 
-        pdf.cell(200, 8, txt="Worst Performing Coins (Success Rate):", align="L", ln=1)
-        for (c, sr, count_) in worst_coins:
-            pdf.cell(200, 8, txt=f"  {c}: {sr:.2f} (Total {count_} trades)", align="L", ln=1)
+        pdf.cell(200, 8, txt="Worst 3 Short Trades:", align="L", ln=1)
+        if analysis['worst3_short']:
+            for (coin, pnl, entry, exit_) in analysis['worst3_short']:
+                pdf.cell(200, 8, txt=f"  {coin} -> {pnl:.2f}%", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="  No data.", align="L", ln=1)
         pdf.ln(3)
 
-    # b) Preferred Position Type
-    pdf.cell(200, 8, txt="Which position type should be preferred?", align="L", ln=1)
-    pdf.ln(2)
-    pdf.cell(200, 8, txt=f"Long Success Rate: {long_ratio:.2f}", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"Short Success Rate: {short_ratio:.2f}", align="L", ln=1)
-    if long_ratio > short_ratio:
-        pdf.cell(200, 8, txt="Recommendation: Long positions seem more successful.", align="L", ln=1)
-    elif short_ratio > long_ratio:
-        pdf.cell(200, 8, txt="Recommendation: Short positions seem more successful.", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="Recommendation: Long and Short positions are similar or data is insufficient.", align="L", ln=1)
-    pdf.ln(5)
+        # Low vs High leverage
+        pdf.cell(200, 8, txt=f"Low Leverage (1-5x): {analysis['low_count']} (Wins: {analysis['low_win']}, Losses: {analysis['low_loss']})", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"High Leverage (5x+): {analysis['high_count']} (Wins: {analysis['high_win']}, Losses: {analysis['high_loss']})", align="L", ln=1)
+        pdf.ln(5)
+
+        # --- SPOT vs LEVERAGED PnL COMPARISON ---
+        pdf.cell(200, 10, txt="[SPOT (1x) vs LEVERAGED PnL COMPARISON]", align="L", ln=1)
+        pdf.ln(2)
+        pdf.cell(200, 8, txt=f"Average Spot PnL: {analysis['avg_spot_pnl']:.2f}%", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Average Leveraged PnL: {analysis['avg_lev_pnl']:.2f}%", align="L", ln=1)
+        if analysis['avg_spot_pnl'] != 0:
+            ratio = analysis['avg_lev_pnl'] / analysis['avg_spot_pnl']
+            pdf.cell(200, 8, txt=f"Leverage/Spot Ratio: {ratio:.2f}x", align="L", ln=1)
+        pdf.ln(5)
+
+        # --- RISK ESTIMATES ---
+        pdf.cell(200, 10, txt="[RISK ESTIMATES (MONTE CARLO, 95%)]", align="L", ln=1)
+        pdf.ln(2)
+        if overall_risk:
+            pdf.cell(200, 8, txt=f"Over the next {REPORT_HORIZON} trades ({REPORT_SIMULATIONS} simulations; run monte_carlo.py for more):", align="L", ln=1)
+            pdf.cell(200, 8, txt=f"Win Rate Interval: {overall_risk['win_rate_ci'][0]:.2f} - {overall_risk['win_rate_ci'][1]:.2f}", align="L", ln=1)
+            pdf.cell(200, 8, txt=f"Net PnL Interval: {overall_risk['net_pnl_ci'][0]:.2f}% - {overall_risk['net_pnl_ci'][1]:.2f}%", align="L", ln=1)
+            pdf.cell(200, 8, txt=f"Value-at-Risk: {overall_risk['value_at_risk']:.2f}% (Expected Shortfall: {overall_risk['expected_shortfall']:.2f}%)", align="L", ln=1)
+            pdf.cell(200, 8, txt=f"Risk of Ruin (2% risked per trade, ruin at 50% equity): {overall_risk['risk_of_ruin']:.4f}", align="L", ln=1)
+            if hot_trades < all_time_stats['total_trades']:
+                pdf.cell(200, 8, txt=f"(Based on the {hot_trades} trades not archived yet.)", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="No trade data.", align="L", ln=1)
+        pdf.ln(5)
+
+        # --- PnL PERCENTILES ---
+        pdf.cell(200, 10, txt="[PnL PERCENTILES (APPROXIMATE)]", align="L", ln=1)
+        pdf.ln(2)
+        if percentile_rows:
+            pdf.set_font("Helvetica", size=10)
+            for (label, count_, (p1, p5, p50, p95, p99)) in percentile_rows:
+                pdf.cell(200, 7, txt=f"{label}: p1 {p1:.2f}% | p5 {p5:.2f}% | median {p50:.2f}% | p95 {p95:.2f}% | p99 {p99:.2f}% ({count_} trades)", align="L", ln=1)
+            pdf.cell(200, 7, txt=f"Each value is within {rank_error_bound() * 100:.1f}% of the trades (by rank) of the exact percentile.", align="L", ln=1)
+            pdf.set_font("Helvetica", size=12)
+        else:
+            pdf.cell(200, 8, txt="No trade data.", align="L", ln=1)
+        pdf.ln(5)
+
+        # --- RECOMMENDATION SECTION ---
+        pdf.cell(200, 10, txt="[RECOMMENDATION SECTION]", align="L", ln=1)
+        pdf.ln(2)
+
+        # a) Coin Recommendations
+        pdf.cell(200, 8, txt="Which coins should be focused on / avoided?", align="L", ln=1)
+        pdf.ln(2)
+        if not analysis['coin_recommendations']:
+            pdf.cell(200, 8, txt="No recommendations due to lack of trade data.", align="L", ln=1)
+        else:
+            # Top 5 successful coins
+            best_coins = analysis['coin_recommendations'][:5]
+            # Bottom 5 successful coins
+            worst_coins = analysis['coin_recommendations'][-5:]
+
+            pdf.cell(200, 8, txt="Top Performing Coins (Success Rate):", align="L", ln=1)
+            for (c, sr, count_) in best_coins:
+                pdf.cell(200, 8, txt=f"  {c}: {sr:.2f} (Total {count_} trades)", align="L", ln=1)
+            pdf.ln(3)
+
+            pdf.cell(200, 8, txt="Worst Performing Coins (Success Rate):", align="L", ln=1)
+            for (c, sr, count_) in worst_coins:
+                pdf.cell(200, 8, txt=f"  {c}: {sr:.2f} (Total {count_} trades)", align="L", ln=1)
+            pdf.ln(3)
+
+        # b) Preferred Position Type
+        pdf.cell(200, 8, txt="Which position type should be preferred?", align="L", ln=1)
+        pdf.ln(2)
+        pdf.cell(200, 8, txt=f"Long Success Rate: {analysis['long_ratio']:.2f}", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"Short Success Rate: {analysis['short_ratio']:.2f}", align="L", ln=1)
+        if long_interval and short_interval:
+            pdf.cell(200, 8, txt=f"Long Win Rate 95% Interval: {long_interval[0]:.2f} - {long_interval[1]:.2f}", align="L", ln=1)
+            pdf.cell(200, 8, txt=f"Short Win Rate 95% Interval: {short_interval[0]:.2f} - {short_interval[1]:.2f}", align="L", ln=1)
+            if long_interval[0] <= short_interval[1] and short_interval[0] <= long_interval[1]:
+                pdf.cell(200, 8, txt="Note: the intervals overlap, so the difference may be sampling noise.", align="L", ln=1)
+        if analysis['long_ratio'] > analysis['short_ratio']:
+            pdf.cell(200, 8, txt="Recommendation: Long positions seem more successful.", align="L", ln=1)
+        elif analysis['short_ratio'] > analysis['long_ratio']:
+            pdf.cell(200, 8, txt="Recommendation: Short positions seem more successful.", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="Recommendation: Long and Short positions are similar or data is insufficient.", align="L", ln=1)
+        pdf.ln(5)
+
+        # c) Leverage Recommendation
+        pdf.cell(200, 8, txt="Which leverage level should be preferred?", align="L", ln=1)
+        pdf.ln(2)
+        pdf.cell(200, 8, txt=f"Low Leverage (1-5x) Success Rate: {analysis['low_ratio']:.2f}", align="L", ln=1)
+        pdf.cell(200, 8, txt=f"High Leverage (5x+) Success Rate: {analysis['high_ratio']:.2f}", align="L", ln=1)
+        if analysis['low_ratio'] > analysis['high_ratio']:
+            pdf.cell(200, 8, txt="Recommendation: Low leverage seems more successful.", align="L", ln=1)
+        elif analysis['high_ratio'] > analysis['low_ratio']:
+            pdf.cell(200, 8, txt="Recommendation: High leverage seems more successful.", align="L", ln=1)
+        else:
+            pdf.cell(200, 8, txt="Recommendation: Leverage comparison is inconclusive or data is insufficient.", align="L", ln=1)
 
-    # c) Leverage Recommendation
-    pdf.cell(200, 8, txt="Which leverage level should be preferred?", align="L", ln=1)
-    pdf.ln(2)
-    pdf.cell(200, 8, txt=f"Low Leverage (1-5x) Success Rate: {low_ratio:.2f}", align="L", ln=1)
-    pdf.cell(200, 8, txt=f"High Leverage (5x+) Success Rate: {high_ratio:.2f}", align="L", ln=1)
-    if low_ratio > high_ratio:
-        pdf.cell(200, 8, txt="Recommendation: Low leverage seems more successful.", align="L", ln=1)
-    elif high_ratio > low_ratio:
-        pdf.cell(200, 8, txt="Recommendation: High leverage seems more successful.", align="L", ln=1)
-    else:
-        pdf.cell(200, 8, txt="Recommendation: Leverage comparison is inconclusive or data is insufficient.", align="L", ln=1)
+    # Charts on their own page, drawn with vector shapes
+    with profiler.span("report.charts"):
+        add_chart_page(pdf, equity_curve(state), overall_pnls, coins, trade_count=state.pnl_count,
+                       archived=hot_trades < all_time_stats['total_trades'])
+
+    # Weekday and hour heatmaps, for the trades entered with a time (kept in the saved state)
+    with profiler.span("report.time_of_day"):
+        time_grid = state.time_grid
+        if any(count for row in time_grid for count, _, _ in row):
+            add_time_of_day_page(pdf, time_grid, WEEKDAYS)
 
     # Save the PDF
-    pdf.output(pdf_path)
+    with profiler.span("report.pdf_output"):
+        pdf.output(pdf_path)
     print(f"Report generated: {pdf_path}")
 
 # Example usage (outside GUI):
 if __name__ == "__main__":
-    connection = sqlite3.connect("trade_data.db")
+    connection = profiler.connect("trade_data.db")
     generate_full_report_with_recommendations(connection)
     connection.close()
@@ -0,0 +1,334 @@
+import json
+import random
+
+import profiler
+from archive_trades import load_archived_stats, load_archived_time_grid
+from dimensions import load_dimension_names
+from setup_database import create_report_state_table
+from time_of_day import WEEKDAYS, bucket_of
+from trade_stats import TradeStats, get_pnl
+
+# Read from the trades table directly; the ids are mapped to names with load_dimension_names()
+# Saved states of another version are discarded and recomputed
+STATE_VERSION = 4
+
+TRADE_COLUMNS = "id, coin_id, position_id, leverage, entry_price, exit_price, mode_id, date, entry_time"
+
+# PnLs read from report_pnls for the Monte Carlo section and the histogram; fixed,
+# whatever the history
+SAMPLE_SIZE = 5000
+# Most buckets of the equity envelope; when full, neighbouring buckets are merged
+CURVE_BUCKETS = 600
+
+
+class ReportState:
+    """
+    The aggregates the report is built from, together with the watermark up to which
+    trades have been folded in.
+
+    Trades with an id up to last_trade_id are included, except the positions that
+    were still open at the time (open_ids); those are picked up once they are closed.
+
+    The leveraged PnL of every trade is kept in the report_pnls table, in the order
+    the trades were folded in, with its running equity. Only the PnLs of newly folded
+    trades (new_pnls) are appended to it, and the report reads a bounded sample of it
+    (see sample_pnls()), so neither grows with the history.
+
+    For the equity curve the running equity is kept as an envelope: the trades are
+    split into at most CURVE_BUCKETS buckets of curve_width consecutive trades, each
+    holding its lowest and highest equity with their positions. When the buckets run
+    out, neighbouring ones are merged and the width doubles, so the peaks and troughs
+    of the whole history survive in a bounded state (see equity_curve()).
+    """
+    def __init__(self):
+        self.stats = TradeStats()
+        self.daily = TradeStats()
+        self.daily_date = None
+        self.last_trade_id = 0
+        self.open_ids = []
+        self.hot_trades = 0  # closed trades folded in from the main database
+        self.pnl_count = 0
+        self.side_counts = [0, 0]  # short, long
+        self.equity = 0.0
+        self.curve = []  # [low, low_seq, high, high_seq] per bucket
+        self.curve_width = 1
+        # grid[weekday][hour] -> [trade_count, wins, pnl_sum], see time_of_day.py
+        self.time_grid = [[[0, 0, 0.0] for _ in range(24)] for _ in WEEKDAYS]
+        self.new_pnls = []  # report_pnls rows not saved yet
+        self.incremental = False
+
+    def add_rows(self, rows, today_str):
+        """
+        Folds closed trade rows (in TRADE_COLUMNS order, with names instead of ids)
+        into the aggregates.
+        """
+        for (trade_id, coin, position, lev, entry, exit_, mode_, dte, entry_time) in rows:
+            self.stats.add_trade(trade_id, coin, position, lev, entry, exit_, mode_)
+            if dte == today_str:
+                self.daily.add_trade(trade_id, coin, position, lev, entry, exit_, mode_)
+            pnl = get_pnl(position, lev, entry, exit_)
+            if pnl is None:
+                continue
+            is_long = position.lower() == "long"
+            self.pnl_count += 1
+            self.side_counts[is_long] += 1
+            self.equity += pnl
+            self.new_pnls.append((self.pnl_count, pnl, is_long, self.side_counts[is_long], self.equity))
+            self._add_equity(self.pnl_count, self.equity)
+            if entry_time is not None:
+                weekday, hour = bucket_of(entry_time)
+                bucket = self.time_grid[weekday][hour]
+                bucket[0] += 1
+                bucket[1] += pnl > 0
+                bucket[2] += pnl
+        self.hot_trades += len(rows)
+        profiler.count("rows_scanned", len(rows))
+
+    def _add_equity(self, seq, equity):
+        if (seq - 1) % self.curve_width == 0:
+            self.curve.append([equity, seq, equity, seq])
+            if len(self.curve) > CURVE_BUCKETS:
+                self.curve = [_merge_buckets(self.curve[i:i + 2]) for i in range(0, len(self.curve), 2)]
+                self.curve_width *= 2
+            return
+        bucket = self.curve[-1]
+        if equity < bucket[0]:
+            bucket[0], bucket[1] = equity, seq
+        if equity > bucket[2]:
+            bucket[2], bucket[3] = equity, seq
+
+    def dump(self):
+        """
+        Returns the state as JSON text.
+        """
+        data = {
+            "version": STATE_VERSION,
+            "stats": self.stats.to_dict(),
+            "daily": self.daily.to_dict(),
+            "daily_date": self.daily_date,
+            "open_ids": self.open_ids,
+            "hot_trades": self.hot_trades,
+            "pnl_count": self.pnl_count,
+            "side_counts": self.side_counts,
+            "equity": self.equity,
+            "curve": self.curve,
+            "curve_width": self.curve_width,
+            "time_grid": self.time_grid,
+        }
+        return json.dumps(data)
+
+    @classmethod
+    def load(cls, last_trade_id, text):
+        """
+        Restores a state saved with dump().
+
+        Returns:
+        ReportState: The state, or None if it was saved by another version.
+        """
+        data = json.loads(text)
+        if data.get("version") != STATE_VERSION:
+            return None
+        state = cls()
+        state.stats = TradeStats.from_dict(data["stats"])
+        state.daily = TradeStats.from_dict(data["daily"])
+        state.daily_date = data["daily_date"]
+        state.open_ids = data["open_ids"]
+        state.hot_trades = data["hot_trades"]
+        state.pnl_count = data["pnl_count"]
+        state.side_counts = data["side_counts"]
+        state.equity = data["equity"]
+        state.curve = data["curve"]
+        state.curve_width = data["curve_width"]
+        state.time_grid = data["time_grid"]
+        state.last_trade_id = last_trade_id
+        return state
+
+
+def _merge_buckets(buckets):
+    """
+    Merges neighbouring equity buckets into one; on ties the earlier point is kept.
+    """
+    low = min(buckets, key=lambda bucket: bucket[0])
+    high = max(buckets, key=lambda bucket: bucket[2])
+    return [low[0], low[1], high[2], high[3]]
+
+
+def sample_pnls(conn, state, long=None, size=SAMPLE_SIZE, seed=0):
+    """
+    Reads the saved PnLs of all trades, or of one position side: all of them if there
+    are at most `size`, otherwise `size` PnLs drawn at random (with replacement) by
+    their position in report_pnls, so the cost does not depend on the history.
+    (CROSS JOIN keeps the drawn positions as the outer loop, so each one is a single
+    index lookup.)
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    state (ReportState): The saved state (for the number of PnLs).
+    long (bool): True for long trades, False for short trades, None for all.
+    size (int): Maximum number of PnLs to read.
+    seed (int): Seed of the draw, so the same state gives the same report.
+
+    Returns:
+    list of float: The PnLs, in trade order if all are returned.
+    """
+    cursor = conn.cursor()
+    if long is None:
+        count, column, condition, parameters = state.pnl_count, "seq", "", ()
+    else:
+        count, column, condition, parameters = state.side_counts[long], "side_seq", "AND r.is_long = ?", (int(long),)
+    with profiler.span("report.sample_pnls"):
+        if count <= size:
+            cursor.execute(f"""
+                SELECT r.pnl FROM report_pnls r WHERE r.{column} <= ? {condition} ORDER BY r.seq
+            """, (count, *parameters))
+        else:
+            rng = random.Random(f"{seed}:{long}:{count}")
+            positions = [rng.randint(1, count) for _ in range(size)]
+            cursor.execute(f"""
+                SELECT r.pnl FROM json_each(?) j
+                CROSS JOIN report_pnls r ON r.{column} = j.value {condition}
+            """, (json.dumps(positions), *parameters))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def equity_curve(state):
+    """
+    Returns the equity curve from the saved envelope: every trade while there are few,
+    otherwise the lowest and highest equity of each bucket in the order they were
+    reached, plus the last value. The drawdowns therefore stay visible at any history
+    length, and the chart's downsampling (charts.lttb()) only has to pick among them.
+
+    Parameters:
+    state (ReportState): The saved state.
+
+    Returns:
+    list of float: Cumulative PnL values in trade order.
+    """
+    points = {}
+    for low, low_seq, high, high_seq in state.curve:
+        points[low_seq] = low
+        points[high_seq] = high
+    if state.pnl_count:
+        points[state.pnl_count] = state.equity
+    return [points[seq] for seq in sorted(points)]
+
+
+def _named(rows, names):
+    coins, positions, modes = names
+    return [
+        (trade_id, coins[coin_id], positions[position_id], lev, entry, exit_, modes[mode_id], dte, entry_time)
+        for (trade_id, coin_id, position_id, lev, entry, exit_, mode_id, dte, entry_time) in rows
+    ]
+
+
+def _scan(cursor, state, sql, parameters, today_str, names):
+    cursor.execute(sql, parameters)
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        state.add_rows(_named(rows, names), today_str)
+
+
+def update_report_state(conn, today_str, full=False):
+    """
+    Brings the saved report aggregates up to date and saves them again.
+
+    Only trades added (or positions closed) since the last run are read. Everything
+    is recomputed from the archive summaries and the trades table when there is no
+    saved state (of this version) yet, when `full` is set, or when the triggers created by
+    create_report_state_table() recorded an update or delete of a trade that was
+    already folded in.
+
+    The highest trade id about to be processed is stored as guard_id before reading,
+    so changes made while the report runs also mark the new state stale.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    today_str (str): Today's date ('YYYY-MM-DD') for the daily figures.
+    full (bool): Force a full recompute.
+
+    Returns:
+    ReportState: The up-to-date aggregates.
+    """
+    create_report_state_table(conn)
+    conn.commit()
+    cursor = conn.cursor()
+
+    # Read the saved state and move the guard in one write transaction, so no
+    # change can slip in between
+    with profiler.span("report.load_state"):
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT last_trade_id, stale, state FROM report_state WHERE id = 1")
+        saved = cursor.fetchone()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM trades")
+        max_id = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO report_state (id, last_trade_id, guard_id, stale, state)
+            VALUES (1, 0, ?, 0, '')
+            ON CONFLICT (id) DO UPDATE SET guard_id = excluded.guard_id, stale = 0
+        """, (max_id,))
+        conn.commit()
+
+    names = load_dimension_names(cursor)
+    state = None
+    if not (full or saved is None or saved[1] or not saved[2]):
+        state = ReportState.load(saved[0], saved[2])
+
+    if state is None:
+        with profiler.span("report.full_scan"):
+            state = ReportState()
+            load_archived_stats(conn, state.stats)
+            load_archived_time_grid(conn, state.time_grid)
+            _scan(cursor, state, f"""
+                SELECT {TRADE_COLUMNS} FROM trades
+                WHERE exit_price IS NOT NULL AND id <= ?
+                ORDER BY id
+            """, (max_id,), today_str, names)
+            cursor.execute("SELECT id FROM trades WHERE exit_price IS NULL AND id <= ? ORDER BY id", (max_id,))
+            state.open_ids = [row[0] for row in cursor.fetchall()]
+    else:
+        with profiler.span("report.incremental_scan"):
+            state.incremental = True
+            previous_open = json.dumps(state.open_ids)
+
+            # The daily figures restart on a new day from the trades already folded in
+            if state.daily_date != today_str:
+                state.daily = TradeStats()
+                cursor.execute(f"""
+                    SELECT {TRADE_COLUMNS} FROM trades
+                    WHERE date = ? AND id <= ? AND exit_price IS NOT NULL
+                      AND id NOT IN (SELECT value FROM json_each(?))
+                    ORDER BY id
+                """, (today_str, state.last_trade_id, previous_open))
+                for (trade_id, coin, position, lev, entry, exit_, mode_, dte, _) in _named(cursor.fetchall(), names):
+                    state.daily.add_trade(trade_id, coin, position, lev, entry, exit_, mode_)
+
+            # New trades, plus earlier open positions that have been closed since
+            _scan(cursor, state, f"""
+                SELECT {TRADE_COLUMNS} FROM trades
+                WHERE exit_price IS NOT NULL
+                  AND (id > ? AND id <= ? OR id IN (SELECT value FROM json_each(?)))
+                ORDER BY id
+            """, (state.last_trade_id, max_id, previous_open), today_str, names)
+            cursor.execute("""
+                SELECT id FROM trades
+                WHERE exit_price IS NULL
+                  AND (id > ? AND id <= ? OR id IN (SELECT value FROM json_each(?)))
+                ORDER BY id
+            """, (state.last_trade_id, max_id, previous_open))
+            state.open_ids = [row[0] for row in cursor.fetchall()]
+
+    state.last_trade_id = max_id
+    state.daily_date = today_str
+    with profiler.span("report.save_state"):
+        # The PnL series is only appended to, unless everything was recomputed
+        if not state.incremental:
+            cursor.execute("DELETE FROM report_pnls")
+        cursor.executemany("""
+            INSERT OR REPLACE INTO report_pnls (seq, pnl, is_long, side_seq, equity) VALUES (?, ?, ?, ?, ?)
+        """, state.new_pnls)
+        cursor.execute("UPDATE report_state SET last_trade_id = ?, state = ? WHERE id = 1", (max_id, state.dump()))
+        conn.commit()
+        state.new_pnls = []
+    return state
@@ -1,31 +1,402 @@
 import sqlite3
 
-def setup_database():
+import profiler
+from dimensions import MODES, POSITIONS
+
+def create_dimension_tables(conn):
+    """
+    Creates the coins, positions and modes tables that trades refer to, if they do
+    not exist, and fills in the fixed position and mode names.
+
+    Tables:
+        coins (id, name)
+        positions (id, name)
+        modes (id, name)
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    cursor = conn.cursor()
+    for table in ("coins", "positions", "modes"):
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+    cursor.executemany("INSERT OR IGNORE INTO positions (name) VALUES (?)", [(name,) for name in POSITIONS])
+    cursor.executemany("INSERT OR IGNORE INTO modes (name) VALUES (?)", [(name,) for name in MODES])
+
+def create_trades_table(conn, name="trades"):
+    """
+    Creates the trades table, if it does not exist. Coin, position and mode are
+    stored as ids into the dimension tables (see create_dimension_tables()).
+    entry_time and exit_time are optional local times as epoch milliseconds; the
+    date column holds the day of entry_time when it is set.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    name (str): Table name; used for the temporary table of a migration.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coin_id INTEGER NOT NULL REFERENCES coins (id),
+            position_id INTEGER NOT NULL REFERENCES positions (id),
+            mode_id INTEGER NOT NULL REFERENCES modes (id),
+            date TEXT NOT NULL,
+            leverage REAL NOT NULL,
+            entry_price REAL NOT NULL,
+            exit_price REAL,
+            size REAL NOT NULL DEFAULT 1,
+            entry_time INTEGER,
+            exit_time INTEGER
+        )
+    ''')
+
+def create_trade_views(conn):
+    """
+    Creates the trade_details view, which shows trades with their coin, position and
+    mode names. Tools that read trades use this view; the report maps the ids
+    itself (see dimensions.load_dimension_names()).
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS trade_details AS
+        SELECT t.id, c.name AS coin_name, p.name AS position, m.name AS mode, t.date,
+               t.leverage, t.entry_price, t.exit_price, t.size, t.coin_id, t.entry_time, t.exit_time
+        FROM trades t
+        JOIN coins c ON c.id = t.coin_id
+        JOIN positions p ON p.id = t.position_id
+        JOIN modes m ON m.id = t.mode_id
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_coin ON trades (coin_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_entry_time ON trades (entry_time)")
+
+def migrate_trades_table(conn):
+    """
+    Upgrades a 'trades' table created by older versions to the current layout and
+    makes sure the dimension tables and the trade_details view exist.
+
+    Older tables stored coin, position and mode as free text on every row (and even
+    older ones had a NOT NULL exit_price and no size column). Tables without the
+    entry_time and exit_time columns get them added, empty for the existing trades. The names are
+    canonicalized the same way canonical_coin(), canonical_position() and
+    canonical_mode() do, so "btc" and "BTC" become one coin. SQLite cannot change
+    column types in place, so the table is rebuilt and the existing rows (and their
+    ids) are copied over. Archive summaries are merged under the canonical names,
+    the saved report figures are dropped so the next report recomputes them, and the
+    triggers that keep the report figures and the snapshot revision up to date are
+    recreated in the same transaction.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(trades)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if not columns:
+        return
+    create_dimension_tables(conn)
+    if "coin_id" not in columns:
+        # The whole rebuild is one transaction: after a crash the old table is still
+        # there and the migration simply runs again
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        try:
+            _rebuild_trades_table(conn, columns)
+            # Dropping the old table dropped its triggers too; recreate them before the
+            # rebuild is committed, so no update or delete can slip past the caches
+            create_report_state_table(conn)
+            create_trade_revision_table(conn)
+            create_trade_views(conn)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    elif "entry_time" not in columns:
+        cursor.execute("ALTER TABLE trades ADD COLUMN entry_time INTEGER")
+        cursor.execute("ALTER TABLE trades ADD COLUMN exit_time INTEGER")
+        # The view lists its columns, so it is recreated with the new ones
+        cursor.execute("DROP VIEW IF EXISTS trade_details")
+    create_trade_views(conn)
+    conn.commit()
+
+def _rebuild_trades_table(conn, columns):
+    cursor = conn.cursor()
+    position_expr = "CASE WHEN LOWER(TRIM({0})) = 'long' THEN 'long' ELSE 'short' END"
+    mode_expr = "CASE WHEN LOWER(TRIM({0})) = 'real' THEN 'real' ELSE 'demo' END"
+
+    # Ids of archived trades must not be handed out again
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'trades'")
+    row = cursor.fetchone()
+    sequence = row[0] if row else 0
+
+    cursor.execute("INSERT OR IGNORE INTO coins (name) SELECT DISTINCT UPPER(TRIM(coin_name)) FROM trades")
+    # A copy left behind by an interrupted run of an older version is started over
+    cursor.execute("DROP TABLE IF EXISTS trades_migrated")
+    create_trades_table(conn, "trades_migrated")
+    size_expr = "t.size" if "size" in columns else "1"
+    cursor.execute(f"""
+        INSERT INTO trades_migrated (id, coin_id, position_id, mode_id, date, leverage, entry_price, exit_price, size)
+        SELECT t.id, c.id, p.id, m.id, t.date, t.leverage, t.entry_price, t.exit_price, {size_expr}
+        FROM trades t
+        JOIN coins c ON c.name = UPPER(TRIM(t.coin_name))
+        JOIN positions p ON p.name = {position_expr.format("t.position")}
+        JOIN modes m ON m.name = {mode_expr.format("t.mode")}
+    """)
+    cursor.execute("DROP VIEW IF EXISTS trade_details")
+    cursor.execute("DROP TABLE trades")
+    cursor.execute("ALTER TABLE trades_migrated RENAME TO trades")
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'trades'", (sequence,))
+    if cursor.rowcount == 0 and sequence:
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('trades', ?)", (sequence,))
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    if "trade_summaries" in tables:
+        cursor.execute(f"""
+            CREATE TEMP TABLE canonical_summaries AS
+            SELECT period, UPPER(TRIM(coin_name)) AS coin_name, {position_expr.format("position")} AS position,
+                   {mode_expr.format("mode")} AS mode, leverage, MIN(first_id) AS first_id,
+                   SUM(trade_count) AS trade_count, SUM(pnl_count) AS pnl_count, SUM(wins) AS wins,
+                   SUM(losses) AS losses, SUM(pnl_sum) AS pnl_sum, SUM(spot_pnl_sum) AS spot_pnl_sum,
+                   MAX(pnl_max) AS pnl_max, MIN(pnl_min) AS pnl_min
+            FROM trade_summaries
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+        cursor.execute("DELETE FROM trade_summaries")
+        cursor.execute("INSERT INTO trade_summaries SELECT * FROM canonical_summaries")
+        cursor.execute("DROP TABLE canonical_summaries")
+        cursor.execute("UPDATE archived_extremes SET coin_name = UPPER(TRIM(coin_name))")
+    if "report_state" in tables:
+        cursor.execute("DELETE FROM report_state")
+    print("Trades table migrated to coin, position and mode ids.")
+
+def create_archive_tables(conn):
+    """
+    Creates the tables that hold summaries of trades moved to the archive
+    (see archive_trades.py), if they do not exist.
+
+    Tables:
+        trade_summaries (period, coin_name, position, mode, leverage, first_id, trade_count, pnl_count,
+                         wins, losses, pnl_sum, spot_pnl_sum, pnl_max, pnl_min)
+        archived_extremes (trade_id, period, side, coin_name, pnl, entry_price, exit_price)
+        archived_sketches (period, sketch_key, sketch)
+        archived_time_buckets (period, weekday, hour, trade_count, wins, pnl_sum)
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trade_summaries (
+            period TEXT NOT NULL,
+            coin_name TEXT NOT NULL,
+            position TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            leverage REAL NOT NULL,
+            first_id INTEGER NOT NULL,
+            trade_count INTEGER NOT NULL,
+            pnl_count INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            losses INTEGER NOT NULL,
+            pnl_sum REAL NOT NULL,
+            spot_pnl_sum REAL NOT NULL,
+            pnl_max REAL NOT NULL,
+            pnl_min REAL NOT NULL,
+            PRIMARY KEY (period, coin_name, position, mode, leverage)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_extremes (
+            trade_id INTEGER PRIMARY KEY,
+            period TEXT NOT NULL,
+            side TEXT NOT NULL,
+            coin_name TEXT NOT NULL,
+            pnl REAL NOT NULL,
+            entry_price REAL NOT NULL,
+            exit_price REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_sketches (
+            period TEXT NOT NULL,
+            sketch_key TEXT NOT NULL,
+            sketch TEXT NOT NULL,
+            PRIMARY KEY (period, sketch_key)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_time_buckets (
+            period TEXT NOT NULL,
+            weekday INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            trade_count INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            pnl_sum REAL NOT NULL,
+            PRIMARY KEY (period, weekday, hour)
+        )
+    ''')
+
+def create_report_state_table(conn):
+    """
+    Creates the tables holding the saved report aggregates and PnL series (see
+    report_state.py) and the triggers that mark them stale, if they do not exist.
+
+    The triggers fire when a closed trade that has already been folded into the saved
+    aggregates (id <= guard_id) is updated or deleted. Adding trades and closing open
+    positions do not invalidate the aggregates.
+
+    Tables:
+        report_state (id, last_trade_id, guard_id, stale, state)
+        report_pnls (seq, pnl, is_long, side_seq, equity): one row per folded trade, in
+            folding order; side_seq counts the trades of the same side, equity is the
+            running sum of the PnLs
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    cursor = conn.cursor()
+    # Earlier versions kept the whole PnL series in the state row; it is only a cache
+    cursor.execute("PRAGMA table_info(report_state)")
+    if "pnls" in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("DROP TABLE report_state")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_trade_id INTEGER NOT NULL,
+            guard_id INTEGER NOT NULL,
+            stale INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_pnls (
+            seq INTEGER PRIMARY KEY,
+            pnl REAL NOT NULL,
+            is_long INTEGER NOT NULL,
+            side_seq INTEGER NOT NULL,
+            equity REAL NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_report_pnls_side ON report_pnls (is_long, side_seq)")
+    for event in ("UPDATE", "DELETE"):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS report_state_trades_{event.lower()}
+            AFTER {event} ON trades
+            WHEN OLD.exit_price IS NOT NULL AND OLD.id <= (SELECT guard_id FROM report_state WHERE id = 1)
+            BEGIN
+                UPDATE report_state SET stale = 1 WHERE id = 1;
+            END
+        ''')
+    # The daily section of the report looks up the trades of a single day
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_date ON trades (date)")
+
+def create_trade_revision_table(conn):
+    """
+    Creates a counter that is increased whenever a closed trade is updated or any
+    trade is deleted, if it does not exist. Caches of the trades table (see
+    columnar_snapshot.py) compare it to know whether they can simply append new rows.
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trade_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO trade_revision (id, revision) VALUES (1, 0)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trade_revision_update
+        AFTER UPDATE ON trades
+        WHEN OLD.exit_price IS NOT NULL
+        BEGIN
+            UPDATE trade_revision SET revision = revision + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trade_revision_delete
+        AFTER DELETE ON trades
+        BEGIN
+            UPDATE trade_revision SET revision = revision + 1 WHERE id = 1;
+        END
+    ''')
+
+def create_daily_stats_table(conn):
+    """
+    Creates the daily_stats table, which holds the daily report figures of past days
+    (see daily_backfill.py), if it does not exist.
+
+    Tables:
+        daily_stats (date, total_trades, top_coin, top_coin_count, top_position, top_leverage,
+                     best_coin, best_coin_avg_pnl, worst_coin, worst_coin_avg_pnl, max_pnl, min_pnl,
+                     net_pnl, computed_at)
+
+    Parameters:
+    conn (sqlite3.Connection): The SQLite database connection.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT PRIMARY KEY,
+            total_trades INTEGER NOT NULL,
+            top_coin TEXT NOT NULL,
+            top_coin_count INTEGER NOT NULL,
+            top_position TEXT NOT NULL,
+            top_leverage REAL NOT NULL,
+            best_coin TEXT NOT NULL,
+            best_coin_avg_pnl REAL NOT NULL,
+            worst_coin TEXT NOT NULL,
+            worst_coin_avg_pnl REAL NOT NULL,
+            max_pnl REAL NOT NULL,
+            min_pnl REAL NOT NULL,
+            net_pnl REAL NOT NULL,
+            computed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def setup_database(database="trade_data.db"):
     """
     Sets up the SQLite database by creating the necessary tables if they do not exist.
+
+    Parameters:
+    database (str): Path to the SQLite database file.
     
     Tables:
-        trades (id, coin_name, position, mode, date, leverage, entry_price, exit_price)
+        coins (id, name), positions (id, name), modes (id, name)
+        trades (id, coin_id, position_id, mode_id, date, leverage, entry_price, exit_price, size,
+                entry_time, exit_time)
         notes (id, title, content, date)
+
+    A trade whose exit_price is NULL is an open position.
     """
     # Connect to the SQLite database (or create it if it doesn't exist)
-    conn = sqlite3.connect("trade_data.db")  # Database name
+    conn = profiler.connect(database)
     cursor = conn.cursor()
 
     try:
-        # Create 'trades' table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                coin_name TEXT NOT NULL,
-                position TEXT NOT NULL,
-                mode TEXT NOT NULL,
-                date TEXT NOT NULL,
-                leverage REAL NOT NULL,
-                entry_price REAL NOT NULL,
-                exit_price REAL NOT NULL
-            )
-        ''')
+        # Create the coin/position/mode tables and the 'trades' table
+        create_dimension_tables(conn)
+        create_trades_table(conn)
+        migrate_trades_table(conn)
+
+        # Summaries of archived trades
+        create_archive_tables(conn)
+
+        # Saved report aggregates for incremental reports
+        create_report_state_table(conn)
+
+        # Change counter for the columnar snapshot
+        create_trade_revision_table(conn)
+
+        # Daily figures of past days
+        create_daily_stats_table(conn)
 
         # Create 'notes' table
         cursor.execute('''
@@ -46,4 +417,5 @@ def setup_database():
         conn.close()
 
 if __name__ == "__main__":
-    setup_database()
+    with profiler.span("setup_database"):
+        setup_database()
@@ -0,0 +1,322 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from dimensions import insert_trade, insert_trades
+from setup_database import setup_database
+
+COINS = ("BTC", "ETH", "SOL", "XRP", "ADA", "AVAX", "LINK", "SUI", "BNB", "NEAR")
+
+
+def percentile(sorted_values, q):
+    """
+    Returns the nearest-rank percentile of sorted values (0 if there are none).
+
+    Parameters:
+    sorted_values (list of float): Values in ascending order.
+    q (float): Percentile between 0 and 100.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def random_trade(rng, date_str):
+    """
+    Returns a random (coin, position, mode, date, leverage, entry, exit, size) row.
+    """
+    entry = round(rng.uniform(1, 1000), 2)
+    exit_ = round(entry * rng.uniform(0.9, 1.1), 2) if rng.random() < 0.9 else None
+    return (rng.choice(COINS), rng.choice(("long", "short")), rng.choice(("real", "demo")),
+            date_str, rng.randint(1, 20), entry, exit_, 1)
+
+
+class ActorStats:
+    """
+    What one simulated client measured: one latency per completed operation, the
+    time spent waiting for the write lock, and the busy errors that were retried or
+    gave up.
+    """
+    def __init__(self, kind):
+        self.kind = kind
+        self.latencies = []
+        self.lock_waits = []
+        self.retries = 0
+        self.failures = 0
+        self.errors = []
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "latencies": self.latencies,
+            "lock_waits": self.lock_waits,
+            "retries": self.retries,
+            "failures": self.failures,
+            "errors": self.errors[:5],
+        }
+
+
+def _run_with_retry(conn, stats, work, max_retries):
+    """
+    Runs work(cursor) in a write transaction, retrying while the database is busy.
+
+    The transaction is opened with BEGIN IMMEDIATE like the GUI's write queue, so
+    the time that statement takes is the time spent waiting for the write lock.
+    """
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for attempt in range(max_retries + 1):
+        try:
+            begin = time.perf_counter()
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+            finally:
+                stats.lock_waits.append(time.perf_counter() - begin)
+            work(cursor)
+            cursor.execute("COMMIT")
+            stats.latencies.append(time.perf_counter() - started)
+            return
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not _is_busy(e):
+                stats.failures += 1
+                stats.errors.append(str(e))
+                return
+            if attempt == max_retries:
+                stats.failures += 1
+                stats.errors.append(str(e))
+                return
+            stats.retries += 1
+            time.sleep(0.01 * (attempt + 1))
+
+
+def _actor(kind, index, config, start, results):
+    """
+    Runs one simulated client until the deadline and puts its ActorStats on `results`.
+    """
+    rng = random.Random(config["seed"] * 1000 + index)
+    stats = ActorStats(kind)
+    # Writers manage their transactions like the write queue; reports use a
+    # connection like the GUI's
+    if kind == "report":
+        conn = sqlite3.connect(config["database"], timeout=config["busy_timeout"])
+    else:
+        conn = sqlite3.connect(config["database"], timeout=config["busy_timeout"], isolation_level=None)
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    notes = 0
+    start.wait()
+    deadline = time.perf_counter() + config["duration"]
+    try:
+        while time.perf_counter() < deadline:
+            if kind == "trade":
+                time.sleep(rng.expovariate(1000 / config["think_ms"]))
+                trade = random_trade(rng, date_str)
+                _run_with_retry(conn, stats, lambda cursor: insert_trade(cursor, *trade), config["max_retries"])
+            elif kind == "note":
+                time.sleep(rng.expovariate(1000 / config["think_ms"]))
+                notes += 1
+                title = f"stress {index} {notes}"
+                _run_with_retry(conn, stats, lambda cursor: cursor.execute(
+                    "INSERT INTO notes (title, content) VALUES (?, ?)", (title, "x" * rng.randint(10, 500))
+                ), config["max_retries"])
+            elif kind == "import":
+                time.sleep(config["import_interval"])
+                rows = [random_trade(rng, date_str) for _ in range(config["import_rows"])]
+                _run_with_retry(conn, stats, lambda cursor: insert_trades(cursor, rows), config["max_retries"])
+            else:
+                _run_report(conn, stats, config)
+                time.sleep(config["report_interval"])
+    except Exception as e:
+        # Anything else ends this client, but the others keep running
+        stats.failures += 1
+        stats.errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        conn.close()
+        results.put(stats.to_dict())
+
+
+def _run_report(conn, stats, config):
+    """
+    Generates one full PDF report (into the working directory), retrying on busy errors.
+    """
+    from report_generator import generate_full_report_with_recommendations
+
+    started = time.perf_counter()
+    for attempt in range(config["max_retries"] + 1):
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_full_report_with_recommendations(conn)
+            stats.latencies.append(time.perf_counter() - started)
+            return
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not _is_busy(e) or attempt == config["max_retries"]:
+                stats.failures += 1
+                stats.errors.append(str(e))
+                return
+            stats.retries += 1
+            time.sleep(0.01 * (attempt + 1))
+
+
+def prepare_database(database, journal_mode, seed_trades, seed=0):
+    """
+    Creates a fresh journal database for a stress run.
+
+    Parameters:
+    database (str): Path of the database file; an existing file is replaced.
+    journal_mode (str): SQLite journal mode, e.g. 'delete' or 'wal'.
+    seed_trades (int): Number of random trades inserted up front, so reports have work to do.
+    seed (int): Random seed for the trades.
+    """
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_database(database)
+    conn = sqlite3.connect(database)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    rng = random.Random(seed)
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    if seed_trades:
+        insert_trades(conn.cursor(), [random_trade(rng, date_str) for _ in range(seed_trades)])
+    conn.commit()
+    conn.close()
+
+
+def summarize(actor_results, duration):
+    """
+    Combines the per-actor measurements into per-kind figures.
+
+    Parameters:
+    actor_results (list of dict): ActorStats.to_dict() of every actor.
+    duration (float): Length of the run in seconds.
+
+    Returns:
+    dict: kind -> figures (operations, throughput, latency and lock-wait percentiles
+    in milliseconds, retries, failures).
+    """
+    summary = {}
+    for kind in ("trade", "note", "import", "report"):
+        group = [r for r in actor_results if r["kind"] == kind]
+        if not group:
+            continue
+        latencies = sorted(v * 1000 for r in group for v in r["latencies"])
+        lock_waits = sorted(v * 1000 for r in group for v in r["lock_waits"])
+        summary[kind] = {
+            "actors": len(group),
+            "operations": len(latencies),
+            "per_second": len(latencies) / duration,
+            "latency_ms": {f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+            "max_latency_ms": latencies[-1] if latencies else 0.0,
+            "lock_wait_ms_total": sum(lock_waits),
+            "lock_wait_ms_p95": percentile(lock_waits, 95),
+            "retries": sum(r["retries"] for r in group),
+            "failures": sum(r["failures"] for r in group),
+            "errors": sorted({e for r in group for e in r["errors"]})[:5],
+        }
+    return summary
+
+
+def run_stress(config):
+    """
+    Runs every simulated client against one database at the same time.
+
+    Trade and note writers insert at the same SQL level as the GUI's save_trade and
+    save_note (one write transaction per entry), importers insert batches with
+    insert_trades(), and reporters generate the full PDF report in a loop. Each
+    client is its own process with its own connection, so they contend for the
+    database lock exactly like separate programs would.
+
+    Parameters:
+    config (dict): Run settings (see the command line options).
+
+    Returns:
+    dict: Output of summarize().
+    """
+    actors = (["trade"] * config["writers"] + ["note"] * config["note_writers"]
+              + ["import"] * config["importers"] + ["report"] * config["reporters"])
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_actor, args=(kind, i, config, start, results))
+        for i, kind in enumerate(actors)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    actor_results = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return summarize(actor_results, config["duration"])
+
+
+def format_summary(summary):
+    """
+    Formats the output of summarize() as a text table.
+    """
+    lines = [f"{'Client':<8} {'Ops':>6} {'Ops/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+             f"{'Lock ms':>9} {'Retries':>8} {'Failed':>7}"]
+    for kind, row in summary.items():
+        latency = row["latency_ms"]
+        lines.append(
+            f"{kind:<8} {row['operations']:>6} {row['per_second']:>7.1f} {latency['p50']:>8.1f} "
+            f"{latency['p95']:>8.1f} {latency['p99']:>8.1f} {row['max_latency_ms']:>8.1f} "
+            f"{row['lock_wait_ms_total']:>9.0f} {row['retries']:>8} {row['failures']:>7}"
+        )
+        for error in row["errors"]:
+            lines.append(f"    error: {error}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent trade entry, notes, imports and reports on one database.")
+    parser.add_argument("--writers", type=int, default=4, help="Simulated trade writers")
+    parser.add_argument("--note-writers", type=int, default=1, help="Simulated note writers")
+    parser.add_argument("--importers", type=int, default=1, help="Simulated bulk importers")
+    parser.add_argument("--reporters", type=int, default=1, help="Processes generating reports in a loop")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="Mean pause between a writer's entries")
+    parser.add_argument("--import-rows", type=int, default=500, help="Trades per bulk import")
+    parser.add_argument("--import-interval", type=float, default=2.0, help="Seconds between bulk imports")
+    parser.add_argument("--report-interval", type=float, default=0.0, help="Seconds between reports")
+    parser.add_argument("--seed-trades", type=int, default=20000, help="Trades in the database before the run")
+    parser.add_argument("--journal-mode", default="delete", choices=["delete", "truncate", "wal"])
+    parser.add_argument("--busy-timeout", type=float, default=5.0, help="Seconds SQLite waits for a lock before 'database is locked'")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries after a 'database is locked' error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="Folder for the database and reports (default: a new temporary folder)")
+    parser.add_argument("--json", default=None, help="Also write the settings and results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="trade_journal_stress_"))
+    os.makedirs(workdir, exist_ok=True)
+    settings = vars(args).copy()
+    settings["database"] = os.path.join(workdir, "stress.db")
+    json_path = os.path.abspath(args.json) if args.json else None
+    prepare_database(settings["database"], args.journal_mode, args.seed_trades, args.seed)
+    # Reports are written to reports/ in the working directory
+    os.chdir(workdir)
+
+    print(f"Running for {args.duration:g}s in {workdir} (journal mode {args.journal_mode}, "
+          f"busy timeout {args.busy_timeout:g}s)...")
+    stress_summary = run_stress(settings)
+    print(format_summary(stress_summary))
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"settings": settings, "results": stress_summary}, f, indent=2)
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+
+from backup import RESTORE_PREFIX, BackupScheduler, list_snapshots, restore_snapshot
+
+
+def test_restores_keep_the_snapshots_they_choose_from(tmp_path):
+    database = str(tmp_path / "trade_data.db")
+    backup_dir = str(tmp_path / "backups")
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE TABLE trades (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+
+    scheduler = BackupScheduler(database, backup_dir, keep=2)
+    snapshots = [scheduler.run_once(), scheduler.run_once()]
+    assert list_snapshots(backup_dir) == sorted(snapshots)
+
+    saved = [restore_snapshot(snapshots[0], database, backup_dir) for _ in range(3)]
+    assert all(os.path.basename(path).startswith(RESTORE_PREFIX) for path in saved)
+    assert list_snapshots(backup_dir, RESTORE_PREFIX) == sorted(saved)
+
+    # Neither the restores nor the next rotation push out the snapshots or the saved copies
+    assert list_snapshots(backup_dir) == sorted(snapshots)
+    scheduler.run_once()
+    assert len(list_snapshots(backup_dir)) == 2
+    assert list_snapshots(backup_dir, RESTORE_PREFIX) == sorted(saved)
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import pytest
+
+from batch_entry import (COIN, DATE, ENTRY_PRICE, ENTRY_TIME, EXIT_PRICE, EXIT_TIME, LEVERAGE, MODE,
+                         POSITION, SIZE, parse_clipboard, validate_row, validate_rows)
+from dimensions import insert_trade, insert_trades
+from setup_database import create_dimension_tables, create_trades_table
+from timestamps import to_epoch_ms
+import profiler
+
+DEFAULT_DATE = "2024-05-01"
+
+
+def ms(text):
+    return to_epoch_ms(datetime.strptime(text, "%Y-%m-%d %H:%M"))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("btc\tlong\treal\n eth \tshort\tdemo\n", [["btc", "long", "real"], ["eth", "short", "demo"]]),
+    # Tabs win over the other separators, which may then appear inside cells
+    ("btc\t1,5\tx;y", [["btc", "1,5", "x;y"]]),
+    ("btc;long;1,5\neth;short;2", [["btc", "long", "1,5"], ["eth", "short", "2"]]),
+    ("btc,long,real", [["btc", "long", "real"]]),
+    ("BTC,long\r\n\r\n  \r\nETH,short\r", [["BTC", "long"], ["ETH", "short"]]),
+    ("Coin\tPosition\nbtc\tlong", [["btc", "long"]]),
+    ("coin,position", []),
+    ("", []),
+])
+def test_parse_clipboard(text, expected):
+    assert parse_clipboard(text) == expected
+
+
+def test_header_is_only_skipped_on_the_first_row():
+    assert parse_clipboard("btc,long\ncoin,short") == [["btc", "long"], ["coin", "short"]]
+
+
+def test_valid_row_is_canonicalized_with_defaults():
+    trade, errors = validate_row(["btc ", "LONG", "Real", "", "", "", "10", "100", "", ""], DEFAULT_DATE)
+    assert errors == {}
+    assert trade == ("BTC", "long", "real", DEFAULT_DATE, 10.0, 100.0, None, 1.0, None, None)
+
+
+def test_missing_cells_count_as_empty():
+    trade, errors = validate_row(["eth", "short", "demo"], DEFAULT_DATE)
+    assert trade is None
+    assert set(errors) == {LEVERAGE, ENTRY_PRICE}
+
+
+def test_every_bad_cell_is_reported():
+    cells = ["", "up", "paper", "2024-13-01", "10:00", "x", "0", "-1", "abc", "0"]
+    trade, errors = validate_row(cells, DEFAULT_DATE)
+    assert trade is None
+    assert set(errors) == {COIN, POSITION, MODE, DATE, LEVERAGE, ENTRY_PRICE, EXIT_PRICE, SIZE}
+    # The times are only checked once the date they may depend on is valid
+    assert ENTRY_TIME not in errors and EXIT_TIME not in errors
+    assert errors[LEVERAGE] == "Leverage must be greater than 0."
+    assert errors[EXIT_PRICE] == "Exit price must be a number."
+
+
+def test_times_without_a_date_use_the_row_date():
+    cells = ["btc", "long", "real", "2024-03-02", "10:00", "11:30", "5", "100", "110", "2"]
+    trade, errors = validate_row(cells, DEFAULT_DATE)
+    assert errors == {}
+    assert trade[3] == "2024-03-02"
+    assert trade[8:] == (ms("2024-03-02 10:00"), ms("2024-03-02 11:30"))
+
+
+def test_times_without_a_date_use_the_default_date():
+    trade, errors = validate_row(["btc", "long", "real", "", "23:59", "", "5", "100", "", ""], DEFAULT_DATE)
+    assert errors == {}
+    assert trade[3] == DEFAULT_DATE
+    assert trade[8:] == (ms(DEFAULT_DATE + " 23:59"), None)
+
+
+def test_date_is_taken_from_the_entry_time():
+    cells = ["btc", "long", "real", "2024-03-02", "2024-03-05 09:00", "", "5", "100", "", ""]
+    trade, errors = validate_row(cells, DEFAULT_DATE)
+    assert errors == {}
+    assert trade[3] == "2024-03-05"
+
+
+def test_bad_time_is_reported_on_its_cell():
+    trade, errors = validate_row(["btc", "long", "real", "", "", "25:00", "5", "100", "", ""], DEFAULT_DATE)
+    assert trade is None
+    assert list(errors) == [EXIT_TIME]
+
+
+def test_validate_rows_skips_empty_rows_and_keeps_row_indexes():
+    rows = [
+        ["", "  ", ""],
+        [" btc", "long ", "real", "", "", "", "5", "100", "", ""],
+        ["eth", "sideways", "real", "", "", "", "5", "100", "", ""],
+        [],
+        ["sol", "short", "demo", "", "", "", "2", "10", "9", ""],
+    ]
+    trades, errors = validate_rows(rows, DEFAULT_DATE)
+    assert [index for index, _ in trades] == [1, 4]
+    assert trades[0][1][0] == "BTC"
+    assert list(errors) == [(2, POSITION)]
+
+
+@pytest.fixture
+def cursor():
+    conn = profiler.connect(":memory:")
+    create_dimension_tables(conn)
+    create_trades_table(conn)
+    yield conn.cursor()
+    conn.close()
+
+
+def test_insert_trades_returns_the_id_of_each_trade(cursor):
+    first = insert_trade(cursor, "btc", "long", "real", DEFAULT_DATE, 5, 100)
+    trades, _ = validate_rows([
+        ["eth", "short", "demo", "", "", "", "2", "10", "9", ""],
+        ["sol", "long", "real", "", "", "", "3", "20", "", ""],
+    ], DEFAULT_DATE)
+    ids = insert_trades(cursor, [trade for _, trade in trades])
+    assert len(ids) == 2 and first < ids[0] < ids[1]
+    names = dict(cursor.execute("SELECT t.id, c.name FROM trades t JOIN coins c ON c.id = t.coin_id"))
+    assert [names[trade_id] for trade_id in ids] == ["ETH", "SOL"]
+
+
+def test_insert_trades_ids_follow_the_sequence(cursor):
+    rows = [("btc", "long", "real", DEFAULT_DATE, 5, 100, None, 1)] * 3
+    assert insert_trades(cursor, rows) == [1, 2, 3]
+    # Ids of deleted trades are not handed out again
+    cursor.execute("DELETE FROM trades WHERE id >= 2")
+    assert insert_trades(cursor, rows) == [4, 5, 6]
+    assert insert_trades(cursor, rows[:1]) == [7]
+    assert insert_trades(cursor, []) == []
+    assert [row[0] for row in cursor.execute("SELECT id FROM trades ORDER BY id")] == [1, 4, 5, 6, 7]
@@ -0,0 +1,33 @@
+import random
+import statistics
+from array import array
+
+import pytest
+
+from coin_correlation import correlation_matrix
+
+
+def test_matrix_matches_pearson_correlation():
+    rng = random.Random(5)
+    base = [rng.gauss(0, 1) for _ in range(60)]
+    series = [
+        array("d", base),
+        array("d", (2 * v + rng.gauss(0, 0.5) for v in base)),
+        array("d", (-v for v in base)),
+        array("d", (rng.gauss(0, 1) for _ in base)),
+    ]
+    matrix = correlation_matrix(series)
+    for i, a in enumerate(series):
+        assert matrix[i][i] == 1.0
+        for j, b in enumerate(series):
+            if i != j:
+                assert matrix[i][j] == pytest.approx(statistics.correlation(a, b))
+                assert matrix[i][j] == matrix[j][i]
+    assert matrix[0][2] == pytest.approx(-1.0)
+
+
+def test_constant_and_short_series_have_no_correlation():
+    matrix = correlation_matrix([array("d", [1.0, 1.0, 1.0]), array("d", [1.0, 2.0, 4.0]), array("d", [3.0])])
+    assert matrix[0] == [None, None, None]
+    assert matrix[1] == [None, 1.0, None]
+    assert matrix[2] == [None, None, None]
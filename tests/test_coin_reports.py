@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import profiler
+from archive_trades import archive_trades
+from coin_reports import load_coin_stats, report_file_name
+from dimensions import insert_trades
+from setup_database import setup_database
+
+
+def test_report_file_names_do_not_collide():
+    coins = ["BTC", "BTC/USD", "BTC-USD", "BTC_USD", "BTC USD", "BTC:USD"]
+    names = [report_file_name(coin) for coin in coins]
+    assert len(set(names)) == len(coins)
+    assert report_file_name("BTC") == "BTC.pdf"
+    assert report_file_name("BTC/USD") == report_file_name("BTC/USD")
+    assert all("/" not in name and " " not in name for name in names)
+
+
+def test_archived_best_and_worst_trades_are_kept_per_coin(tmp_path):
+    database = str(tmp_path / "trade_data.db")
+    setup_database(database)
+    conn = profiler.connect(database)
+    old = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d")
+    # ETH's big moves take the month's overall top and bottom places, so BTC's
+    # modest trades are not among the month's overall extremes
+    trades = [("ETH", "long", "real", old, 10, 100.0, 100.0 + move, 1) for move in (30, 20, 10, -10, -20, -30)]
+    trades += [("BTC", "long", "real", old, 1, 100.0, 100.0 + move, 1) for move in (2, 1, -1)]
+    insert_trades(conn.cursor(), trades)
+    conn.commit()
+    expected = {coin: stats.top_and_worst("long") for coin, stats in load_coin_stats(conn).items()}
+
+    archive_trades(conn, datetime.now().strftime("%Y-%m-%d"), archive_dir=str(tmp_path / "archive"))
+    assert conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 0
+    per_coin = load_coin_stats(conn)
+    assert {coin: stats.top_and_worst("long") for coin, stats in per_coin.items()} == expected
+    assert [pnl for _, pnl, _, _ in expected["BTC"][0]] == [2.0, 1.0, -1.0]
+    conn.close()
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from leverage_whatif import LeverageScenario, TradeMoves, sweep
+
+
+def make_moves(count=300, seed=3):
+    rng = random.Random(seed)
+    moves = TradeMoves()
+    coin_ids = {}
+    for _ in range(count):
+        entry = rng.uniform(10, 100)
+        moves.append(rng.choice(["BTC", "eth", "Sol"]), rng.choice(["long", "short"]), rng.choice([1, 3, 10, 25]),
+                     entry, entry * rng.uniform(0.9, 1.1), coin_ids)
+    return moves
+
+
+def reference(moves, scenario):
+    """Evaluates one scenario on its own, trade by trade."""
+    equity, peak, drawdown, wins, liquidations, leverages = 0.0, 0.0, 0.0, 0, 0, []
+    for move, actual, coin in zip(moves.move, moves.leverage, moves.coin_index):
+        if scenario.kind == "fixed":
+            leverage = scenario.value
+        elif scenario.kind == "cap":
+            leverage = min(actual, scenario.value)
+        elif scenario.kind == "per_coin":
+            leverage = actual * scenario.coin_factors.get(moves.coins[coin], scenario.default_factor)
+        else:
+            leverage = actual
+        leverages.append(leverage)
+        pnl = max(move * leverage, -100.0)
+        liquidations += pnl == -100.0
+        wins += pnl > 0
+        equity += pnl
+        peak = max(peak, equity)
+        drawdown = max(drawdown, peak - equity)
+    return equity, wins / len(moves), drawdown, liquidations, sum(leverages) / len(leverages)
+
+
+SCENARIOS = [LeverageScenario.actual(), LeverageScenario.fixed(1), LeverageScenario.fixed(40),
+             LeverageScenario.cap(5), LeverageScenario.per_coin({"btc": 2, "eth": 0.5})]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_single_pass_matches_each_scenario_on_its_own(processes):
+    moves = make_moves()
+    results = sweep(moves, SCENARIOS, processes=processes)
+    assert [r["scenario"] for r in results] == [s.name for s in SCENARIOS]
+    for scenario, row in zip(SCENARIOS, results):
+        net_pnl, win_rate, drawdown, liquidations, avg_leverage = reference(moves, scenario)
+        assert row["net_pnl"] == pytest.approx(net_pnl)
+        assert row["win_rate"] == pytest.approx(win_rate)
+        assert row["max_drawdown"] == pytest.approx(drawdown)
+        assert row["liquidations"] == liquidations
+        assert row["avg_leverage"] == pytest.approx(avg_leverage)
+    assert results[2]["liquidations"] > 0
+
+
+def test_empty_history():
+    results = sweep(TradeMoves(), SCENARIOS)
+    assert all(r["trades"] == 0 and r["net_pnl"] == 0.0 and r["max_drawdown"] == 0.0 for r in results)
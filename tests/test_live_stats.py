@@ -0,0 +1,116 @@
+import pytest
+
+from dimensions import insert_trade
+from live_stats import LiveStats, load_seed
+from setup_database import create_dimension_tables, create_trades_table
+import profiler
+
+TODAY = "2024-05-02"
+YESTERDAY = "2024-05-01"
+
+# (coin, position, mode, date, leverage, entry_price, exit_price)
+SEED_TRADES = [
+    ("BTC", "long", "real", YESTERDAY, 5, 100.0, 110.0),
+    ("ETH", "short", "demo", YESTERDAY, 10, 100.0, 105.0),
+    ("BTC", "short", "real", TODAY, 2, 100.0, 90.0),
+    ("SOL", "long", "real", TODAY, 3, 0.0, 5.0),  # entry price 0: not counted
+    ("ETH", "long", "real", TODAY, 5, 100.0, None),  # open position: not counted
+]
+
+
+@pytest.fixture
+def conn():
+    conn = profiler.connect(":memory:")
+    create_dimension_tables(conn)
+    create_trades_table(conn)
+    yield conn
+    conn.close()
+
+
+def save(conn, live, trade):
+    """
+    Saves a trade the way the GUI does and returns its id; passes it to `live` if given.
+    """
+    trade_id = insert_trade(conn.cursor(), *trade)
+    conn.commit()
+    if live is not None:
+        live.add_trade(trade_id, trade[0], trade[1], trade[3], *trade[4:7])
+    return trade_id
+
+
+def fresh(conn, today):
+    live = LiveStats(today)
+    live.apply_seed(load_seed(conn, today))
+    return live
+
+
+def assert_same(live, expected):
+    assert (live.count, live.wins, live.today_count, live.today_wins) == \
+        (expected.count, expected.wins, expected.today_count, expected.today_wins)
+    assert live.net_pnl == pytest.approx(expected.net_pnl)
+    assert live.today_pnl == pytest.approx(expected.today_pnl)
+    assert live.best_coin_today() == expected.best_coin_today()
+    assert len(live.coin_rows()) == len(expected.coin_rows())
+    for row, expected_row in zip(live.coin_rows(), expected.coin_rows()):
+        assert row[:2] == expected_row[:2]
+        assert row[2:] == pytest.approx(expected_row[2:])
+
+
+def test_seed_matches_the_trades(conn):
+    for trade in SEED_TRADES:
+        save(conn, None, trade)
+    live = fresh(conn, TODAY)
+    assert (live.count, live.wins, live.today_count, live.today_wins) == (3, 2, 1, 1)
+    assert live.net_pnl == pytest.approx(50.0 - 50.0 + 20.0)
+    assert live.best_coin_today() == ("BTC", pytest.approx(20.0))
+    assert [row[0] for row in live.coin_rows()] == ["BTC", "ETH"]
+
+
+def test_trades_added_after_the_seed_match_a_new_seed(conn):
+    for trade in SEED_TRADES:
+        save(conn, None, trade)
+    live = fresh(conn, TODAY)
+    for trade in [
+        ("ADA", "long", "demo", TODAY, 20, 1.0, 1.1),
+        ("BTC", "short", "real", TODAY, 5, 100.0, 101.0),
+        ("SOL", "short", "real", YESTERDAY, 1, 0.0, 1.0),
+        ("ETH", "long", "real", TODAY, 3, 100.0, None),
+    ]:
+        save(conn, live, trade)
+    assert_same(live, fresh(conn, TODAY))
+
+
+def test_trades_saved_before_the_seed_arrives_are_counted_once(conn):
+    live = LiveStats(TODAY)
+    for trade in SEED_TRADES[:2]:
+        save(conn, None, trade)
+    # Saved while the seed is loading: the first is already in the seed, the second is not
+    save(conn, live, SEED_TRADES[2])
+    seed = load_seed(conn, TODAY)
+    save(conn, live, ("ADA", "long", "demo", TODAY, 20, 1.0, 1.1))
+    assert live.count == 0  # nothing is shown before the seed
+    live.apply_seed(seed)
+    assert_same(live, fresh(conn, TODAY))
+
+    # Trades saved afterwards are added right away
+    save(conn, live, ("BTC", "long", "real", TODAY, 2, 100.0, 120.0))
+    assert_same(live, fresh(conn, TODAY))
+
+
+def test_roll_day_restarts_the_daily_figures(conn):
+    for trade in SEED_TRADES:
+        save(conn, None, trade)
+    live = fresh(conn, TODAY)
+    live.roll_day(TODAY)  # same day: nothing changes
+    assert live.today_count == 1
+
+    tomorrow = "2024-05-03"
+    live.roll_day(tomorrow)
+    assert (live.today_count, live.today_wins, live.today_pnl) == (0, 0, 0.0)
+    assert live.best_coin_today() is None
+    assert_same(live, fresh(conn, tomorrow))
+
+    save(conn, live, ("ETH", "short", "real", tomorrow, 4, 50.0, 45.0))
+    save(conn, live, ("BTC", "long", "real", TODAY, 4, 50.0, 45.0))  # dated the day before
+    assert live.today_count == 1
+    assert_same(live, fresh(conn, tomorrow))
@@ -0,0 +1,30 @@
+import pytest
+
+from monte_carlo import bootstrap, win_rate_interval
+
+
+def test_win_rate_interval_narrows_with_more_trades():
+    small = win_rate_interval(6, 10)
+    large = win_rate_interval(600, 1000)
+    assert small[0] < 0.6 < small[1]
+    assert large[0] < 0.6 < large[1]
+    assert large[1] - large[0] < (small[1] - small[0]) / 5
+    # Known value of the Wilson interval for 60 of 100 at 95%
+    assert win_rate_interval(60, 100) == pytest.approx((0.5020, 0.6906), abs=1e-4)
+
+
+def test_win_rate_interval_edges():
+    assert win_rate_interval(0, 0) is None
+    low, high = win_rate_interval(0, 20)
+    assert low == 0.0 and 0 < high < 0.2
+    low, high = win_rate_interval(20, 20)
+    assert high == 1.0 and 0.8 < low < 1
+
+
+def test_bootstrap_is_reproducible_and_uses_the_horizon():
+    pnls = [5.0, -3.0, 2.0, -1.0, 8.0, -6.0]
+    first = bootstrap(pnls, simulations=500, horizon=50, seed=3)
+    assert first == bootstrap(pnls, simulations=500, horizon=50, seed=3)
+    assert first["horizon"] == 50
+    assert bootstrap(pnls, simulations=10)["horizon"] == len(pnls)
+    assert bootstrap([], simulations=10) is None
@@ -0,0 +1,115 @@
+import sqlite3
+
+import pytest
+
+import profiler
+import setup_database
+from dimensions import insert_trade
+from mark_to_market import MarkToMarketEngine, OpenPosition, close_position, write_binary_ticks
+from setup_database import migrate_trades_table, setup_database as create_database
+
+OLD_TRADES = [
+    ("btc", "Long", "real", "2024-01-01", 5, 100.0, 110.0),
+    ("BTC ", "short", "DEMO", "2024-01-02", 2, 50.0, 55.0),
+]
+
+
+@pytest.fixture
+def old_database(tmp_path):
+    """
+    A database with the trades table of the first version (names on every row).
+    """
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coin_name TEXT NOT NULL, position TEXT NOT NULL, mode TEXT NOT NULL, date TEXT NOT NULL,
+            leverage REAL NOT NULL, entry_price REAL NOT NULL, exit_price REAL NOT NULL
+        )
+    """)
+    conn.executemany("""
+        INSERT INTO trades (coin_name, position, mode, date, leverage, entry_price, exit_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, OLD_TRADES)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def migrated_rows(conn):
+    return conn.execute("""
+        SELECT id, coin_name, position, mode, exit_price FROM trade_details ORDER BY id
+    """).fetchall()
+
+
+def test_migration_runs_again_after_an_interrupted_run(old_database):
+    conn = profiler.connect(old_database)
+    # Left behind by a run that stopped after copying part of the rows
+    conn.execute("CREATE TABLE trades_migrated (id INTEGER PRIMARY KEY, coin_id INTEGER)")
+    conn.execute("INSERT INTO trades_migrated (id, coin_id) VALUES (1, 1)")
+    conn.commit()
+
+    migrate_trades_table(conn)
+    assert migrated_rows(conn) == [(1, "BTC", "long", "real", 110.0), (2, "BTC", "short", "demo", 55.0)]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "trades_migrated" not in tables
+    conn.close()
+
+
+def test_failed_migration_leaves_the_old_table(old_database, monkeypatch):
+    def fail(conn):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    conn = profiler.connect(old_database)
+    monkeypatch.setattr(setup_database, "create_trade_revision_table", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        migrate_trades_table(conn)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(trades)")]
+    assert "coin_name" in columns
+    assert conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == len(OLD_TRADES)
+
+    monkeypatch.undo()
+    migrate_trades_table(conn)
+    assert len(migrated_rows(conn)) == len(OLD_TRADES)
+    conn.close()
+
+
+def test_close_position(tmp_path):
+    database = str(tmp_path / "trade_data.db")
+    create_database(database)
+    conn = profiler.connect(database)
+    cursor = conn.cursor()
+    open_id = insert_trade(cursor, "btc", "long", "real", "2024-01-01", 5, 100.0)
+    closed_id = insert_trade(cursor, "eth", "short", "real", "2024-01-01", 2, 50.0, 45.0)
+    conn.commit()
+    assert [position.trade_id for position in MarkToMarketEngine.from_connection(conn).positions] == [open_id]
+
+    assert close_position(cursor, open_id, 120.0, 1704110400000) == open_id
+    conn.commit()
+    assert conn.execute("SELECT exit_price, exit_time FROM trades WHERE id = ?", (open_id,)).fetchone() == \
+        (120.0, 1704110400000)
+    assert MarkToMarketEngine.from_connection(conn).positions == []
+
+    # Closed or missing trades are reported, nothing is changed
+    for trade_id in (open_id, closed_id, closed_id + 1):
+        with pytest.raises(ValueError, match=f"No open position with id {trade_id}"):
+            close_position(cursor, trade_id, 1.0)
+    assert conn.execute("SELECT exit_price FROM trades ORDER BY id").fetchall() == [(120.0,), (45.0,)]
+    conn.close()
+
+
+def test_ticks_match_positions_in_any_spelling(tmp_path):
+    positions = [OpenPosition(1, "BTC", "long", 2.0, 5, 100.0), OpenPosition(2, "eth ", "short", 1.0, 2, 50.0)]
+    ticks = [(1, "btc", 110.0), (2, " Eth", 40.0), (3, "", 1.0), (4, "sol", 9.0)]
+
+    engine = MarkToMarketEngine(positions)
+    assert engine.replay(ticks) == len(ticks)
+    assert engine.total_unrealized_pnl == pytest.approx(30.0)
+
+    path = str(tmp_path / "ticks.bin")
+    write_binary_ticks(path, [tick for tick in ticks if tick[1]])
+    binary_engine = MarkToMarketEngine(positions)
+    binary_engine.replay_binary(path)
+    assert binary_engine.total_unrealized_pnl == pytest.approx(30.0)
+    assert [p.unrealized_pnl for p in binary_engine.mark_positions()] == pytest.approx([20.0, 10.0])
@@ -0,0 +1,58 @@
+import random
+
+from report_state import CURVE_BUCKETS, ReportState, equity_curve
+
+
+def fold(state, pnls, start=1):
+    rows = [(start + i, "BTC", "long", 1, 100.0, 100.0 + pnl, "real", "2024-01-01", None)
+            for i, pnl in enumerate(pnls)]
+    state.add_rows(rows, "2024-01-02")
+
+
+def max_drawdown(values):
+    peak, worst = float("-inf"), 0.0
+    for value in values:
+        peak = max(peak, value)
+        worst = max(worst, peak - value)
+    return worst
+
+
+def running(pnls):
+    equity, values = 0.0, []
+    for pnl in pnls:
+        equity += pnl
+        values.append(equity)
+    return values
+
+
+def test_short_history_keeps_every_point():
+    state = ReportState()
+    fold(state, [1.0, -2.0, 3.0])
+    assert equity_curve(state) == running([1.0, -2.0, 3.0])
+
+
+def test_long_history_keeps_extremes_and_drawdown():
+    rng = random.Random(7)
+    pnls = [rng.gauss(0.1, 2.0) for _ in range(50000)]
+    pnls[31337] = -400.0  # one deep drop inside a bucket
+
+    state = ReportState()
+    fold(state, pnls)
+    full = [row[4] for row in state.new_pnls]  # the running equity of every trade
+    curve = equity_curve(state)
+    assert len(curve) <= 2 * CURVE_BUCKETS + 1
+    assert curve[-1] == full[-1]
+    assert min(curve) == min(full) and max(curve) == max(full)
+    assert max_drawdown(curve) == max_drawdown(full)
+
+
+def test_envelope_does_not_depend_on_how_trades_arrive():
+    rng = random.Random(3)
+    pnls = [rng.uniform(-5, 5) for _ in range(5000)]
+    at_once = ReportState()
+    fold(at_once, pnls)
+    in_parts = ReportState()
+    for start in range(0, len(pnls), 777):
+        fold(in_parts, pnls[start:start + 777], start=start + 1)
+        in_parts = ReportState.load(start, in_parts.dump())
+    assert in_parts.curve == at_once.curve and in_parts.curve_width == at_once.curve_width
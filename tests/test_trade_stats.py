@@ -0,0 +1,260 @@
+"""
+Checks that the aggregated report figures (trade_stats.py, fed by report_state.py
+and archive_trades.py) equal those of the original full-scan report code, which is
+kept below as the reference.
+"""
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from archive_trades import archive_trades
+from dimensions import insert_trades
+from report_state import update_report_state
+from setup_database import setup_database
+import profiler
+from time_of_day import bucket_of
+from timestamps import to_epoch_ms
+from trade_stats import analyze, calculate_metrics, get_pnl
+
+TODAY = datetime.now().strftime("%Y-%m-%d")
+
+
+def _days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+# (coin, position, mode, date, leverage, entry_price, exit_price, size), in id order
+TRADES = [
+    # BTC and ETH both have 4 closed trades, and today's BTC and ETH trades have the
+    # same PnL: ties are decided by the coin seen first
+    ("BTC", "long", "real", _days_ago(40), 5, 100.0, 110.0, 1),
+    ("ETH", "long", "real", _days_ago(40), 10, 100.0, 105.0, 1),
+    ("BTC", "short", "demo", _days_ago(39), 10, 100.0, 100.0, 1),
+    ("ETH", "short", "real", _days_ago(38), 5, 100.0, 90.0, 1),
+    ("BTC", "long", "demo", _days_ago(38), 5, 200.0, 180.0, 1),
+    ("ETH", "long", "demo", _days_ago(37), 10, 100.0, 95.0, 1),
+    # Entry price 0: a 0% trade in the general metrics, skipped in the analysis
+    ("SOL", "long", "real", _days_ago(36), 20, 0.0, 10.0, 1),
+    ("SOL", "short", "demo", _days_ago(35), 3, 50.0, 40.0, 1),
+    ("XRP", "short", "real", _days_ago(20), 3, 0.0, 1.0, 1),
+    # Equal PnLs for the best and worst trade lists
+    ("ADA", "long", "real", _days_ago(10), 5, 1.0, 1.5, 1),
+    ("DOT", "long", "real", _days_ago(9), 5, 10.0, 15.0, 1),
+    ("ADA", "short", "demo", _days_ago(8), 20, 2.0, 2.2, 1),
+    ("DOT", "long", "real", _days_ago(5), 5, 100.0, 90.0, 1),
+    # Open position: not part of the report until it is closed
+    ("ETH", "long", "real", _days_ago(3), 5, 100.0, None, 1),
+    ("BTC", "short", "real", TODAY, 10, 100.0, 95.0, 1),
+    ("ETH", "long", "demo", TODAY, 10, 100.0, 105.0, 1),
+    ("SOL", "long", "real", TODAY, 5, 0.0, 3.0, 1),
+]
+
+
+def baseline_metrics(trades):
+    """
+    calculate_metrics() of the report before the aggregates, over
+    (coin, position, leverage, entry_price, exit_price, mode, date) rows.
+    """
+    if not trades:
+        return {
+            "total_trades": 0, "top_coin": "None", "top_coin_count": 0, "top_position": "None",
+            "top_leverage": 0, "best_coin": "None", "best_coin_avg_pnl": 0.0, "worst_coin": "None",
+            "worst_coin_avg_pnl": 0.0, "max_pnl": 0.0, "min_pnl": 0.0, "net_pnl": 0.0,
+        }
+    top_coin, top_coin_count = Counter([t[0] for t in trades]).most_common(1)[0]
+    top_position, _ = Counter([t[1].lower() for t in trades]).most_common(1)[0]
+    top_leverage, _ = Counter([t[2] for t in trades]).most_common(1)[0]
+
+    def get_pnl(position, leverage, entry_price, exit_price):
+        if entry_price == 0:
+            return 0
+        if position.lower() == "long":
+            return ((exit_price - entry_price) / entry_price) * 100 * leverage
+        return ((entry_price - exit_price) / entry_price) * 100 * leverage
+
+    coin_pnl_dict = {}
+    all_pnl_list = []
+    for (coin, pos, lev, entry, exit_, mode_, dte) in trades:
+        pnl = get_pnl(pos, lev, entry, exit_)
+        coin_pnl_dict.setdefault(coin, []).append(pnl)
+        all_pnl_list.append(pnl)
+
+    best_coin, best_coin_avg_pnl = "None", float("-inf")
+    worst_coin, worst_coin_avg_pnl = "None", float("inf")
+    for c, pnls in coin_pnl_dict.items():
+        avg_pnl = sum(pnls) / len(pnls)
+        if avg_pnl > best_coin_avg_pnl:
+            best_coin_avg_pnl, best_coin = avg_pnl, c
+        if avg_pnl < worst_coin_avg_pnl:
+            worst_coin_avg_pnl, worst_coin = avg_pnl, c
+
+    return {
+        "total_trades": len(trades), "top_coin": top_coin, "top_coin_count": top_coin_count,
+        "top_position": top_position, "top_leverage": top_leverage,
+        "best_coin": best_coin, "best_coin_avg_pnl": best_coin_avg_pnl,
+        "worst_coin": worst_coin, "worst_coin_avg_pnl": worst_coin_avg_pnl,
+        "max_pnl": max(all_pnl_list), "min_pnl": min(all_pnl_list), "net_pnl": sum(all_pnl_list),
+    }
+
+
+def baseline_analysis(trades):
+    """
+    The detailed analysis and recommendation figures of the report before the
+    aggregates, over the same rows as baseline_metrics().
+    """
+    def get_pnl(position, leverage, entry_price, exit_price):
+        if entry_price == 0:
+            return None
+        if position.lower() == "long":
+            return ((exit_price - entry_price) / entry_price) * 100 * leverage
+        return ((entry_price - exit_price) / entry_price) * 100 * leverage
+
+    result = {}
+    for prefix in ("real", "demo", "long", "short", "low", "high"):
+        result[f"{prefix}_count"] = result[f"{prefix}_win"] = result[f"{prefix}_loss"] = 0
+    long_trades, short_trades = [], []
+    spot_pnl_list, leverage_pnl_list = [], []
+    coin_success_dict = {}
+
+    for (coin, position, lev, entry, exit_, mode_, dte) in trades:
+        actual_pnl = get_pnl(position, lev, entry, exit_)
+        spot_pnl = get_pnl(position, 1, entry, exit_)
+        coin_success_dict.setdefault(coin, [0, 0])
+        if actual_pnl is None:
+            continue
+        leverage_pnl_list.append(actual_pnl)
+        spot_pnl_list.append(spot_pnl)
+        for prefix in (
+            "real" if mode_.lower() == "real" else "demo",
+            "long" if position.lower() == "long" else "short",
+            "low" if lev <= 5 else "high",
+        ):
+            result[f"{prefix}_count"] += 1
+            if actual_pnl > 0:
+                result[f"{prefix}_win"] += 1
+            elif actual_pnl < 0:
+                result[f"{prefix}_loss"] += 1
+        if actual_pnl > 0:
+            coin_success_dict[coin][0] += 1
+        coin_success_dict[coin][1] += 1
+        side = long_trades if position.lower() == "long" else short_trades
+        side.append((coin, actual_pnl, entry, exit_))
+
+    long_trades_sorted = sorted(long_trades, key=lambda x: x[1], reverse=True)
+    short_trades_sorted = sorted(short_trades, key=lambda x: x[1], reverse=True)
+    result["top3_long"], result["worst3_long"] = long_trades_sorted[:3], long_trades_sorted[-3:]
+    result["top3_short"], result["worst3_short"] = short_trades_sorted[:3], short_trades_sorted[-3:]
+    result["avg_spot_pnl"] = sum(spot_pnl_list) / len(spot_pnl_list) if spot_pnl_list else 0
+    result["avg_lev_pnl"] = sum(leverage_pnl_list) / len(leverage_pnl_list) if leverage_pnl_list else 0
+
+    coin_recommendations = [(c, win_count / total_count, total_count)
+                            for c, (win_count, total_count) in coin_success_dict.items() if total_count > 0]
+    coin_recommendations.sort(key=lambda x: x[1], reverse=True)
+    result["coin_recommendations"] = coin_recommendations
+    for prefix in ("long", "short", "low", "high"):
+        count = result[f"{prefix}_count"]
+        result[f"{prefix}_ratio"] = result[f"{prefix}_win"] / count if count > 0 else 0
+    return result
+
+
+def assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, float) and math.isfinite(value):
+            assert actual[key] == pytest.approx(value), key
+        else:
+            assert actual[key] == value, key
+
+
+def closed_rows(trades, date=None):
+    return [(coin, position, leverage, entry, exit_, mode, dte)
+            for (coin, position, mode, dte, leverage, entry, exit_, size) in trades
+            if exit_ is not None and (date is None or dte == date)]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    database = str(tmp_path / "trade_data.db")
+    setup_database(database)
+    conn = profiler.connect(database)
+    insert_trades(conn.cursor(), TRADES)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_metrics_match_full_scan(conn):
+    state = update_report_state(conn, TODAY)
+    metrics = calculate_metrics(state.stats)
+    assert (metrics["top_coin"], metrics["top_coin_count"]) == ("BTC", 4)
+    assert calculate_metrics(state.daily)["best_coin"] == "BTC"
+    assert_same(calculate_metrics(state.stats), baseline_metrics(closed_rows(TRADES)))
+    assert_same(calculate_metrics(state.daily), baseline_metrics(closed_rows(TRADES, TODAY)))
+
+
+def test_analysis_matches_full_scan(conn):
+    state = update_report_state(conn, TODAY)
+    assert_same(analyze(state.stats), baseline_analysis(closed_rows(TRADES)))
+
+
+def test_incremental_state_matches_full_scan(conn):
+    update_report_state(conn, TODAY)
+    more = [
+        ("DOT", "short", "real", TODAY, 5, 10.0, 9.0, 1),
+        ("ADA", "long", "demo", TODAY, 5, 0.0, 1.0, 1),
+    ]
+    insert_trades(conn.cursor(), more)
+    conn.commit()
+    state = update_report_state(conn, TODAY)
+    assert state.incremental
+    assert_same(calculate_metrics(state.stats), baseline_metrics(closed_rows(TRADES + more)))
+    assert_same(analyze(state.stats), baseline_analysis(closed_rows(TRADES + more)))
+
+
+def test_archived_and_live_trades_match_full_scan(conn, tmp_path):
+    archived = archive_trades(conn, _days_ago(15), archive_dir=str(tmp_path / "archive"))
+    assert archived == 9
+    assert conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == len(TRADES) - archived
+
+    state = update_report_state(conn, TODAY, full=True)
+    assert_same(calculate_metrics(state.stats), baseline_metrics(closed_rows(TRADES)))
+    assert_same(calculate_metrics(state.daily), baseline_metrics(closed_rows(TRADES, TODAY)))
+    assert_same(analyze(state.stats), baseline_analysis(closed_rows(TRADES)))
+
+
+def test_empty_database(tmp_path):
+    database = str(tmp_path / "empty.db")
+    setup_database(database)
+    conn = profiler.connect(database)
+    try:
+        state = update_report_state(conn, TODAY)
+        assert calculate_metrics(state.stats) == baseline_metrics([])
+        assert_same(analyze(state.stats), baseline_analysis([]))
+    finally:
+        conn.close()
+
+
+def test_time_of_day_grid_keeps_archived_trades(conn, tmp_path):
+    timed = []
+    for days, hour in ((30, 9), (30, 9), (25, 14), (2, 9), (1, 22)):
+        moment = datetime.now().replace(hour=hour, minute=30, second=0, microsecond=0) - timedelta(days=days)
+        timed.append(("BTC", "long", "real", None, 5, 100.0, 100.0 + days - 10, 1, to_epoch_ms(moment), None))
+    insert_trades(conn.cursor(), timed)
+    conn.commit()
+
+    expected = [[[0, 0, 0.0] for _ in range(24)] for _ in range(7)]
+    for (coin, position, mode, date, leverage, entry, exit_, size, entry_time, _) in timed:
+        pnl = get_pnl(position, leverage, entry, exit_)
+        bucket = expected[bucket_of(entry_time)[0]][bucket_of(entry_time)[1]]
+        bucket[0] += 1
+        bucket[1] += pnl > 0
+        bucket[2] += pnl
+
+    assert update_report_state(conn, TODAY).time_grid == expected
+    archive_trades(conn, _days_ago(15), archive_dir=str(tmp_path / "archive"))
+    state = update_report_state(conn, TODAY, full=True)
+    assert [[cell[:2] for cell in row] for row in state.time_grid] == [[cell[:2] for cell in row] for row in expected]
+    assert [cell[2] for row in state.time_grid for cell in row] == \
+        pytest.approx([cell[2] for row in expected for cell in row])
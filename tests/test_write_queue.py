@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "queue.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, title TEXT UNIQUE)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def titles(database):
+    conn = sqlite3.connect(database)
+    try:
+        return [row[0] for row in conn.execute("SELECT title FROM notes ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_callbacks_run_on_poll_after_commit(database):
+    writer = WriteQueue(database)
+    results = []
+    writer.execute("INSERT INTO notes (title) VALUES (?)", ("a",), lambda result, error: results.append((result, error)))
+    writer.submit(lambda cursor: cursor.execute("SELECT COUNT(*) FROM notes").fetchone()[0],
+                  lambda result, error: results.append((result, error)))
+    assert writer.flush(timeout=5)
+    assert results == []  # only delivered by poll()
+    writer.poll()
+    assert results == [(1, None), (1, None)]
+    writer.close(timeout=5)
+
+
+def test_failing_job_is_rolled_back_alone(database):
+    writer = WriteQueue(database)
+    errors = []
+
+    def half_written(cursor):
+        cursor.execute("INSERT INTO notes (title) VALUES ('partial')")
+        cursor.execute("INSERT INTO notes (title) VALUES ('a')")  # duplicate title
+
+    def broken(cursor):
+        cursor.execute("INSERT INTO notes (title) VALUES ('also partial')")
+        raise RuntimeError("not a database error")
+
+    writer.execute("INSERT INTO notes (title) VALUES (?)", ("a",))
+    writer.submit(half_written, lambda result, error: errors.append(error))
+    writer.submit(broken, lambda result, error: errors.append(error))
+    writer.execute("INSERT INTO notes (title) VALUES (?)", ("b",), lambda result, error: errors.append(error))
+    writer.close(timeout=5)
+
+    assert isinstance(errors[0], sqlite3.IntegrityError)
+    assert isinstance(errors[1], RuntimeError)
+    assert errors[2] is None
+    assert titles(database) == ["a", "b"]
+
+
+def test_close_writes_everything_queued(database):
+    writer = WriteQueue(database, max_batch=3)
+    done = []
+    for i in range(10):
+        writer.execute("INSERT INTO notes (title) VALUES (?)", (str(i),), lambda result, error: done.append(error))
+    writer.close(timeout=5)
+    assert done == [None] * 10
+    assert titles(database) == [str(i) for i in range(10)]
+
+
+def test_flush_returns_when_the_database_cannot_be_opened(tmp_path):
+    writer = WriteQueue(str(tmp_path / "missing" / "queue.db"))
+    errors = []
+    writer.execute("INSERT INTO notes (title) VALUES (?)", ("a",), lambda result, error: errors.append(error))
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+    assert len(errors) == 1 and isinstance(errors[0], sqlite3.Error)
@@ -0,0 +1,13 @@
+from timestamps import from_epoch_ms
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def bucket_of(entry_time):
+    """
+    Returns the (weekday, hour) bucket of an entry time in epoch milliseconds, in
+    local time with Monday as weekday 0. The report's heatmaps and the archive
+    summaries are grouped by it.
+    """
+    moment = from_epoch_ms(entry_time)
+    return moment.weekday(), moment.hour
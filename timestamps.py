@@ -0,0 +1,57 @@
+from datetime import datetime
+
+
+def to_epoch_ms(moment):
+    """
+    Converts a datetime to epoch milliseconds. Naive datetimes are taken as local time.
+    """
+    return int(moment.timestamp() * 1000)
+
+
+def from_epoch_ms(ms):
+    """
+    Converts epoch milliseconds to a naive local datetime.
+    """
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def date_from_ms(ms):
+    """
+    Returns the local 'YYYY-MM-DD' date of an epoch millisecond timestamp, the form the
+    date column is stored in.
+    """
+    return from_epoch_ms(ms).strftime("%Y-%m-%d")
+
+
+def parse_timestamp(text, date_str=None):
+    """
+    Parses a trade time as entered in the GUI or an import file.
+
+    Accepted forms: 'HH:MM' or 'HH:MM:SS' (on `date_str`), 'YYYY-MM-DD HH:MM[:SS]',
+    'YYYY-MM-DDTHH:MM[:SS]' and plain epoch milliseconds. Times are local time.
+
+    Parameters:
+    text (str): The entered time; empty for none.
+    date_str (str): 'YYYY-MM-DD' day for times given without a date.
+
+    Returns:
+    int: Epoch milliseconds, or None if text is empty.
+
+    Raises:
+    ValueError: If the text is not in one of the accepted forms.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if text.isdigit() and len(text) > 8:
+        return int(text)
+    if len(text) <= 8:
+        if not date_str:
+            raise ValueError("A time without a date needs the trade date.")
+        text = f"{date_str.strip()} {text}"
+    for layout in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return to_epoch_ms(datetime.strptime(text, layout))
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time '{text}'; use HH:MM or YYYY-MM-DD HH:MM.")
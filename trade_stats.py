@@ -0,0 +1,460 @@
+from collections import Counter
+
+from quantile_sketch import KLLSketch
+
+# Positions of the values kept for each trade group
+COUNT, PNL_COUNT, WINS, LOSSES, PNL_SUM, SPOT_PNL_SUM, PNL_MAX, PNL_MIN = range(8)
+
+# Number of best and worst trades kept per position side
+EXTREME_COUNT = 3
+
+# PnL values buffered per sketch before they are added in one go
+SKETCH_BUFFER = 4096
+
+
+def get_pnl(position, leverage, entry_price, exit_price):
+    """
+    Calculates the leveraged PnL for a trade.
+
+    Parameters:
+    position (str): 'long' or 'short'.
+    leverage (int): The leverage used.
+    entry_price (float): Entry price of the trade.
+    exit_price (float): Exit price of the trade.
+
+    Returns:
+    float: The PnL percentage, or None if the entry price is 0.
+    """
+    if entry_price == 0:
+        return None
+    if position.lower() == "long":
+        return ((exit_price - entry_price) / entry_price) * 100 * leverage
+    else:  # short
+        return ((entry_price - exit_price) / entry_price) * 100 * leverage
+
+
+def get_spot_pnl(position, entry_price, exit_price):
+    """
+    Calculates the spot (1x) PnL for a trade.
+
+    Parameters:
+    position (str): 'long' or 'short'.
+    entry_price (float): Entry price of the trade.
+    exit_price (float): Exit price of the trade.
+
+    Returns:
+    float: The PnL percentage, or None if the entry price is 0.
+    """
+    if entry_price == 0:
+        return None
+    if position.lower() == "long":
+        return ((exit_price - entry_price) / entry_price) * 100
+    else:
+        return ((entry_price - exit_price) / entry_price) * 100
+
+
+def new_group():
+    """
+    Returns the empty value list of a trade group (see the index constants above).
+    """
+    return [0, 0, 0, 0, 0.0, 0.0, float("-inf"), float("inf")]
+
+
+def merge_group(target, values):
+    """
+    Adds the values of one trade group into another, in place.
+    """
+    for i in (COUNT, PNL_COUNT, WINS, LOSSES, PNL_SUM, SPOT_PNL_SUM):
+        target[i] += values[i]
+    if values[PNL_MAX] > target[PNL_MAX]:
+        target[PNL_MAX] = values[PNL_MAX]
+    if values[PNL_MIN] < target[PNL_MIN]:
+        target[PNL_MIN] = values[PNL_MIN]
+
+
+class TradeStats:
+    """
+    Everything the report needs from a set of closed trades, kept as aggregates.
+
+    Trades are grouped by (coin, position, mode, leverage); every metric of the report
+    can be derived from the per-group counts and sums, so the state stays small no
+    matter how many trades are added and can be combined with pre-summarized groups
+    (e.g. from archived trades). Only the best and worst trades per position side are
+    kept individually.
+
+    Groups keep the order in which they were first seen, which is what decides ties
+    in the "most traded" and "best/worst coin" metrics.
+
+    The PnL distribution is kept in quantile sketches (see quantile_sketch.py): one
+    for all trades and one per coin ("coin:BTC"), mode ("mode:real") and leverage
+    bucket ("leverage:low" for 1-5x, "leverage:high" above).
+    """
+    def __init__(self):
+        # (coin, position, mode, leverage) -> values, see new_group()
+        self.groups = {}
+        # side -> list of (trade_id, coin, pnl, entry_price, exit_price)
+        self.extremes = {"long": [], "short": []}
+        # sketch key -> KLLSketch, plus PnLs not added to the sketches yet
+        self._sketches = {}
+        self._pending = {}
+
+    def add_trade(self, trade_id, coin, position, leverage, entry_price, exit_price, mode):
+        """
+        Adds one closed trade.
+
+        Parameters:
+        trade_id (int): Trade id, used to order trades with equal PnL.
+        coin (str): Coin name.
+        position (str): 'long' or 'short'.
+        leverage (float): Leverage used.
+        entry_price (float): Entry price of the trade.
+        exit_price (float): Exit price of the trade.
+        mode (str): 'real' or 'demo'.
+        """
+        key = (coin, position, mode, leverage)
+        values = self.groups.get(key)
+        if values is None:
+            values = self.groups[key] = new_group()
+
+        pnl = get_pnl(position, leverage, entry_price, exit_price)
+        values[COUNT] += 1
+        if pnl is None:
+            # Counted as a 0% trade in the general metrics, skipped in the analysis
+            metric_pnl = 0.0
+        else:
+            metric_pnl = pnl
+            values[PNL_COUNT] += 1
+            if pnl > 0:
+                values[WINS] += 1
+            elif pnl < 0:
+                values[LOSSES] += 1
+            values[PNL_SUM] += pnl
+            values[SPOT_PNL_SUM] += get_spot_pnl(position, entry_price, exit_price)
+            self.add_extreme(trade_id, coin, position, pnl, entry_price, exit_price)
+            for sketch_key in ("all", "coin:" + coin, "mode:" + mode.lower(),
+                               "leverage:low" if leverage <= 5 else "leverage:high"):
+                pending = self._pending.get(sketch_key)
+                if pending is None:
+                    pending = self._pending[sketch_key] = []
+                pending.append(pnl)
+                if len(pending) >= SKETCH_BUFFER:
+                    self._flush(sketch_key)
+        if metric_pnl > values[PNL_MAX]:
+            values[PNL_MAX] = metric_pnl
+        if metric_pnl < values[PNL_MIN]:
+            values[PNL_MIN] = metric_pnl
+
+    def add_group(self, key, values):
+        """
+        Adds a pre-aggregated trade group.
+
+        Parameters:
+        key (tuple): (coin, position, mode, leverage)
+        values (list): Group values in the layout of new_group().
+        """
+        target = self.groups.get(key)
+        if target is None:
+            target = self.groups[key] = new_group()
+        merge_group(target, values)
+
+    def _flush(self, sketch_key):
+        pending = self._pending.pop(sketch_key, None)
+        if pending:
+            sketch = self._sketches.get(sketch_key)
+            if sketch is None:
+                sketch = self._sketches[sketch_key] = KLLSketch()
+            sketch.update(pending)
+
+    @property
+    def sketches(self):
+        """
+        The PnL quantile sketches by key (see the class docstring).
+        """
+        for sketch_key in list(self._pending):
+            self._flush(sketch_key)
+        return self._sketches
+
+    def add_sketch(self, sketch_key, sketch):
+        """
+        Merges a PnL sketch of other trades (e.g. archived ones) into this one.
+
+        Parameters:
+        sketch_key (str): Sketch key, e.g. "all" or "coin:BTC".
+        sketch (KLLSketch): The sketch to merge in.
+        """
+        target = self.sketches.get(sketch_key)
+        if target is None:
+            target = self._sketches[sketch_key] = KLLSketch(sketch.k)
+        target.merge(sketch)
+
+    def add_extreme(self, trade_id, coin, position, pnl, entry_price, exit_price):
+        """
+        Offers a trade as one of the best/worst trades of its position side.
+        """
+        side = "long" if position.lower() == "long" else "short"
+        candidates = self.extremes[side]
+        candidates.append((trade_id, coin, pnl, entry_price, exit_price))
+        if len(candidates) > 4 * EXTREME_COUNT:
+            self.extremes[side] = _trim_extremes(candidates)
+
+    def merge(self, other):
+        """
+        Adds every group and extreme trade of another TradeStats into this one.
+
+        Parameters:
+        other (TradeStats): Statistics to merge in.
+        """
+        for key, values in other.groups.items():
+            self.add_group(key, values)
+        for side, candidates in other.extremes.items():
+            merged = self.extremes[side] + candidates
+            self.extremes[side] = _trim_extremes(merged) if len(merged) > 2 * EXTREME_COUNT else merged
+        for sketch_key, sketch in other.sketches.items():
+            self.add_sketch(sketch_key, sketch)
+
+    def top_and_worst(self, side):
+        """
+        Returns the best and worst trades of a position side, ordered like a
+        stable descending sort by PnL of all trades (ties in id order).
+
+        Parameters:
+        side (str): 'long' or 'short'.
+
+        Returns:
+        tuple: (top, worst) lists of (coin, pnl, entry_price, exit_price).
+        """
+        ordered = sorted(self.extremes[side], key=lambda t: (-t[2], t[0]))
+        top = ordered[:EXTREME_COUNT]
+        worst = ordered[-EXTREME_COUNT:]
+        return ([t[1:] for t in top], [t[1:] for t in worst])
+
+    @property
+    def total_trades(self):
+        return sum(values[COUNT] for values in self.groups.values())
+
+    def to_dict(self):
+        """
+        Returns the statistics as JSON-serializable data (see from_dict()).
+        """
+        return {
+            "groups": [[*key, *values] for key, values in self.groups.items()],
+            "extremes": {side: [list(t) for t in candidates] for side, candidates in self.extremes.items()},
+            "sketches": {sketch_key: sketch.to_dict() for sketch_key, sketch in self.sketches.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuilds statistics saved with to_dict().
+
+        Parameters:
+        data (dict): Output of to_dict().
+
+        Returns:
+        TradeStats: The restored statistics.
+        """
+        stats = cls()
+        for row in data["groups"]:
+            stats.groups[tuple(row[:4])] = list(row[4:])
+        for side, candidates in data["extremes"].items():
+            stats.extremes[side] = [tuple(t) for t in candidates]
+        for sketch_key, sketch in data.get("sketches", {}).items():
+            stats._sketches[sketch_key] = KLLSketch.from_dict(sketch)
+        return stats
+
+
+def _trim_extremes(candidates):
+    """
+    Keeps only the candidates that can still be among the best or worst trades.
+    """
+    ordered = sorted(candidates, key=lambda t: (-t[2], t[0]))
+    if len(ordered) <= 2 * EXTREME_COUNT:
+        return ordered
+    return ordered[:EXTREME_COUNT] + ordered[-EXTREME_COUNT:]
+
+
+def calculate_metrics(stats):
+    """
+    Calculates the general trading metrics of the report.
+
+    Parameters:
+    stats (TradeStats): Aggregated trades.
+
+    Returns:
+    dict: A dictionary containing calculated metrics.
+    """
+    if not stats.groups:
+        return {
+            "total_trades": 0,
+            "top_coin": "None",
+            "top_coin_count": 0,
+            "top_position": "None",
+            "top_leverage": 0,
+            "best_coin": "None",
+            "best_coin_avg_pnl": 0.0,
+            "worst_coin": "None",
+            "worst_coin_avg_pnl": 0.0,
+            "max_pnl": 0.0,
+            "min_pnl": 0.0,
+            "net_pnl": 0.0,
+        }
+
+    coin_counter = Counter()
+    position_counter = Counter()
+    leverage_counter = Counter()
+    coin_pnl = {}  # coin -> [pnl_sum, count]
+    max_pnl = float("-inf")
+    min_pnl = float("inf")
+    net_pnl = 0.0
+
+    for (coin, position, mode, leverage), values in stats.groups.items():
+        coin_counter[coin] += values[COUNT]
+        position_counter[position.lower()] += values[COUNT]
+        leverage_counter[leverage] += values[COUNT]
+        totals = coin_pnl.setdefault(coin, [0.0, 0])
+        totals[0] += values[PNL_SUM]
+        totals[1] += values[COUNT]
+        max_pnl = max(max_pnl, values[PNL_MAX])
+        min_pnl = min(min_pnl, values[PNL_MIN])
+        net_pnl += values[PNL_SUM]
+
+    # Most traded coin, position and leverage
+    top_coin, top_coin_count = coin_counter.most_common(1)[0]
+    top_position, _ = position_counter.most_common(1)[0]
+    top_leverage, _ = leverage_counter.most_common(1)[0]
+
+    # Best and worst coins based on average PnL
+    best_coin = "None"
+    best_coin_avg_pnl = float("-inf")
+    worst_coin = "None"
+    worst_coin_avg_pnl = float("inf")
+
+    for c, (pnl_sum, count) in coin_pnl.items():
+        avg_pnl = pnl_sum / count
+        if avg_pnl > best_coin_avg_pnl:
+            best_coin_avg_pnl = avg_pnl
+            best_coin = c
+        if avg_pnl < worst_coin_avg_pnl:
+            worst_coin_avg_pnl = avg_pnl
+            worst_coin = c
+
+    return {
+        "total_trades": stats.total_trades,
+        "top_coin": top_coin,
+        "top_coin_count": top_coin_count,
+        "top_position": top_position,
+        "top_leverage": top_leverage,
+        "best_coin": best_coin,
+        "best_coin_avg_pnl": best_coin_avg_pnl,
+        "worst_coin": worst_coin,
+        "worst_coin_avg_pnl": worst_coin_avg_pnl,
+        "max_pnl": max_pnl,
+        "min_pnl": min_pnl,
+        "net_pnl": net_pnl,
+    }
+
+
+def coin_summary(stats):
+    """
+    Sums up the trades of each coin.
+
+    Parameters:
+    stats (TradeStats): Aggregated trades.
+
+    Returns:
+    list of tuple: (coin, net_pnl, win_rate, trade_count) per coin, in the order the
+    coins were first seen. Trades with an entry price of 0 are left out.
+    """
+    totals = {}  # coin -> [pnl_sum, wins, pnl_count]
+    for (coin, position, mode, leverage), values in stats.groups.items():
+        row = totals.setdefault(coin, [0.0, 0, 0])
+        row[0] += values[PNL_SUM]
+        row[1] += values[WINS]
+        row[2] += values[PNL_COUNT]
+    return [
+        (coin, pnl_sum, wins / count if count else 0.0, count)
+        for coin, (pnl_sum, wins, count) in totals.items()
+    ]
+
+
+def pnl_percentiles(stats, sketch_key, percentiles=(1, 5, 50, 95, 99)):
+    """
+    Returns approximate PnL percentiles of a group of trades.
+
+    Parameters:
+    stats (TradeStats): Aggregated trades.
+    sketch_key (str): "all", "coin:<COIN>", "mode:<mode>" or "leverage:low/high".
+    percentiles (tuple of float): Percentiles to compute (0-100).
+
+    Returns:
+    tuple: (trade_count, list of percentile values), or None if the group has no trades.
+    """
+    sketch = stats.sketches.get(sketch_key)
+    if sketch is None or not sketch.count:
+        return None
+    return sketch.count, sketch.quantiles([p / 100 for p in percentiles])
+
+
+def analyze(stats):
+    """
+    Calculates the detailed analysis and recommendation figures of the report:
+    real/demo, long/short and low/high leverage win counts, the best and worst trades,
+    average spot and leveraged PnL, per-coin success rates and success ratios.
+    Trades with an entry price of 0 are left out.
+
+    Parameters:
+    stats (TradeStats): Aggregated trades.
+
+    Returns:
+    dict: The analysis figures.
+    """
+    result = {}
+    for prefix in ("real", "demo", "long", "short", "low", "high"):
+        result[f"{prefix}_count"] = result[f"{prefix}_win"] = result[f"{prefix}_loss"] = 0
+
+    spot_pnl_sum = 0.0
+    lev_pnl_sum = 0.0
+    pnl_count = 0
+    # Coin success analysis: coin -> [win_count, total_count]
+    coin_success_dict = {}
+
+    for (coin, position, mode, leverage), values in stats.groups.items():
+        success = coin_success_dict.setdefault(coin, [0, 0])
+        count = values[PNL_COUNT]
+        if count == 0:
+            continue
+        wins, losses = values[WINS], values[LOSSES]
+        success[0] += wins
+        success[1] += count
+        pnl_count += count
+        lev_pnl_sum += values[PNL_SUM]
+        spot_pnl_sum += values[SPOT_PNL_SUM]
+
+        for prefix in (
+            "real" if mode.lower() == "real" else "demo",
+            "long" if position.lower() == "long" else "short",
+            "low" if leverage <= 5 else "high",
+        ):
+            result[f"{prefix}_count"] += count
+            result[f"{prefix}_win"] += wins
+            result[f"{prefix}_loss"] += losses
+
+    result["top3_long"], result["worst3_long"] = stats.top_and_worst("long")
+    result["top3_short"], result["worst3_short"] = stats.top_and_worst("short")
+
+    result["avg_spot_pnl"] = spot_pnl_sum / pnl_count if pnl_count else 0
+    result["avg_lev_pnl"] = lev_pnl_sum / pnl_count if pnl_count else 0
+
+    coin_recommendations = []
+    for c, (win_count, total_count) in coin_success_dict.items():
+        if total_count > 0:
+            coin_recommendations.append((c, win_count / total_count, total_count))
+    coin_recommendations.sort(key=lambda x: x[1], reverse=True)
+    result["coin_recommendations"] = coin_recommendations
+
+    # Position type and leverage success ratios
+    for prefix in ("long", "short", "low", "high"):
+        count = result[f"{prefix}_count"]
+        result[f"{prefix}_ratio"] = result[f"{prefix}_win"] / count if count > 0 else 0
+
+    return result
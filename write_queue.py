@@ -0,0 +1,195 @@
+import queue
+import sqlite3
+import threading
+
+import profiler
+
+_STOP = object()
+
+
+class WriteJob:
+    """
+    A unit of work for the writer thread.
+
+    work is either an (sql, parameters) tuple or a callable taking a cursor; its
+    return value (or the cursor's lastrowid / rowcount for SQL) is passed to the
+    callback once the transaction containing the job has been committed.
+    """
+    __slots__ = ("work", "callback", "result", "error")
+
+    def __init__(self, work, callback):
+        self.work = work
+        self.callback = callback
+        self.result = None
+        self.error = None
+
+
+class WriteQueue:
+    """
+    Runs database writes on a dedicated thread with group commit.
+
+    Jobs are executed strictly in submission order. Whatever has queued up while the
+    previous transaction was committing is written in one transaction, so a burst of
+    writes costs one fsync. Each job runs inside its own savepoint: a failing job is
+    rolled back and reported without affecting the others in the batch. Whatever goes
+    wrong, every job is reported exactly once, so flush() cannot wait forever.
+
+    Callbacks are not run on the writer thread. Call poll() from the thread that owns
+    the GUI (see attach()) and they are invoked there after the commit.
+    """
+    def __init__(self, database, max_batch=200):
+        """
+        Parameters:
+        database (str): Path to the SQLite database file.
+        max_batch (int): Maximum number of jobs committed together.
+        """
+        self.database = database
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._done = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="trade-journal-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, work, callback=None):
+        """
+        Queues a write.
+
+        Parameters:
+        work (tuple or callable): (sql, parameters) or a function taking a cursor.
+        callback (callable): Called as callback(result, error) after the commit;
+            error is None on success.
+        """
+        with self._pending_lock:
+            self._pending += 1
+        self._jobs.put(WriteJob(work, callback))
+
+    def execute(self, sql, parameters=(), callback=None):
+        """
+        Shortcut for submit((sql, parameters), callback).
+        """
+        self.submit((sql, parameters), callback)
+
+    def poll(self):
+        """
+        Runs the callbacks of every job finished so far. Must be called from the
+        thread that should receive the callbacks.
+        """
+        while True:
+            try:
+                job = self._done.get_nowait()
+            except queue.Empty:
+                return
+            if job.callback is not None:
+                job.callback(job.result, job.error)
+
+    def attach(self, root, interval=50):
+        """
+        Polls for finished jobs from the Tk event loop every `interval` milliseconds.
+
+        Parameters:
+        root (tk.Tk): The Tk root window.
+        interval (int): Poll interval in milliseconds.
+        """
+        def tick():
+            self.poll()
+            root.after(interval, tick)
+        root.after(interval, tick)
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every job submitted so far has been committed (or has failed).
+
+        Parameters:
+        timeout (float): Maximum seconds to wait.
+
+        Returns:
+        bool: True if the queue drained in time.
+        """
+        with self._pending_lock:
+            return self._pending_lock.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=None):
+        """
+        Writes everything still queued, stops the writer thread and runs the remaining callbacks.
+        """
+        self._jobs.put(_STOP)
+        self._thread.join(timeout)
+        self.poll()
+
+    def _run(self):
+        try:
+            conn = profiler.connect(self.database, isolation_level=None)
+        except Exception as e:
+            # Without a connection every job fails, but is still reported
+            conn, connect_error = None, e
+        stopping = False
+        while not stopping:
+            job = self._jobs.get()
+            if job is _STOP:
+                break
+            batch = [job]
+            # Group commit: take whatever else is already waiting
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+            if conn is None:
+                self._finish(batch, connect_error)
+            else:
+                self._write_batch(conn, batch)
+        if conn is not None:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        cursor = conn.cursor()
+        error = None
+        with profiler.span("write_queue.batch"):
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                for job in batch:
+                    cursor.execute("SAVEPOINT job")
+                    try:
+                        if callable(job.work):
+                            job.result = job.work(cursor)
+                        else:
+                            sql, parameters = job.work
+                            cursor.execute(sql, parameters)
+                            job.result = cursor.lastrowid if sql.lstrip().upper().startswith("INSERT") else cursor.rowcount
+                        cursor.execute("RELEASE job")
+                    except Exception as e:
+                        job.result = None
+                        job.error = e
+                        cursor.execute("ROLLBACK TO job")
+                        cursor.execute("RELEASE job")
+                cursor.execute("COMMIT")
+            except Exception as e:
+                # The transaction itself failed (e.g. database locked or disk full)
+                error = e
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                except sqlite3.Error:
+                    pass
+        profiler.count("write_queue.jobs", len(batch))
+        profiler.count("write_queue.commits")
+        self._finish(batch, error)
+
+    def _finish(self, batch, error=None):
+        """
+        Hands the jobs of a batch to poll(); error fails every job that has not failed on its own.
+        """
+        for job in batch:
+            if error is not None and job.error is None:
+                job.result = None
+                job.error = error
+            self._done.put(job)
+        with self._pending_lock:
+            self._pending -= len(batch)
+            self._pending_lock.notify_all()